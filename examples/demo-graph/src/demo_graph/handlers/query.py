@@ -72,7 +72,10 @@ def query_handler(
         + click.style("recursive graph query", fg="blue")
         + "):"
     )
-    res, _time = db.vector_search_from_text(Document, query, table="tag", k=10)
+    # the top tag embedding is used to rank the tagged things
+    res, _time = db.vector_search_from_text(
+        Document, query, table="tag", k=10, omit=()
+    )
     top_tag_embedding = []
     for i, (x, score) in enumerate(res):
         assert x.id
@@ -4,6 +4,7 @@ from demo_graph.handlers.ingest import ingest_things_handler
 from demo_graph.handlers.query import query_handler
 from kaig.db import DB
 from kaig.definitions import Relation, VectorTableDefinition
+from kaig.embedding_cache import EmbeddingCache
 from kaig.embeddings import Embedder
 from kaig.llm import LLM
 
@@ -21,8 +22,12 @@ def cli(
     click.echo("Init LLM...")
     llm = LLM(provider="ollama", model="llama3.2")
     click.echo("Init DB...")
+    # queries are embedded once per table, the cache avoids recomputing them
     embedder = Embedder(
-        provider="ollama", model_name="all-minilm:22m", vector_type="F32"
+        provider="ollama",
+        model_name="all-minilm:22m",
+        vector_type="F32",
+        cache=EmbeddingCache(),
     )
     _db = DB(
         "ws://localhost:8000/rpc",
@@ -56,6 +56,11 @@ def init_kaig(*, url: str, db: str, ns: str) -> DB:
         enable_flow=True,
     )
 
+    # queries used by the agent tools, loaded once
+    _ = kaig.templates.register(
+        Path(__file__).parent.parent / "surql" / "search_chunks.surql"
+    )
+
     surqls: list[str] = []
     tables_dir = Path(__file__).parent.parent / "surql" / "tables"
     for file_path in tables_dir.glob("*.surql"):
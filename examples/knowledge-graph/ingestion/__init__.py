@@ -6,6 +6,7 @@ from surrealdb import Value
 
 from kaig import flow
 from kaig.definitions import OriginalDocument, Relations
+from kaig.vectors import to_list
 
 from .chunk import chunking_handler
 from .utils import clean_keywords
@@ -30,7 +31,7 @@ async def ingestion_loop(exe: flow.Executor):
 
         # skip folders and empty files (but still mark them as chunked)
         if file.content_type != "folder" and (
-            file.file is not None or file.content is not None
+            file.file is not None or file.chunks or file.content is not None
         ):
             # delete existing chunks for this file
             _ = exe.db.sync_conn.query(
@@ -80,7 +81,7 @@ async def ingestion_loop(exe: flow.Executor):
             "UPDATE ONLY $record SET embedding = $embedding",
             {
                 "record": record.get("id"),
-                "embedding": cast(Value, embedding),
+                "embedding": cast(Value, to_list(embedding)),
             },
             dict,
         )
@@ -95,7 +96,7 @@ async def ingestion_loop(exe: flow.Executor):
             "UPDATE ONLY $record SET embedding = $embedding",
             {
                 "record": record.get("id"),
-                "embedding": cast(Value, embedding),
+                "embedding": cast(Value, to_list(embedding)),
             },
             dict,
         )
@@ -35,9 +35,10 @@ def chunking_handler(
                 document.content,
                 keywords_min_score,
             )
-        elif document.file is not None:
+        elif document.file is not None or document.chunks:
             doc_stream = DocumentStreamGeneric(
-                name=document.filename, stream=BytesIO(document.file)
+                name=document.filename,
+                stream=BytesIO(db.read_original_document(document)),
             )
             result = converter.convert_and_chunk(
                 document.filename, doc_stream, keywords_min_score
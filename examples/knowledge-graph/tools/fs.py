@@ -36,7 +36,7 @@ async def cat(
     if not args.path.startswith("/"):
         args.path = "/" + args.path
 
-    result = context.deps.db.query_one(
+    result = await context.deps.db.aio.query_one(
         "SELECT * FROM ONLY file WHERE path = $path LIMIT 1",
         {"path": args.path},
         OriginalDocument,
@@ -70,15 +70,16 @@ async def ls(
     if not path.endswith("/"):
         path = path + "/"
 
-    entries = context.deps.db.query(
-        "SELECT id, path, content_type, content FROM file WHERE string::starts_with(path OR '', $prefix)",
+    # streamed in pages of files
+    entries = context.deps.db.aio.iter_query(
+        "file",
+        "WHERE string::starts_with(path OR '', $prefix)",
         {"prefix": path},
         FileEntry,
+        fields="id, path, content_type, content",
+        page_size=500,
     )
 
-    if not entries:
-        return "(empty)"
-
     def _fmt_size(n: int) -> str:
         if not human:
             return str(n)
@@ -90,7 +91,7 @@ async def ls(
 
     if recursive:
         lines: list[str] = []
-        for e in entries:
+        async for e in entries:
             rel = e.path[len(path) :]
             if not all and any(seg.startswith(".") for seg in rel.split("/")):
                 continue
@@ -108,7 +109,7 @@ async def ls(
     file_lines: list[str] = []
     dir_lines: list[str] = []
 
-    for e in entries:
+    async for e in entries:
         rel = e.path[len(path) :]  # relative path under prefix
         if not rel:
             continue
@@ -168,7 +169,7 @@ async def write_file(context: RunContext[Deps], args: WriteFileArgs) -> str:
         current_parent_id: RecordID | None = None
         for i, segment in enumerate(segments):
             partial_path = "/" + "/".join(segments[: i + 1])
-            existing_dir = context.deps.db.query(
+            existing_dir = await context.deps.db.aio.query(
                 "SELECT id, path, content_type FROM file WHERE path = $path",
                 {"path": partial_path},
                 FileEntry,
@@ -180,17 +181,18 @@ async def write_file(context: RunContext[Deps], args: WriteFileArgs) -> str:
                     )
                 current_parent_id = existing_dir[0].id
             else:
-                _ = context.deps.db.sync_conn.query(
-                    "CREATE file CONTENT $content",
-                    {
-                        "content": {
-                            "filename": segment,
-                            "content_type": "folder",
-                            "parent": current_parent_id,
-                        }
-                    },
-                )
-                new_dir = context.deps.db.query(
+                async with context.deps.db.aio.connection() as conn:
+                    _ = await conn.query(
+                        "CREATE file CONTENT $content",
+                        {
+                            "content": {
+                                "filename": segment,
+                                "content_type": "folder",
+                                "parent": current_parent_id,
+                            }
+                        },
+                    )
+                new_dir = await context.deps.db.aio.query(
                     "SELECT id, path, content_type FROM file WHERE path = $path",
                     {"path": partial_path},
                     FileEntry,
@@ -200,7 +202,7 @@ async def write_file(context: RunContext[Deps], args: WriteFileArgs) -> str:
         parent_rec_id = current_parent_id
 
     # Check if path already exists
-    existing = context.deps.db.query(
+    existing = await context.deps.db.aio.query(
         "SELECT id, path, content_type FROM file WHERE path = $path",
         {"path": path},
         FileEntry,
@@ -218,31 +220,34 @@ async def write_file(context: RunContext[Deps], args: WriteFileArgs) -> str:
     if existing:
         if existing[0].content_type == "folder":
             return f"ERROR: Path is a directory: {path}"
-        _ = context.deps.db.sync_conn.query(
-            "UPDATE file SET content = $content, content_type = $content_type, flow_chunked = NONE, flow_keywords = NONE, updated_at = time::now() WHERE path = $path",
-            {
-                "path": path,
-                "content": args.content,
-                "content_type": content_type,
-            },
-        )
-        _ = context.deps.db.sync_conn.query(
-            "DELETE chunk WHERE doc = $doc",
-            {"doc": existing[0].id},
-        )
+        async with context.deps.db.aio.connection() as conn:
+            _ = await conn.query(
+                "UPDATE file SET content = $content, content_type = $content_type, flow_chunked = NONE, flow_keywords = NONE, updated_at = time::now() WHERE path = $path",
+                {
+                    "path": path,
+                    "content": args.content,
+                    "content_type": content_type,
+                },
+            )
+        async with context.deps.db.aio.connection() as conn:
+            _ = await conn.query(
+                "DELETE chunk WHERE doc = $doc",
+                {"doc": existing[0].id},
+            )
         return f"Updated: {path}"
     else:
-        res = context.deps.db.sync_conn.query(
-            "CREATE file CONTENT $content",
-            {
-                "content": {
-                    "filename": filename,
-                    "parent": parent_rec_id,
-                    "content_type": content_type,
-                    "content": args.content,
-                }
-            },
-        )
+        async with context.deps.db.aio.connection() as conn:
+            res = await conn.query(
+                "CREATE file CONTENT $content",
+                {
+                    "content": {
+                        "filename": filename,
+                        "parent": parent_rec_id,
+                        "content_type": content_type,
+                        "content": args.content,
+                    }
+                },
+            )
         logger.debug(f"Created file: {res}")
         return f"Created: {path}"
 
@@ -275,7 +280,7 @@ async def edit(ctx: RunContext[Deps], *, args: EditArgs) -> str:
     if not path.startswith("/"):
         path = "/" + path
 
-    existing = ctx.deps.db.query(
+    existing = await ctx.deps.db.aio.query(
         "SELECT id, path, content_type, content FROM file WHERE path = $path",
         {"path": path},
         FileEntry,
@@ -296,14 +301,16 @@ async def edit(ctx: RunContext[Deps], *, args: EditArgs) -> str:
         updated = current.replace(args.old, args.new, 1)
 
     file_id = existing[0].id
-    _ = ctx.deps.db.sync_conn.query(
-        "UPDATE file SET content = $content, flow_chunked = NONE, flow_keywords = NONE, updated_at = time::now() WHERE path = $path",
-        {"path": path, "content": updated},
-    )
-    _ = ctx.deps.db.sync_conn.query(
-        "DELETE chunk WHERE doc = $doc",
-        {"doc": file_id},
-    )
+    async with ctx.deps.db.aio.connection() as conn:
+        _ = await conn.query(
+            "UPDATE file SET content = $content, flow_chunked = NONE, flow_keywords = NONE, updated_at = time::now() WHERE path = $path",
+            {"path": path, "content": updated},
+        )
+    async with ctx.deps.db.aio.connection() as conn:
+        _ = await conn.query(
+            "DELETE chunk WHERE doc = $doc",
+            {"doc": file_id},
+        )
     return f"Edited: {path}"
 
 
@@ -342,7 +349,7 @@ async def mkdir(ctx: RunContext[Deps], *, args: MkdirArgs) -> str:
         partial_path = "/" + "/".join(segments[: i + 1])
         is_last = i == len(segments) - 1
 
-        existing = ctx.deps.db.query(
+        existing = await ctx.deps.db.aio.query(
             select_file_query, {"path": partial_path}, FileEntry
         )
 
@@ -355,18 +362,19 @@ async def mkdir(ctx: RunContext[Deps], *, args: MkdirArgs) -> str:
                 raise ModelRetry(
                     f"ERROR: Parent directory does not exist: {partial_path}. Pass parents=true to create it."
                 )
-            _ = ctx.deps.db.sync_conn.query(
-                "CREATE file CONTENT $content",
-                {
-                    "content": {
-                        "filename": segment,
-                        "content_type": "folder",
-                        "parent": current_parent_id,
-                    }
-                },
-            )
+            async with ctx.deps.db.aio.connection() as conn:
+                _ = await conn.query(
+                    "CREATE file CONTENT $content",
+                    {
+                        "content": {
+                            "filename": segment,
+                            "content_type": "folder",
+                            "parent": current_parent_id,
+                        }
+                    },
+                )
             created.append(partial_path)
-            new_dir = ctx.deps.db.query(
+            new_dir = await ctx.deps.db.aio.query(
                 select_file_query, {"path": partial_path}, FileEntry
             )
             current_parent_id = new_dir[0].id
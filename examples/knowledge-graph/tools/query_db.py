@@ -91,7 +91,8 @@ async def query_db(context: RunContext[Deps], question: str) -> str:
 
     with logfire.span("Generating query for {question=}", question=question):
         surql_query = db.llm.gen_surql(question, SCHEMA, examples, NOTES)
-        results = db.sync_conn.query_raw(surql_query, {})
+        async with db.aio.connection() as conn:
+            results = await conn.query_raw(surql_query, {})
 
     # -- Build result string and calculate success rate of queries
     response = SurrealRawResponse.model_validate(results)
@@ -109,7 +110,7 @@ async def query_db(context: RunContext[Deps], question: str) -> str:
         )
 
     # store query and success rate in analytics table
-    db.insert_analytics_data(
+    await db.aio.insert_analytics_data(
         "query_ecomm", surql_query, str(results), sum(oks) / len(oks), "1"
     )
 
@@ -17,7 +17,7 @@ async def run_surql(context: RunContext[Deps], file_path: str) -> str:
     if not file_path.startswith("/"):
         file_path = "/" + file_path
 
-    result = db.query_one(
+    result = await db.aio.query_one(
         "SELECT * FROM ONLY file WHERE path = $path LIMIT 1",
         {"path": file_path},
         OriginalDocument,
@@ -29,7 +29,8 @@ async def run_surql(context: RunContext[Deps], file_path: str) -> str:
     if db.llm is None:
         raise ValueError("LLM not available")
 
-    results = db.sync_conn.query_raw(surql, {})
+    async with db.aio.connection() as conn:
+        results = await conn.query_raw(surql, {})
 
     # -- Build result string and calculate success rate of queries
     response = SurrealRawResponse.model_validate(results)
@@ -1,5 +1,4 @@
 from dataclasses import dataclass
-from pathlib import Path
 from typing import cast
 
 import logfire
@@ -7,15 +6,7 @@ from pydantic_ai import RunContext
 from surrealdb import Value
 from tools.deps import Deps
 
-from kaig.db.utils import query
-
-# SurQL files
-surql_path = (
-    Path(__file__).parent.parent / "surql" / "search_chunks.surql"
-    # Path(__file__).parent / "surql" / "search_concepts.surql"
-)
-with open(surql_path, "r") as file:
-    search_surql = file.read()
+from kaig.vectors import to_list
 
 
 @dataclass
@@ -54,11 +45,14 @@ async def similarity(context: RunContext[Deps], search_query: str) -> str:
         if db.embedder is None:
             raise ValueError("Embedder is not configured")
 
-        embedding = db.embedder.embed(search_query)
-        results = query(
-            db.sync_conn,
-            search_surql,
-            {"embedding": cast(Value, embedding), "threshold": 0.4},
+        embedding = await db.embedder.aembed(search_query)
+        # registered in init_kaig
+        results = await db.aio.query(
+            db.templates.render("search_chunks.surql"),
+            {
+                "embedding": cast(Value, to_list(embedding)),
+                "threshold": 0.4,
+            },
             SearchResult,
         )
 
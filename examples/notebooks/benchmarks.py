@@ -8,6 +8,7 @@ from plotly.subplots import make_subplots
 
 from kaig.db import DB
 from kaig.definitions import BaseDocument, VectorTableDefinition
+from kaig.embedding_cache import EmbeddingCache
 from kaig.embeddings import Embedder
 from kaig.llm import LLM
 
@@ -31,7 +32,10 @@ vtables = [VectorTableDefinition(table, "COSINE")]
 
 # -- Instances
 embedder = Embedder(
-    provider="ollama", model_name="all-minilm:22m", vector_type="F32"
+    provider="ollama",
+    model_name="all-minilm:22m",
+    vector_type="F32",
+    cache=EmbeddingCache(),
 )
 llm = LLM(provider="ollama", model="llama3.2")
 db = DB(url, db_user, db_pass, ns, db, embedder, llm, vector_tables=vtables)
@@ -1,23 +1,31 @@
 import hashlib
 import logging
+import os
 import sys
+from collections.abc import (
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    Sequence,
+)
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import asynccontextmanager, contextmanager
 from dataclasses import asdict
 from datetime import datetime
+from itertools import batched
 from pathlib import Path
 from textwrap import dedent
 from typing import Any, cast
 
 from pydantic import BaseModel, ValidationError
 from surrealdb import (
-    AsyncHttpSurrealConnection,
     AsyncSurreal,
-    AsyncWsSurrealConnection,
-    BlockingHttpSurrealConnection,
-    BlockingWsSurrealConnection,
     RecordID,
     Surreal,
     Value,
 )
+from surrealdb.connections.url import Url, UrlScheme
 
 from ..definitions import (
     Analytics,
@@ -33,11 +41,50 @@ from ..definitions import (
 )
 from ..embeddings import Embedder
 from ..llm import LLM
+from ..vectors import EmbeddingBatch, EmbeddingVector, to_format, to_list
 from . import utils
-from .queries import COUNT_QUERY
+from .aio import AsyncDB
+from .batch import Batch, BatchError
+from .exact import ExactIndex, rescore
+from .files import (
+    ProgressCallback,
+    StoreReport,
+    guess_content_type,
+    hash_file,
+    hash_files,
+)
+from .instrument import Instrumentation
+from .pool import AsyncConnectionPool, ConnectionPool
+from .protocols import AsyncConnection, SyncConnection
+from .queries import (
+    COUNT_QUERY,
+    EMBEDDED_RECORDS_QUERY,
+    EXISTING_EDGES_QUERY,
+    EXISTING_RECORDS_QUERY,
+    ITER_QUERY,
+    NODE_UPSERT_QUERY,
+)
+from .relations import (
+    Edge,
+    EdgeSet,
+    RelateReport,
+    UpsertReport,
+    is_conflict,
+    node_chunks,
+)
+from .retry import RetryableError, RetryPolicy, is_retryable
+from .slow_log import SlowQueryLog
+from .stats import QueryStats, QueryStatsSnapshot
+from .templates import TemplateRegistry
 
 logger = logging.getLogger(__name__)
 
+# Files larger than this are stored in chunks of this size, see
+# `DB.store_original_document`
+BLOB_CHUNK_SIZE = 4 * 1024 * 1024
+# Number of chunks sent per round trip, see `DB._store_blobs`
+BLOB_BATCH_SIZE = 8
+
 
 class DB:
     def __init__(
@@ -56,14 +103,18 @@ class DB:
         vector_tables: list[VectorTableDefinition] | None = None,
         graph_relations: list[Relation] | None = None,
         enable_flow: bool = False,
+        pool_size: int = 8,
+        pool_idle_timeout: float = 300,
+        pool_health_check_after: float = 30,
+        retry_policy: RetryPolicy | None = None,
+        measure_payload: bool = False,
+        stats_window: int = 1024,
+        slow_query_ms: float | None = None,
+        slow_query_table: str | None = None,
     ):
 
-        self._sync_conn: (
-            BlockingHttpSurrealConnection | BlockingWsSurrealConnection | None
-        ) = None
-        self._async_conn: (
-            AsyncHttpSurrealConnection | AsyncWsSurrealConnection | None
-        ) = None
+        self._sync_conn: SyncConnection | None = None
+        self._async_conn: AsyncConnection | None = None
         self.url: str = url
         self.username: str = username
         self.password: str = password
@@ -78,18 +129,54 @@ class DB:
         self._vector_tables: list[VectorTableDefinition] = vector_tables or []
         self._graph_relations: list[Relation] = graph_relations or []
 
+        # Embedded databases (e.g. mem://) are private to the connection that
+        # opened them, so they can't be pooled and always use `sync_conn`
+        self._pool: ConnectionPool[SyncConnection] | None = None
+        self._async_pool: AsyncConnectionPool[AsyncConnection] | None = None
+        if Url(url).scheme not in (
+            UrlScheme.MEM,
+            UrlScheme.MEMORY,
+            UrlScheme.FILE,
+            UrlScheme.SURREALKV,
+        ):
+            self._pool = ConnectionPool(
+                self._connect,
+                max_size=pool_size,
+                idle_timeout=pool_idle_timeout,
+                health_check_after=pool_health_check_after,
+            )
+            self._async_pool = AsyncConnectionPool(
+                self._async_connect,
+                max_size=pool_size,
+                idle_timeout=pool_idle_timeout,
+                health_check_after=pool_health_check_after,
+            )
+        self._aio: AsyncDB | None = None
+        self.retry_policy: RetryPolicy = retry_policy or RetryPolicy()
+
+        # every call made through `connection()`/`async_connection()` is
+        # reported to the instrumentation hooks, see `stats()`
+        self.instrumentation: Instrumentation = Instrumentation(
+            measure_payload=measure_payload
+        )
+        self._stats: QueryStats = QueryStats(stats_window)
+        self.instrumentation.hooks.append(self._stats)
+        # queries slower than `slow_query_ms`, with their plan
+        self.slow_queries: SlowQueryLog | None = None
+        if slow_query_ms is not None:
+            self.slow_queries = SlowQueryLog(
+                self,
+                slow_query_ms,
+                table=slow_query_table,
+                background=self._pool is not None,
+            )
+            self.instrumentation.hooks.append(self.slow_queries)
+
         if self.llm:
             self.llm.set_analytics(self.insert_analytics_data)
 
-        self._surql_cache: dict[str, str] = {}
-        for filename in [
-            "create_index_hnsw.surql",
-            "define_relation.surql",
-            "graph_query_in.surql",
-            "graph_siblings.surql",
-            "vector_search.surql",
-        ]:
-            self._surql_cache[filename] = self._load_surql(filename)
+        # compiled .surql templates and rendered statements cache
+        self.templates: TemplateRegistry = TemplateRegistry()
 
     def apply_schemas(self) -> None:
         r"""This needs to be called to initialise the DB indexes.
@@ -111,6 +198,10 @@ class DB:
                         "dimension": self.embedder.dimension,
                         "distance_function": vector_table.dist_func,
                         "vector_type": self.embedder.vector_type,
+                        # quantized embeddings are stored as integers
+                        "element_type": "float"
+                        if self.embedder.quantizer is None
+                        else "int",
                     },
                 )
 
@@ -136,6 +227,20 @@ class DB:
                     DEFINE FIELD IF NOT EXISTS filename ON {self._files_table} TYPE string;
                     DEFINE FIELD IF NOT EXISTS file ON {self._files_table} TYPE option<bytes>;
                     DEFINE FIELD IF NOT EXISTS content ON {self._files_table} TYPE option<string>;
+                    DEFINE FIELD IF NOT EXISTS size ON {self._files_table} TYPE option<int>;
+                    DEFINE FIELD IF NOT EXISTS chunks ON {self._files_table} TYPE option<int>;
+                """),
+            },
+        )
+        _ = self.execute(
+            "define_table.surql",
+            None,
+            {
+                "name": self._blobs_table,
+                "fields": dedent(f"""
+                    DEFINE FIELD IF NOT EXISTS file ON {self._blobs_table} TYPE record<{self._files_table}>;
+                    DEFINE FIELD IF NOT EXISTS index ON {self._blobs_table} TYPE int;
+                    DEFINE FIELD IF NOT EXISTS data ON {self._blobs_table} TYPE bytes;
                 """),
             },
         )
@@ -161,21 +266,20 @@ class DB:
         logger.info("Database initialized")
 
     def clear(self) -> None:
-        res = self.sync_conn.query("REMOVE TABLE IF EXISTS meta;")
-        res = self.sync_conn.query(
-            f"REMOVE TABLE IF EXISTS {self._analytics_table};"
-        )
-        logger.debug(res)
-        for table in self._tables:
-            res = self.sync_conn.query(f"REMOVE TABLE IF EXISTS {table};")
-            logger.debug(res)
-        for table in self._vector_tables:
-            res = self.sync_conn.query(f"REMOVE TABLE IF EXISTS {table.name};")
-            logger.debug(res)
-            res = self.sync_conn.query(
-                f"REMOVE INDEX IF EXISTS idx_{table.name} ON {table.name};"
-            )
+        with self.connection() as conn:
+            res = conn.query("REMOVE TABLE IF EXISTS meta;")
+            res = conn.query(f"REMOVE TABLE IF EXISTS {self._analytics_table};")
             logger.debug(res)
+            for table in self._tables:
+                res = conn.query(f"REMOVE TABLE IF EXISTS {table};")
+                logger.debug(res)
+            for table in self._vector_tables:
+                res = conn.query(f"REMOVE TABLE IF EXISTS {table.name};")
+                logger.debug(res)
+                res = conn.query(
+                    f"REMOVE INDEX IF EXISTS idx_{table.name} ON {table.name};"
+                )
+                logger.debug(res)
 
     @property
     def _vector_table(self) -> str:
@@ -185,56 +289,151 @@ class DB:
     def files_table(self) -> str:
         return self._files_table
 
+    @property
+    def _blobs_table(self) -> str:
+        """Chunks of the files too large to be stored inline"""
+        return f"{self._files_table}_blob"
+
     # ==========================================================================
     # Connections
     # ==========================================================================
 
+    async def _async_connect(self) -> AsyncConnection:
+        conn = AsyncSurreal(self.url)
+        if self.url != "mem://":
+            _ = await conn.signin(
+                {"username": self.username, "password": self.password}
+            )
+        await conn.use(self.namespace, self.database)
+        return conn
+
     @property
-    async def async_conn(
-        self,
-    ) -> AsyncWsSurrealConnection | AsyncHttpSurrealConnection:
+    async def async_conn(self) -> AsyncConnection:
+        r"""A single async connection shared by all its callers. Prefer
+        `async_connection()` for concurrent tasks."""
         if self._async_conn is None:
-            self._async_conn = AsyncSurreal(self.url)
-            if self.url != "mem://":
-                _ = await self._async_conn.signin(
-                    {"username": self.username, "password": self.password}
-                )
-            await self._async_conn.use(self.username, self.database)
+            self._async_conn = await self._async_connect()
         return self._async_conn
 
+    @asynccontextmanager
+    async def async_connection(self) -> AsyncIterator[AsyncConnection]:
+        r"""Async counterpart of `connection()`, backed by an async pool."""
+        if self._async_pool is None:
+            yield self.instrumentation.wrap_async(await self.async_conn)
+            return
+        async with self._async_pool.connection() as conn:
+            yield self.instrumentation.wrap_async(conn)
+
     @property
-    def sync_conn(
-        self,
-    ) -> BlockingHttpSurrealConnection | BlockingWsSurrealConnection:
+    def aio(self) -> AsyncDB:
+        r"""Async facade mirroring the sync API, e.g.
+        `await db.aio.query(...)`."""
+        if self._aio is None:
+            self._aio = AsyncDB(self)
+        return self._aio
+
+    def _connect(self) -> SyncConnection:
+        conn = Surreal(self.url)
+        if self.url != "mem://":
+            _ = conn.signin(
+                {"username": self.username, "password": self.password}
+            )
+        conn.use(self.namespace, self.database)
+        return conn
+
+    @property
+    def sync_conn(self) -> SyncConnection:
+        r"""A single connection shared by all its callers. Prefer
+        `connection()` when calling the DB from multiple threads."""
         if self._sync_conn is None:
-            self._sync_conn = Surreal(self.url)
-            if self.url != "mem://":
-                _ = self._sync_conn.signin(
-                    {"username": self.username, "password": self.password}
-                )
-            self._sync_conn.use(self.namespace, self.database)
+            self._sync_conn = self._connect()
         return self._sync_conn
 
+    @contextmanager
+    def connection(self) -> Iterator[SyncConnection]:
+        r"""Borrow a connection from the pool for the duration of the `with`
+        block. Embedded databases (e.g. `mem://`) always use `sync_conn`.
+
+        Example:
+        ```python
+        with db.connection() as conn:
+            _ = conn.query("CREATE user SET name = $name", {"name": "kaig"})
+        ```
+        """
+        if self._pool is None:
+            yield self.instrumentation.wrap(self.sync_conn)
+            return
+        with self._pool.connection() as conn:
+            yield self.instrumentation.wrap(conn)
+
+    def batch(self, *, transaction: bool = False) -> Batch:
+        r"""Collect statements and send them in a single round trip.
+
+        Example:
+        ```python
+        with db.batch() as b:
+            node = b.add("UPSERT $rec CONTENT $node", {"rec": rec, "node": n})
+            _ = b.add("RELATE $doc->has_keyword->$rec", {"doc": doc, "rec": rec})
+        print(node.result, node.time)
+        ```
+        """
+        return Batch(self, transaction=transaction)
+
+    def stats(self) -> dict[str, QueryStatsSnapshot]:
+        r"""Snapshot of the calls made through `connection()` and
+        `async_connection()`, per `.surql` template or query: calls, errors,
+        rows, payload bytes (if `measure_payload`), and client vs server
+        latency percentiles and histograms over the last `stats_window` calls.
+
+        Client minus server time (`overhead`) is the time spent in the
+        network, waiting for a connection and (de)serializing.
+
+        Example:
+        ```python
+        for name, s in db.stats().items():
+            print(name, s.calls, s.client.p99, s.server.p99, s.overhead.p50)
+        ```
+        """
+        return self._stats.snapshot()
+
+    def reset_stats(self) -> None:
+        self._stats.reset()
+
+    def close(self) -> None:
+        r"""Close all pooled connections and the shared `sync_conn`."""
+        if self._pool is not None:
+            self._pool.close()
+        if self._sync_conn is not None:
+            try:
+                self._sync_conn.close()
+            except Exception as e:
+                logger.debug(f"Error closing connection: {e}")
+            self._sync_conn = None
+
+    async def async_close(self) -> None:
+        r"""Close all async pooled connections and the shared `async_conn`."""
+        if self._async_pool is not None:
+            await self._async_pool.close()
+        if self._async_conn is not None:
+            try:
+                await self._async_conn.close()
+            except Exception as e:
+                logger.debug(f"Error closing connection: {e}")
+            self._async_conn = None
+
     # ==========================================================================
     # Execute
     # ==========================================================================
 
-    def _load_surql(self, filename_or_path: str | Path) -> str:
-        if isinstance(filename_or_path, Path):
-            filename = filename_or_path.name
-            file_path = filename_or_path
-        else:
-            filename = filename_or_path
-            file_path = Path(__file__).parent / "surql" / filename_or_path
-        # check cache
-        cached = self._surql_cache.get(filename)
-        if cached is not None:
-            return cached
-        with open(file_path, "r") as file:
-            return file.read()
-
     def _extract_result_and_time(self, res: Object) -> tuple[Value, float]:
         response = SurrealRawResponse.model_validate(res)
+        for item in response.result or []:
+            if (
+                item.status == "ERR"
+                and isinstance(item.result, str)
+                and is_retryable(item.result)
+            ):
+                raise RetryableError(item.result)
         if response.result:
             first = response.result[0]
             value = cast(Value, first.result)
@@ -249,13 +448,17 @@ class DB:
         vars: Object | None = None,
         template_vars: Object | None = None,
     ) -> tuple[Value, float]:
-        surql = self._load_surql(file)
-        if template_vars is not None:
-            surql = surql.format(**template_vars)
-        res: Object = self.sync_conn.query_raw(
-            surql, cast(dict[str, Value], vars)
-        )
-        return self._extract_result_and_time(res)
+        surql = self.templates.render(file, template_vars)
+
+        def run() -> tuple[Value, float]:
+            with self.connection() as conn:
+                res: Object = conn.query_raw(
+                    surql, cast(dict[str, Value], vars)
+                )
+            return self._extract_result_and_time(res)
+
+        with self.instrumentation.name(self._template_name(file)):
+            return self.retry_policy.call(run, str(file))
 
     async def async_execute(
         self,
@@ -263,12 +466,19 @@ class DB:
         vars: dict[str, Value] | None = None,
         template_vars: Object | None = None,
     ) -> tuple[Value, float]:
-        surql = self._load_surql(file)
-        if template_vars is not None:
-            surql = surql.format(**template_vars)
-        conn = await self.async_conn
-        res: Object = await conn.query_raw(surql, vars)
-        return self._extract_result_and_time(res)
+        surql = self.templates.render(file, template_vars)
+
+        async def run() -> tuple[Value, float]:
+            async with self.async_connection() as conn:
+                res: Object = await conn.query_raw(surql, vars)
+            return self._extract_result_and_time(res)
+
+        with self.instrumentation.name(self._template_name(file)):
+            return await self.retry_policy.async_call(run, str(file))
+
+    @staticmethod
+    def _template_name(file: str | Path) -> str:
+        return file.name if isinstance(file, Path) else file
 
     # ==========================================================================
     # Basic queries
@@ -311,7 +521,12 @@ class DB:
         filtered = db.query(query, where_vars, User)
         ```
         '''
-        return utils.query(self.sync_conn, query, vars, record_type)
+
+        def run() -> list[utils.RecordType]:
+            with self.connection() as conn:
+                return utils.query(conn, query, vars, record_type)
+
+        return self.retry_policy.call(run, query)
 
     def query_one(
         self,
@@ -319,7 +534,12 @@ class DB:
         vars: Object,
         record_type: type[utils.RecordType],
     ) -> utils.RecordType | None:
-        return utils.query_one(self.sync_conn, query, vars, record_type)
+
+        def run() -> utils.RecordType | None:
+            with self.connection() as conn:
+                return utils.query_one(conn, query, vars, record_type)
+
+        return self.retry_policy.call(run, query)
 
     def count(
         self,
@@ -328,16 +548,27 @@ class DB:
         where_vars: Object,
         group_by: str | None = None,
     ) -> int:
-        total_count_query = COUNT_QUERY.format(
+        count_result = self.query_one(
+            self._count_query(table, where_clause, group_by),
+            where_vars,
+            dict[str, int],
+        )
+        return self._extract_count(count_result)
+
+    @staticmethod
+    def _count_query(
+        table: str, where_clause: str, group_by: str | None
+    ) -> str:
+        return COUNT_QUERY.format(
             table=table,
             where_clause=where_clause,
             group_clause="GROUP ALL"
             if group_by is None
             else f"GROUP BY{group_by}",
         )
-        count_result = self.query_one(
-            total_count_query, where_vars, dict[str, int]
-        )
+
+    @staticmethod
+    def _extract_count(count_result: dict[str, int] | None) -> int:
         total_count = count_result.get("count") if count_result else 0
         assert isinstance(total_count, int), (
             f"Expected int, got {type(total_count)}"
@@ -345,16 +576,151 @@ class DB:
         total_count = int(total_count)
         return total_count
 
-    def exists(self, record: RecordID) -> bool:
-        exists = self.sync_conn.query(
-            "RETURN record::exists($record)",
-            {"record": record},
+    def iter_query(
+        self,
+        table: str,
+        where_clause: str,
+        where_vars: Object,
+        record_type: type[utils.RecordType],
+        *,
+        fields: str = "*",
+        page_size: int = 1000,
+    ) -> Iterator[utils.RecordType]:
+        r"""Lazily iterate over the records of `table`, fetching them in pages
+        of `page_size` records ordered by `id`.
+
+        Pages are fetched with `id > $last` (keyset pagination), so memory
+        stays flat and records updated while iterating are neither skipped
+        nor repeated. A connection is only borrowed while fetching a page.
+
+        Args:
+            table (str): The table to iterate over.
+            where_clause (str): Optional `WHERE ...` clause, as built by
+                `WhereClause`.
+            where_vars (Object): The variables used in the where clause.
+            record_type (type[utils.RecordType]): The expected type of the
+                records.
+            fields (str): The projection. Must include `id`.
+            page_size (int): Number of records fetched per query.
+
+        Example:
+        ```python
+        for user in db.iter_query("user", "WHERE active", {}, User):
+            print(user.name)
+        ```
+        """
+        last: Value = None
+        while True:
+            query, vars = self._iter_query_page(
+                table, where_clause, where_vars, fields, page_size, last
+            )
+
+            def run(query: str = query, vars: Object = vars) -> Value:
+                with self.connection() as conn:
+                    return utils._query_aux(conn, query, vars)  # pyright: ignore[reportPrivateUsage]
+
+            rows = self.retry_policy.call(run, query)
+            yield from utils._cast_list(rows, record_type)  # pyright: ignore[reportPrivateUsage]
+            last = self._page_last_id(rows, page_size)
+            if last is None:
+                return
+
+    async def aiter_query(
+        self,
+        table: str,
+        where_clause: str,
+        where_vars: Object,
+        record_type: type[utils.RecordType],
+        *,
+        fields: str = "*",
+        page_size: int = 1000,
+    ) -> AsyncIterator[utils.RecordType]:
+        r"""Async version of `iter_query`."""
+        last: Value = None
+        while True:
+            query, vars = self._iter_query_page(
+                table, where_clause, where_vars, fields, page_size, last
+            )
+
+            async def run(query: str = query, vars: Object = vars) -> Value:
+                async with self.async_connection() as conn:
+                    return await utils._async_query_aux(conn, query, vars)  # pyright: ignore[reportPrivateUsage]
+
+            rows = await self.retry_policy.async_call(run, query)
+            for record in utils._cast_list(rows, record_type):  # pyright: ignore[reportPrivateUsage]
+                yield record
+            last = self._page_last_id(rows, page_size)
+            if last is None:
+                return
+
+    @staticmethod
+    def _iter_query_page(
+        table: str,
+        where_clause: str,
+        where_vars: Object,
+        fields: str,
+        page_size: int,
+        last: Value,
+    ) -> tuple[str, Object]:
+        conditions: list[str] = []
+        where_clause = where_clause.strip()
+        if where_clause:
+            if where_clause[:6].upper() == "WHERE ":
+                where_clause = where_clause[6:]
+            conditions.append(f"({where_clause})")
+        vars: Object = {**where_vars, "iter_limit": page_size}
+        if last is not None:
+            conditions.append("id > $iter_last")
+            vars["iter_last"] = last
+        query = ITER_QUERY.format(
+            fields=fields,
+            table=table,
+            where_clause=f"WHERE {' AND '.join(conditions)}"
+            if conditions
+            else "",
         )
+        return query, vars
+
+    @staticmethod
+    def _page_last_id(rows: Value, page_size: int) -> Value:
+        """The id to continue from, or None if this was the last page."""
+        if not isinstance(rows, list) or len(rows) < page_size:
+            return None
+        last = rows[-1]
+        if not isinstance(last, dict) or last.get("id") is None:
+            raise ValueError("iter_query fields must include `id`")
+        return last["id"]
+
+    def exists(self, record: RecordID) -> bool:
+        def run() -> Value:
+            with self.connection() as conn:
+                return utils._query_aux(  # pyright: ignore[reportPrivateUsage]
+                    conn, "RETURN record::exists($record)", {"record": record}
+                )
+
+        exists = self.retry_policy.call(run, "exists")
         # query return type is wrong, in this case it could return a bool
         if not isinstance(exists, bool):
             return False
         return exists
 
+    def _record_ids(self, query: str, ids: list[RecordID]) -> list[RecordID]:
+        """The ids returned by a `SELECT VALUE id FROM $ids ...` query."""
+
+        def run() -> Value:
+            with self.connection() as conn:
+                return utils._query_aux(  # pyright: ignore[reportPrivateUsage]
+                    conn, query, {"ids": cast(list[Value], ids)}
+                )
+
+        return self._extract_record_ids(self.retry_policy.call(run, query))
+
+    @staticmethod
+    def _extract_record_ids(res: Value) -> list[RecordID]:
+        if not isinstance(res, list):
+            raise RuntimeError(f"Unexpected result from record ids: {res}")
+        return [x for x in res if isinstance(x, RecordID)]
+
     # ==========================================================================
     # Analytics
     # ==========================================================================
@@ -363,34 +729,35 @@ class DB:
         self, key: str, input: str, output: str, score: float, tag: str
     ) -> None:
         try:
-            _res = self.sync_conn.insert(
-                self._analytics_table,
-                asdict(Analytics(key, tag, input, output, score)),
-            )
+            with self.connection() as conn:
+                _res = conn.insert(
+                    self._analytics_table,
+                    asdict(Analytics(key, tag, input, output, score)),
+                )
         except Exception:
             # TODO: log error
             ...
 
     async def safe_insert_error(self, id: int, error: str):
-        conn = await self.async_conn
         try:
-            _ = await conn.query(
-                "CREATE $record CONTENT $content",
-                {
-                    "record": RecordID("error", id),
-                    "content": {"error": error},
-                },
-            )
+            async with self.async_connection() as conn:
+                _ = await conn.query(
+                    "CREATE $record CONTENT $content",
+                    {
+                        "record": RecordID("error", id),
+                        "content": {"error": error},
+                    },
+                )
         except Exception as e:
             print(f"Error inserting error record: {e}", file=sys.stderr)
 
     # TODO: fix if surrealdb.py changes the type for the RecordID identifier
     async def error_exists(self, id: Any) -> bool:  # pyright: ignore[reportExplicitAny, reportAny]
-        conn = await self.async_conn
-        res = await conn.query(
-            "RETURN record::exists($record)",
-            {"record": RecordID("error", id)},
-        )
+        async with self.async_connection() as conn:
+            res = await conn.query(
+                "RETURN record::exists($record)",
+                {"record": RecordID("error", id)},
+            )
         # query return type is wrong, in this case it could return a bool
         if not isinstance(res, bool):
             raise RuntimeError(
@@ -403,30 +770,97 @@ class DB:
     # ==========================================================================
 
     def store_original_document(
-        self, file: str, content_type: str
+        self,
+        file: str,
+        content_type: str,
+        *,
+        chunk_size: int = BLOB_CHUNK_SIZE,
     ) -> tuple[OriginalDocument, bool]:
         """Returns a tuple of the document and a bool indicating whether the
-        document was chached (True) or inserted (False)"""
+        document was chached (True) or inserted (False)
+
+        Files up to `chunk_size` are read once, and hashed and stored from
+        memory. Larger files are streamed: they're hashed with bounded reads,
+        and only uploaded if they're not stored yet, as `chunk_size` blobs
+        (see `iter_original_document`) instead of inline in `file`, so at
+        most `BLOB_BATCH_SIZE` chunks are held in memory."""
 
         source = Path(file)
+        if source.stat().st_size <= chunk_size:
+            return self.store_original_document_from_bytes(
+                source.name, content_type, source.read_bytes()
+            )
+        doc_hash, size = hash_file(source)
+        cached = self._touch_original_document(doc_hash)
+        if cached:
+            return cached, True
+        return self._upload_original_document(
+            source, content_type, doc_hash, size, chunk_size
+        ), False
+
+    def store_original_documents(
+        self,
+        paths: Iterable[str | Path],
+        *,
+        workers: int | None = None,
+        content_type: Callable[[Path], str] = guess_content_type,
+        chunk_size: int = BLOB_CHUNK_SIZE,
+        progress: ProgressCallback | None = None,
+    ) -> StoreReport:
+        """Store many files, e.g. a whole directory tree, and dedupe them by
+        hash.
+
+        Files are hashed in a pool of `workers` processes, the existing ones
+        are found (and updated, to trigger flows) in a single round trip, and
+        only the new ones are uploaded, by `workers` threads. Errors are
+        reported per file instead of being raised.
 
-        # TODO: store files as files instead of bytes
-        #       https://surrealdb.com/docs/surrealql/datamodel/files
-        file_content = bytes()
+        Example:
+        ```python
+        report = db.store_original_documents(
+            Path("docs").rglob("*.md"),
+            workers=8,
+            progress=lambda stage, done, total: print(stage, done, total),
+        )
+        print(len(report.inserted), len(report.cached), report.errors)
+        ```
+        """
+        files = [Path(path) for path in paths]
+        workers = workers or os.cpu_count() or 1
+        report = StoreReport()
+        hashes = hash_files(files, workers, report, progress)
 
-        with open(source, "rb") as f:
-            md5_hash = hashlib.md5()
-            while True:
-                c = f.read(4096)
-                if not c:
-                    break
-                md5_hash.update(c)
-                file_content += c
-            doc_hash = md5_hash.hexdigest()
-
-        return self.store_original_document_from_bytes(
-            source.name, content_type, file_content, doc_hash
+        existing = self._touch_original_documents(
+            list({doc_hash for doc_hash, _ in hashes.values()})
         )
+        uploads: dict[str, Path] = {}
+        for path, (doc_hash, _) in hashes.items():
+            if doc_hash in existing or doc_hash in uploads:
+                report.cached[path] = RecordID(self._files_table, doc_hash)
+            else:
+                uploads[doc_hash] = path
+
+        with ThreadPoolExecutor(workers) as pool:
+            futures = {
+                pool.submit(
+                    self._upload_original_document,
+                    path,
+                    content_type(path),
+                    doc_hash,
+                    hashes[path][1],
+                    chunk_size,
+                ): path
+                for doc_hash, path in uploads.items()
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    report.inserted[path] = future.result().id
+                except Exception as e:
+                    report.errors[path] = str(e)
+                if progress is not None:
+                    progress("upload", done, len(futures))
+        return report
 
     def store_original_document_from_bytes(
         self,
@@ -446,8 +880,18 @@ class DB:
             logger.warning(
                 f"Hash mismatch for {filename}: {hex_hash} != {precomputed_hash}"
             )
-
-        # -- check if the document already exists
+        cached = self._touch_original_document(hex_hash)
+        if cached:
+            return cached, True
+        return self._insert_original_document(
+            filename, content_type, hex_hash, len(file_bytes), file_bytes
+        ), False
+
+    def _touch_original_document(
+        self, hex_hash: str
+    ) -> OriginalDocument | None:
+        """The stored document with this hash, if any, after updating it to
+        trigger flows."""
         record_id = RecordID(self._files_table, hex_hash)
         cached = self.query_one(
             "SELECT * FROM ONLY $record",
@@ -457,24 +901,139 @@ class DB:
         if cached:
             # update the document to trigger process
             _ = self.query_one(
-                "UPDATE ONLY $record", {"record": record_id}, Object
-            )
-            return cached, True
-        else:
-            now = datetime.now()
-            content = OriginalDocument(
-                record_id, filename, content_type, now, now, None, file_bytes
+                "UPDATE ONLY $record", {"record": record_id}, dict
             )
-            inserted = self.query_one(
-                "CREATE ONLY $record CONTENT $content",
-                {"record": record_id, "content": asdict(content)},
-                OriginalDocument,
-            )
-            if not inserted:
-                raise Exception(
-                    "Failed to create document: CREATE returned NONE."
+        return cached
+
+    def _touch_original_documents(
+        self, hashes: list[str], chunk_size: int = 1000
+    ) -> set[str]:
+        """Bulk version of `_touch_original_document`, returning the hashes
+        of the stored documents."""
+        with self.batch() as batch:
+            statements = [
+                batch.add(
+                    "UPDATE (SELECT VALUE id FROM $ids) RETURN VALUE id",
+                    {
+                        "ids": [
+                            RecordID(self._files_table, x)
+                            for x in hashes[start : start + chunk_size]
+                        ]
+                    },
                 )
-            return inserted, False
+                for start in range(0, len(hashes), chunk_size)
+            ]
+        existing: set[str] = set()
+        for statement in statements:
+            for record_id in cast(list[RecordID], statement.result):
+                existing.add(str(record_id.id))  # pyright: ignore[reportAny]
+        return existing
+
+    def _upload_original_document(
+        self,
+        source: Path,
+        content_type: str,
+        hex_hash: str,
+        size: int,
+        chunk_size: int,
+    ) -> OriginalDocument:
+        with open(source, "rb") as f:
+            if size <= chunk_size:
+                return self._insert_original_document(
+                    source.name, content_type, hex_hash, size, f.read()
+                )
+            return self._insert_original_document(
+                source.name,
+                content_type,
+                hex_hash,
+                size,
+                blobs=iter(lambda: f.read(chunk_size), b""),
+            )
+
+    def _insert_original_document(
+        self,
+        filename: str,
+        content_type: str,
+        hex_hash: str,
+        size: int,
+        file_bytes: bytes | None = None,
+        blobs: Iterator[bytes] | None = None,
+    ) -> OriginalDocument:
+        record_id = RecordID(self._files_table, hex_hash)
+        # blobs are written before the file record, so flows triggered by
+        # the file always see all its chunks
+        chunks = None if blobs is None else self._store_blobs(record_id, blobs)
+        now = datetime.now()
+        content = OriginalDocument(
+            record_id,
+            filename,
+            content_type,
+            now,
+            now,
+            None,
+            file_bytes,
+            size=size,
+            chunks=chunks,
+        )
+        inserted = self.query_one(
+            "CREATE ONLY $record CONTENT $content",
+            {"record": record_id, "content": asdict(content)},
+            OriginalDocument,
+        )
+        if not inserted:
+            raise Exception("Failed to create document: CREATE returned NONE.")
+        return inserted
+
+    def _blob_id(self, file: RecordID, index: int) -> RecordID:
+        return RecordID(self._blobs_table, [file.id, index])
+
+    def _store_blobs(self, file: RecordID, blobs: Iterator[bytes]) -> int:
+        """Store the chunks of `file`, `BLOB_BATCH_SIZE` per round trip."""
+        count = 0
+        for chunks in batched(blobs, BLOB_BATCH_SIZE):
+            with self.batch() as batch:
+                for data in chunks:
+                    _ = batch.add(
+                        "UPSERT $blob CONTENT $content RETURN NONE",
+                        {
+                            "blob": self._blob_id(file, count),
+                            "content": {
+                                "file": file,
+                                "index": count,
+                                "data": data,
+                            },
+                        },
+                    )
+                    count += 1
+            batch.raise_for_errors()
+        return count
+
+    def iter_original_document(
+        self, document: OriginalDocument
+    ) -> Iterator[bytes]:
+        """Stream the content of a stored file, one chunk at a time."""
+        if document.file is not None:
+            yield document.file
+            return
+        for index in range(document.chunks or 0):
+
+            def read(index: int = index) -> bytes:
+                with self.connection() as conn:
+                    data = conn.query(
+                        "SELECT VALUE data FROM ONLY $blob",
+                        {"blob": self._blob_id(document.id, index)},
+                    )
+                if not isinstance(data, bytes):
+                    raise RuntimeError(
+                        f"Missing chunk {index} of {document.id}: {data}"
+                    )
+                return data
+
+            yield self.retry_policy.call(read, "iter_original_document")
+
+    def read_original_document(self, document: OriginalDocument) -> bytes:
+        """The content of a stored file, including the chunked ones."""
+        return b"".join(self.iter_original_document(document))
 
     # ==========================================================================
     # Documents (or more precisely: chunks)
@@ -483,11 +1042,11 @@ class DB:
     async def get_document(
         self, doc_type: type[GenericDocument], id: int
     ) -> GenericDocument | None:
-        conn = await self.async_conn
-        res = await conn.query(
-            "SELECT * FROM ONLY $record",
-            {"record": RecordID(self._vector_table, id)},
-        )
+        async with self.async_connection() as conn:
+            res = await conn.query(
+                "SELECT * FROM ONLY $record",
+                {"record": RecordID(self._vector_table, id)},
+            )
         if not res:
             return None
         if not isinstance(res, dict):
@@ -502,17 +1061,17 @@ class DB:
         start_after: int = 0,
         limit: int = 100,
     ) -> list[GenericDocument]:
-        conn = await self.async_conn
-        if start_after == 0:
-            res = await conn.query(
-                f"SELECT * FROM {self._vector_table} ORDER BY id LIMIT $limit",
-                {"limit": limit},
-            )
-        else:
-            res = await conn.query(
-                f"SELECT * FROM type::record({self._vector_table}, $start_after..) ORDER BY id LIMIT $limit",
-                {"limit": limit, "start_after": start_after},
-            )
+        async with self.async_connection() as conn:
+            if start_after == 0:
+                res = await conn.query(
+                    f"SELECT * FROM {self._vector_table} ORDER BY id LIMIT $limit",
+                    {"limit": limit},
+                )
+            else:
+                res = await conn.query(
+                    f"SELECT * FROM type::record({self._vector_table}, $start_after..) ORDER BY id LIMIT $limit",
+                    {"limit": limit, "start_after": start_after},
+                )
         if not isinstance(res, list):
             raise RuntimeError(
                 f"Unexpected result from list_documents: {type(res)}"
@@ -530,13 +1089,13 @@ class DB:
         id: int | str | None = None,
         table: str | None = None,
     ) -> None:
-        conn = await self.async_conn
         if not table:
             table = self._vector_table
-        _ = await conn.create(
-            table if id is None else RecordID(table, id),
-            document.model_dump(by_alias=True),
-        )
+        async with self.async_connection() as conn:
+            _ = await conn.create(
+                table if id is None else RecordID(table, id),
+                document.model_dump(by_alias=True),
+            )
 
     # TODO: should we merge insert_document and _insert_embedded together?
     def insert_document(
@@ -550,9 +1109,10 @@ class DB:
         data_dict = document.model_dump(by_alias=True)
         if id is not None and data_dict["id"]:
             del data_dict["id"]
-        res = self.sync_conn.create(
-            table if id is None else RecordID(table, id), data_dict
-        )
+        with self.connection() as conn:
+            res = conn.create(
+                table if id is None else RecordID(table, id), data_dict
+            )
         if isinstance(res, list):
             raise RuntimeError(f"Unexpected result from insert_document: {res}")
         return type(document).model_validate(res)
@@ -568,9 +1128,10 @@ class DB:
         data_dict = document.model_dump()
         if id is not None and data_dict["id"]:
             del data_dict["id"]
-        res = self.sync_conn.create(
-            table if id is None else RecordID(table, id), data_dict
-        )
+        with self.connection() as conn:
+            res = conn.create(
+                table if id is None else RecordID(table, id), data_dict
+            )
         if isinstance(res, list):
             raise RuntimeError(
                 f"Unexpected result from _inserted_embedded: {res} with {table}:{id}"
@@ -613,36 +1174,86 @@ class DB:
         docs: list[GenericDocument],
         ids: list[str],
         table: str | None = None,
+        *,
+        chunk_size: int = 500,
     ) -> list[GenericDocument]:
+        r"""Embed and insert the documents that don't exist yet, and return
+        the inserted ones.
+
+        Existing records are found with a single query, and the new ones are
+        inserted with one `INSERT` per `chunk_size` documents.
+        """
         if self.embedder is None:
             raise ValueError("Embedder is not initialized")
         if not table:
             table = self._vector_table
-        texts: list[str] = []
-        idxs: list[int] = []
+        record_ids = [RecordID(table, id) for id in ids]
+        existing = self._record_ids(EXISTING_RECORDS_QUERY, record_ids)
+        idxs = self._new_docs(docs, record_ids, existing)
+        if not idxs:
+            return []
+
+        embeddings = self.embedder.embed_batch([docs[i].content for i in idxs])
+        rows = self._embedded_rows(
+            docs, ids, table, idxs, embeddings, self.embedder
+        )
         results: list[GenericDocument] = []
-
-        for i, (id, doc) in enumerate(zip(ids, docs)):
-            rec_id = RecordID(table, id)
-            existing = self.query_one(
-                "SELECT * FROM ONLY $record",
-                {"record": rec_id},
-                type(doc),
+        for start in range(0, len(rows), chunk_size):
+            results.extend(
+                self.query(
+                    f"INSERT INTO {table} $docs",
+                    {"docs": rows[start : start + chunk_size]},
+                    type(docs[0]),
+                )
             )
-            if not existing and doc.content:
-                texts.append(doc.content)
-                idxs.append(i)
-            else:
+        return results
+
+    @staticmethod
+    def _new_docs(
+        docs: list[GenericDocument],
+        record_ids: list[RecordID],
+        existing: list[RecordID],
+    ) -> list[int]:
+        """Indexes of the docs with content that are not in `existing` (nor
+        repeated in `record_ids`)."""
+        # RecordID isn't hashable, its string form is
+        seen = {str(x) for x in existing}
+        idxs: list[int] = []
+        for i, (record_id, doc) in enumerate(zip(record_ids, docs)):
+            key = str(record_id)
+            if key in seen or not doc.content:
                 continue
+            seen.add(key)
+            idxs.append(i)
+        return idxs
 
-        embeddings = self.embedder.embed_batch(texts)
+    @staticmethod
+    def _embedded_rows(
+        docs: list[GenericDocument],
+        ids: list[str],
+        table: str,
+        idxs: list[int],
+        embeddings: Sequence[Sequence[float]] | EmbeddingBatch,
+        embedder: Embedder,
+    ) -> list[Value]:
+        rows: list[Value] = []
         for i, embedding in zip(idxs, embeddings):
-            embedded_doc = docs[i]
-            embedded_doc.embedding = list(embedding)
-            res = self._insert_embedded(embedded_doc, ids[i], table)
-            results.append(res)
-
-        return results
+            doc = docs[i]
+            doc.embedding = to_format(embedding, embedder.embedding_format)
+            row = doc.model_dump()
+            row["id"] = RecordID(table, ids[i])
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _projection(fields: str, omit: Sequence[str]) -> dict[str, str]:
+        """Template vars for the projection of vector and graph queries.
+        Embeddings are omitted by default, so they're not sent back with
+        every result."""
+        return {
+            "fields": fields,
+            "omit_clause": f"OMIT {', '.join(omit)}" if omit else "",
+        }
 
     def _extract_similarity_results(
         self, res: Value, doc_type: type[GenericDocument]
@@ -668,68 +1279,122 @@ class DB:
         k: int,
         score_threshold: float = -1,
         effort: int | None = 40,
+        fields: str = "*",
+        omit: Sequence[str] = ("embedding",),
+        rerank: int | None = None,
     ) -> tuple[list[tuple[GenericDocument, float]], float]:
+        """Vector search of `text`. With a quantized embedder and `rerank`,
+        `rerank` × `k` candidates are fetched from the int8 index and
+        re-scored with the float embedding of `text`."""
         if self.embedder is None:
             raise ValueError("Embedder is not initialized")
-        embedding = self.embedder.embed(text)
+        quantizer = self.embedder.quantizer
+        if quantizer is None:
+            query = embedding = self.embedder.embed(text)
+        else:
+            query = self.embedder.embed(text, quantize=False)
+            embedding = quantizer.quantize(query)
+        reranks = bool(rerank) and quantizer is not None
         res, time = self.execute(
             "vector_search.surql",
             {
-                "embedding": cast(list[Value], embedding),
+                "embedding": cast(list[Value], to_list(embedding)),
                 "threshold": score_threshold,
             },
             {
                 "table": table,
-                "k": k,
+                "k": k * (rerank or 1) if reranks else k,
                 "effort_param": f",{effort}" if effort is not None else "",
+                **self._projection(fields, () if reranks else omit),
             },
         )
-        return self._extract_similarity_results(res, doc_type), time
+        results = self._extract_similarity_results(res, doc_type)
+        if reranks:
+            results = self._rerank(query, results, k, omit)
+        return results, time
+
+    def _rerank(
+        self,
+        query: EmbeddingVector,
+        results: list[tuple[GenericDocument, float]],
+        k: int,
+        omit: Sequence[str],
+    ) -> list[tuple[GenericDocument, float]]:
+        """Re-score int8 search results with the float query embedding."""
+        assert self.embedder is not None and self.embedder.quantizer is not None
+        quantizer = self.embedder.quantizer
+        for doc, _ in results:
+            if doc.embedding is not None:
+                doc.embedding = quantizer.dequantize(doc.embedding)
+        top = rescore(query, results, k)
+        if "embedding" in omit:
+            for doc, _ in top:
+                doc.embedding = None
+        return top
 
     def vector_search(
         self,
         doc_type: type[GenericDocument],
-        query_embeddings: list[float],
+        query_embeddings: EmbeddingVector,
         *,
         table: str | None = None,
         k: int = 5,
         effort: None = None,
         threshold: float = 0,
+        fields: str = "*",
+        omit: Sequence[str] = ("embedding",),
     ) -> tuple[list[tuple[GenericDocument, float]], float]:
         res, time = self.execute(
             "vector_search.surql",
             {
-                "embedding": cast(list[Value], query_embeddings),
+                "embedding": cast(list[Value], to_list(query_embeddings)),
                 "threshold": threshold,
             },
             {
                 "k": k,
                 "table": table if table is not None else self._vector_table,
                 "effort_param": f",{effort}" if effort else "",
+                **self._projection(fields, omit),
             },
         )
         return self._extract_similarity_results(res, doc_type), time
 
+    def exact_index(
+        self,
+        doc_type: type[GenericDocument],
+        table: str,
+        *,
+        updated_field: str | None = None,
+    ) -> ExactIndex[GenericDocument]:
+        """Load an in-process exact vector search index over the embeddings
+        of `table`, see `ExactIndex`. Requires numpy."""
+        index = ExactIndex(self, doc_type, table, updated_field=updated_field)
+        index.load()
+        return index
+
     async def async_vector_search(
         self,
         doc_type: type[GenericDocument],
-        query_embeddings: list[float],
+        query_embeddings: EmbeddingVector,
         *,
         table: str | None = None,
         k: int = 5,
         effort: None = None,
         threshold: float = 0,
+        fields: str = "*",
+        omit: Sequence[str] = ("embedding",),
     ) -> tuple[list[tuple[GenericDocument, float]], float]:
         res, time = await self.async_execute(
             "vector_search.surql",
             {
-                "embedding": cast(list[Value], query_embeddings),
+                "embedding": cast(list[Value], to_list(query_embeddings)),
                 "threshold": threshold,
             },
             {
                 "k": k,
                 "table": table if table is not None else self._vector_table,
                 "effort_param": f",{effort}" if effort else "",
+                **self._projection(fields, omit),
             },
         )
         return self._extract_similarity_results(res, doc_type), time
@@ -744,13 +1409,113 @@ class DB:
         relation: str,
         out: RecordID | list[RecordID],
     ) -> None:
+        r"""Relate `in_` to each `out`, with `relate_many`: one
+        `INSERT RELATION` for all the edges, skipping the existing ones."""
         all = [out] if not isinstance(out, list) else out
-        for out in all:
-            _res = self.sync_conn.insert_relation(
-                relation, {"in": in_, "out": out}
+        _ = self.relate_many([(in_, relation, out) for out in all])
+
+    def relate_many(
+        self, edges: Iterable[Edge], *, chunk_size: int = 1000
+    ) -> RelateReport:
+        r"""Insert `(in, relation, out)` edges in bulk, skipping the ones that
+        already exist.
+
+        Repeated edges are dropped client-side, and the existing ones are
+        found with one query per relation. The new edges are sent with one
+        `INSERT RELATION` per `chunk_size` edges, in a single round trip. If a
+        chunk conflicts with the relation unique index (e.g. a concurrent
+        writer), its edges are inserted one by one and the conflicting ones
+        are skipped.
+
+        Raises:
+            BatchError: If inserts failed for another reason.
+
+        Example:
+        ```python
+        report = db.relate_many(
+            (RecordID("file", f), "has_keyword", RecordID("keyword", k))
+            for f, k in pairs
+        )
+        print(report.inserted, report.skipped)
+        ```
+        """
+        report = RelateReport()
+        edge_set = EdgeSet(edges, report)
+        if not edge_set.relations:
+            return report
+        with self.batch() as batch:
+            existing = {
+                relation: batch.add(
+                    EXISTING_EDGES_QUERY.format(relation=relation),
+                    edge_set.existing_vars(relation),
+                )
+                for relation in edge_set.relations
+            }
+        for relation, statement in existing.items():
+            edge_set.drop_existing(relation, statement.result)
+
+        chunks = edge_set.chunks(chunk_size)
+        batch = self.batch()
+        for relation, chunk in chunks:
+            vars: Object = {"edges": chunk}
+            _ = batch.add(
+                f"INSERT RELATION INTO {relation} $edges RETURN NONE", vars
             )
-        # TODO: batch relate when supported
-        # _res = self.sync_conn.query("relate $in->$rel->$out", {"in":in_, "out":out, "rel":relation})
+        errors: list[str] = []
+        retry = self.batch()
+        for (relation, chunk), result in zip(chunks, batch.send()):
+            if result.error is None:
+                report.inserted += len(chunk)
+            elif is_conflict(result.error):
+                for edge in chunk:
+                    _ = retry.add(
+                        f"INSERT RELATION INTO {relation} $edge RETURN NONE",
+                        {"edge": edge},
+                    )
+            else:
+                errors.append(result.error)
+        for result in retry.send():
+            if result.error is None:
+                report.inserted += 1
+            elif is_conflict(result.error):
+                report.existing += 1
+            else:
+                errors.append(result.error)
+        if errors:
+            raise BatchError(list(enumerate(errors)))
+        return report
+
+    def upsert_nodes(
+        self, table: str, nodes: list[Node], *, chunk_size: int = 500
+    ) -> UpsertReport:
+        r"""Upsert graph nodes, keyed by their content, with one
+        `INSERT ... ON DUPLICATE KEY UPDATE` per `chunk_size` nodes, in a
+        single round trip.
+
+        A chunk that fails is retried node by node, so the report lists the
+        nodes that failed, with their error.
+        """
+        report = UpsertReport()
+        chunks = node_chunks(table, nodes, chunk_size)
+        query = NODE_UPSERT_QUERY.format(table=table)
+        batch = self.batch()
+        for _, rows in chunks:
+            _ = batch.add(query, {"nodes": rows})
+        failed: list[Node] = []
+        retry = self.batch()
+        for (chunk, rows), result in zip(chunks, batch.send()):
+            if result.error is None:
+                report.upserted += len(chunk)
+                continue
+            for node, row in zip(chunk, rows):
+                failed.append(node)
+                _ = retry.add(query, {"nodes": [row]})
+        for node, result in zip(failed, retry.send()):
+            if result.error is None:
+                report.upserted += 1
+            else:
+                report.errors.append((node, result.error))
+        return report
 
     def _add_graph_nodes(
         self,
@@ -760,26 +1525,28 @@ class DB:
         edge_name: str,
         relations: Relations,
     ) -> None:
-        for dest in destinations:
-            node = asdict(dest)
-            try:
-                res = self.sync_conn.upsert(
-                    RecordID(dest_table, dest.content), node
-                )
-                if isinstance(res, str):
-                    # if the result is a string, it's an error
-                    raise RuntimeError(f"Node upsert error: {res}")
-            except Exception as e:
-                logger.error(f"Failed: {e} with {node}")
-        for doc_id, cats in relations.items():
-            try:
-                self.relate(
+        # nodes are upserted in bulk first, then the edges
+        try:
+            upserts = self.upsert_nodes(dest_table, destinations)
+        except Exception as e:
+            # the edges to the nodes that already exist can still be added
+            logger.error(f"Failed: {e}")
+        else:
+            for dest, error in upserts.errors:
+                logger.error(f"Failed: {error} with {asdict(dest)}")
+        try:
+            report = self.relate_many(
+                (
                     RecordID(src_table, doc_id),
                     edge_name,
-                    [RecordID(dest_table, cat) for cat in cats],
+                    RecordID(dest_table, cat),
                 )
-            except Exception as e:
-                logger.error(f"Failed: {e}")
+                for doc_id, cats in relations.items()
+                for cat in cats
+            )
+            logger.debug(f"{edge_name}: {report}")
+        except Exception as e:
+            logger.error(f"Failed: {e}")
 
     def add_graph_nodes(
         self,
@@ -807,20 +1574,25 @@ class DB:
     ) -> None:
         """This function creates records for the destination nodes, assumes the
         source nodes already exist. Source nodes are represented by the keys in
-        the `relations` dictionary."""
+        the `relations` dictionary.
+
+        Destination nodes that already have an embedding are only related:
+        they are not embedded nor written again. The missing ones are
+        embedded with a single `embed_batch` call."""
         if self.embedder is None:
             raise ValueError("Embedder is not initialized")
 
-        # all relations values combines
-        destinations: set[str] = set()
-        for x in relations.values():
-            destinations.update(x)
-
-        node_destinations = [
-            Node(dest, self.embedder.embed(dest))
-            for dest in destinations
-            if dest
-        ]
+        destinations = self._graph_destinations(relations)
+        existing = self._record_ids(
+            EMBEDDED_RECORDS_QUERY,
+            [RecordID(dest_table, dest) for dest in destinations],
+        )
+        missing = self._missing_nodes(destinations, dest_table, existing)
+        node_destinations = self._embedded_nodes(
+            missing,
+            self.embedder.embed_batch(missing) if missing else [],
+            self.embedder,
+        )
         return self._add_graph_nodes(
             src_table,
             dest_table,
@@ -829,6 +1601,39 @@ class DB:
             relations,
         )
 
+    @staticmethod
+    def _graph_destinations(relations: Relations) -> list[str]:
+        """All the (non-empty) destinations of `relations`."""
+        destinations: set[str] = set()
+        for x in relations.values():
+            destinations.update(x)
+        return sorted(dest for dest in destinations if dest)
+
+    @staticmethod
+    def _missing_nodes(
+        destinations: list[str],
+        dest_table: str,
+        existing: list[RecordID],
+    ) -> list[str]:
+        """Destinations without an embedded node in `existing`."""
+        embedded = {str(x) for x in existing}
+        return [
+            dest
+            for dest in destinations
+            if str(RecordID(dest_table, dest)) not in embedded
+        ]
+
+    @staticmethod
+    def _embedded_nodes(
+        contents: list[str],
+        embeddings: Sequence[Sequence[float]] | EmbeddingBatch,
+        embedder: Embedder,
+    ) -> list[Node]:
+        return [
+            Node(content, to_format(embedding, embedder.embedding_format))
+            for content, embedding in zip(contents, embeddings)
+        ]
+
     def recursive_graph_query(
         self,
         doc_type: type[GenericDocument],
@@ -836,14 +1641,28 @@ class DB:
         rel: str,
         levels: int = 5,
     ) -> list[RecursiveResult[GenericDocument]]:
+        query = self._recursive_graph_surql(rel, levels)
+        with self.connection() as conn:
+            res = conn.query(query, {"record": id})
+        return self._extract_recursive_results(res, doc_type, levels, query)
+
+    @staticmethod
+    def _recursive_graph_surql(rel: str, levels: int) -> str:
         rels = ", ".join(
             [
                 f"@.{{{i}}}(->{rel}->?) AS bucket{i}"
                 for i in range(1, levels + 1)
             ]
         )
-        query = f"SELECT *, {rels} FROM $record"
-        res = self.sync_conn.query(query, {"record": id})
+        return f"SELECT *, {rels} FROM $record"
+
+    @staticmethod
+    def _extract_recursive_results(
+        res: Value,
+        doc_type: type[GenericDocument],
+        levels: int,
+        query: str,
+    ) -> list[RecursiveResult[GenericDocument]]:
         if not isinstance(res, list):
             raise RuntimeError(
                 f"Unexpected result from recursive_graph_query: {res} with {query}"
@@ -872,15 +1691,24 @@ class DB:
         id: RecordID | list[RecordID],
         rel: str,
         src: str,
-        embedding: list[float] | None,
+        embedding: EmbeddingVector | None,
+        *,
+        fields: str = "*",
+        omit: Sequence[str] = ("embedding",),
     ) -> tuple[list[GenericDocument], float]:
         res, time = self.execute(
             "graph_query_in.surql",
             {
                 "record": cast(RecordID, id),
-                "embedding": cast(list[Value], embedding),
+                "embedding": None
+                if embedding is None
+                else cast(list[Value], to_list(embedding)),
+            },
+            {
+                "relation": rel,
+                "src": src,
+                **self._projection(fields, omit),
             },
-            {"relation": rel, "src": src},
         )
         if isinstance(res, list):
             return list(map(lambda x: doc_type.model_validate(x), res)), time
@@ -893,6 +1721,9 @@ class DB:
         relation: str,
         src: str,
         dest: str,
+        *,
+        fields: str = "*",
+        omit: Sequence[str] = ("embedding",),
     ) -> tuple[list[GenericDocument], float]:
         res, time = self.execute(
             "graph_siblings.surql",
@@ -901,6 +1732,7 @@ class DB:
                 "relation": relation,
                 "src": src,
                 "dest": dest,
+                **self._projection(fields, omit),
             },
         )
         if isinstance(res, list):
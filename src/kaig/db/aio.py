@@ -0,0 +1,597 @@
+import logging
+from collections.abc import AsyncIterator, Iterable, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import cast
+
+from surrealdb import RecordID, Value
+
+from ..definitions import (
+    Analytics,
+    GenericDocument,
+    Node,
+    Object,
+    RecursiveResult,
+    Relations,
+)
+from ..vectors import EmbeddingVector, to_list
+from .batch import BatchError
+from .protocols import AsyncBackend, AsyncConnection
+from .queries import (
+    EMBEDDED_RECORDS_QUERY,
+    EXISTING_EDGES_QUERY,
+    EXISTING_RECORDS_QUERY,
+    NODE_UPSERT_QUERY,
+)
+from .relations import (
+    Edge,
+    EdgeSet,
+    RelateReport,
+    UpsertReport,
+    is_conflict,
+    node_chunks,
+)
+from .retry import RetryableError, is_retryable
+from .utils import (
+    RecordType,
+    _async_query_aux,  # pyright: ignore[reportPrivateUsage]
+    async_query,
+    async_query_one,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDB:
+    """
+    Async facade mirroring the sync `DB` API. Get one with `db.aio`; it shares
+    the configuration (tables, embedder, llm...) of the `DB` it wraps, and
+    borrows connections from its async connection pool.
+
+    Embedding calls use the embedder's native async API (`aembed`,
+    `aembed_batch`), so they don't block the event loop.
+
+    Example:
+    ```python
+    users = await db.aio.query("SELECT * FROM user", {}, User)
+    ```
+    """
+
+    def __init__(self, db: AsyncBackend):
+        self.db: AsyncBackend = db
+
+    @asynccontextmanager
+    async def connection(
+        self,
+    ) -> AsyncIterator[AsyncConnection]:
+        async with self.db.async_connection() as conn:
+            yield conn
+
+    async def _embed(self, text: str) -> EmbeddingVector:
+        if self.db.embedder is None:
+            raise ValueError("Embedder is not initialized")
+        return await self.db.embedder.aembed(text)
+
+    # ==========================================================================
+    # Execute
+    # ==========================================================================
+
+    async def execute(
+        self,
+        file: str | Path,
+        vars: Object | None = None,
+        template_vars: Object | None = None,
+    ) -> tuple[Value, float]:
+        return await self.db.async_execute(
+            file, cast(dict[str, Value] | None, vars), template_vars
+        )
+
+    # ==========================================================================
+    # Basic queries
+    # ==========================================================================
+
+    async def query(
+        self,
+        query: str,
+        vars: Object,
+        record_type: type[RecordType],
+    ) -> list[RecordType]:
+        r"""Async version of `DB.query`."""
+
+        async def run() -> list[RecordType]:
+            async with self.connection() as conn:
+                return await async_query(conn, query, vars, record_type)
+
+        return await self.db.retry_policy.async_call(run, query)
+
+    async def query_one(
+        self,
+        query: str,
+        vars: Object,
+        record_type: type[RecordType],
+    ) -> RecordType | None:
+        async def run() -> RecordType | None:
+            async with self.connection() as conn:
+                return await async_query_one(conn, query, vars, record_type)
+
+        return await self.db.retry_policy.async_call(run, query)
+
+    async def count(
+        self,
+        table: str,
+        where_clause: str,
+        where_vars: Object,
+        group_by: str | None = None,
+    ) -> int:
+        count_result = await self.query_one(
+            self.db._count_query(table, where_clause, group_by),  # pyright: ignore[reportPrivateUsage]
+            where_vars,
+            dict[str, int],
+        )
+        return self.db._extract_count(count_result)  # pyright: ignore[reportPrivateUsage]
+
+    def iter_query(
+        self,
+        table: str,
+        where_clause: str,
+        where_vars: Object,
+        record_type: type[RecordType],
+        *,
+        fields: str = "*",
+        page_size: int = 1000,
+    ) -> AsyncIterator[RecordType]:
+        r"""Async version of `DB.iter_query`.
+
+        Example:
+        ```python
+        async for user in db.aio.iter_query("user", "", {}, User):
+            print(user.name)
+        ```
+        """
+        return self.db.aiter_query(
+            table,
+            where_clause,
+            where_vars,
+            record_type,
+            fields=fields,
+            page_size=page_size,
+        )
+
+    async def exists(self, record: RecordID) -> bool:
+        async def run() -> Value:
+            async with self.connection() as conn:
+                return await _async_query_aux(
+                    conn, "RETURN record::exists($record)", {"record": record}
+                )
+
+        exists = await self.db.retry_policy.async_call(run, "exists")
+        # query return type is wrong, in this case it could return a bool
+        if not isinstance(exists, bool):
+            return False
+        return exists
+
+    async def _record_ids(
+        self, query: str, ids: list[RecordID]
+    ) -> list[RecordID]:
+        async def run() -> Value:
+            async with self.connection() as conn:
+                return await _async_query_aux(
+                    conn, query, {"ids": cast(list[Value], ids)}
+                )
+
+        res = await self.db.retry_policy.async_call(run, query)
+        return self.db._extract_record_ids(res)  # pyright: ignore[reportPrivateUsage]
+
+    # ==========================================================================
+    # Analytics
+    # ==========================================================================
+
+    async def insert_analytics_data(
+        self, key: str, input: str, output: str, score: float, tag: str
+    ) -> None:
+        try:
+            async with self.connection() as conn:
+                _res = await conn.insert(
+                    self.db._analytics_table,  # pyright: ignore[reportPrivateUsage]
+                    asdict(Analytics(key, tag, input, output, score)),
+                )
+        except Exception as e:
+            logger.debug(f"Error inserting analytics data: {e}")
+
+    # ==========================================================================
+    # Vector store
+    # ==========================================================================
+
+    async def _create(
+        self, table: str, id: int | str | None, data_dict: dict[str, Value]
+    ) -> Value:
+        if id is not None and data_dict.get("id"):
+            del data_dict["id"]
+        async with self.connection() as conn:
+            return await conn.create(
+                table if id is None else RecordID(table, id), data_dict
+            )
+
+    async def insert_document(
+        self,
+        document: GenericDocument,
+        id: int | str | None = None,
+        table: str | None = None,
+    ) -> GenericDocument:
+        table = table or self.db._vector_table  # pyright: ignore[reportPrivateUsage]
+        res = await self._create(table, id, document.model_dump(by_alias=True))
+        if isinstance(res, list):
+            raise RuntimeError(f"Unexpected result from insert_document: {res}")
+        return type(document).model_validate(res)
+
+    async def _insert_embedded(
+        self,
+        document: GenericDocument,
+        id: int | str | None = None,
+        table: str | None = None,
+    ) -> GenericDocument:
+        table = table or self.db._vector_table  # pyright: ignore[reportPrivateUsage]
+        res = await self._create(table, id, document.model_dump())
+        if isinstance(res, list):
+            raise RuntimeError(
+                f"Unexpected result from _inserted_embedded: {res} with {table}:{id}"
+            )
+        return type(document).model_validate(res, by_alias=True)
+
+    async def embed_and_insert(
+        self,
+        doc: GenericDocument,
+        table: str | None = None,
+        id: int | str | None = None,
+        force: bool = False,
+    ) -> GenericDocument:
+        if self.db.embedder is None:
+            raise ValueError("Embedder is not initialized")
+        table = table or self.db._vector_table  # pyright: ignore[reportPrivateUsage]
+        if id is not None and not force:
+            existing = await self.query_one(
+                "SELECT * FROM ONLY $record",
+                {"record": RecordID(table, id)},
+                type(doc),
+            )
+            if existing:
+                return existing
+        if doc.content:
+            doc.embedding = await self._embed(doc.content)
+            return await self._insert_embedded(doc, id, table)
+        else:
+            return await self.insert_document(doc, id, table)
+
+    async def embed_and_insert_batch(
+        self,
+        docs: list[GenericDocument],
+        ids: list[str],
+        table: str | None = None,
+        *,
+        chunk_size: int = 500,
+    ) -> list[GenericDocument]:
+        embedder = self.db.embedder
+        if embedder is None:
+            raise ValueError("Embedder is not initialized")
+        table = table or self.db._vector_table  # pyright: ignore[reportPrivateUsage]
+        record_ids = [RecordID(table, id) for id in ids]
+        existing = await self._record_ids(EXISTING_RECORDS_QUERY, record_ids)
+        idxs = self.db._new_docs(docs, record_ids, existing)  # pyright: ignore[reportPrivateUsage]
+        if not idxs:
+            return []
+
+        embeddings = await embedder.aembed_batch(
+            [docs[i].content for i in idxs]
+        )
+        rows = self.db._embedded_rows(  # pyright: ignore[reportPrivateUsage]
+            docs, ids, table, idxs, embeddings, embedder
+        )
+        results: list[GenericDocument] = []
+        for start in range(0, len(rows), chunk_size):
+            results.extend(
+                await self.query(
+                    f"INSERT INTO {table} $docs",
+                    {"docs": rows[start : start + chunk_size]},
+                    type(docs[0]),
+                )
+            )
+        return results
+
+    async def vector_search(
+        self,
+        doc_type: type[GenericDocument],
+        query_embeddings: EmbeddingVector,
+        *,
+        table: str | None = None,
+        k: int = 5,
+        effort: None = None,
+        threshold: float = 0,
+        fields: str = "*",
+        omit: Sequence[str] = ("embedding",),
+    ) -> tuple[list[tuple[GenericDocument, float]], float]:
+        return await self.db.async_vector_search(
+            doc_type,
+            query_embeddings,
+            table=table,
+            k=k,
+            effort=effort,
+            threshold=threshold,
+            fields=fields,
+            omit=omit,
+        )
+
+    async def vector_search_from_text(
+        self,
+        doc_type: type[GenericDocument],
+        text: str,
+        *,
+        table: str,
+        k: int,
+        score_threshold: float = -1,
+        effort: int | None = 40,
+        fields: str = "*",
+        omit: Sequence[str] = ("embedding",),
+        rerank: int | None = None,
+    ) -> tuple[list[tuple[GenericDocument, float]], float]:
+        if self.db.embedder is None:
+            raise ValueError("Embedder is not initialized")
+        quantizer = self.db.embedder.quantizer
+        if quantizer is None:
+            query = embedding = await self._embed(text)
+        else:
+            query = await self.db.embedder.aembed(text, quantize=False)
+            embedding = quantizer.quantize(query)
+        reranks = bool(rerank) and quantizer is not None
+        res, time = await self.execute(
+            "vector_search.surql",
+            {
+                "embedding": cast(list[Value], to_list(embedding)),
+                "threshold": score_threshold,
+            },
+            {
+                "table": table,
+                "k": k * (rerank or 1) if reranks else k,
+                "effort_param": f",{effort}" if effort is not None else "",
+                **self.db._projection(fields, () if reranks else omit),  # pyright: ignore[reportPrivateUsage]
+            },
+        )
+        results = self.db._extract_similarity_results(res, doc_type)  # pyright: ignore[reportPrivateUsage]
+        if reranks:
+            results = self.db._rerank(query, results, k, omit)  # pyright: ignore[reportPrivateUsage]
+        return results, time
+
+    # ==========================================================================
+    # Graph
+    # ==========================================================================
+
+    async def relate(
+        self,
+        in_: RecordID,
+        relation: str,
+        out: RecordID | list[RecordID],
+    ) -> None:
+        r"""Relate `in_` to each `out`, with `relate_many`: one
+        `INSERT RELATION` for all the edges, skipping the existing ones."""
+        all = [out] if not isinstance(out, list) else out
+        _ = await self.relate_many([(in_, relation, out) for out in all])
+
+    async def _statement(
+        self,
+        conn: AsyncConnection,
+        query: str,
+        vars: Object,
+    ) -> Value:
+        """Run a single statement on `conn`, with the DB retry policy.
+        Statement errors are returned as a string, like `conn.query`."""
+
+        async def attempt() -> Value:
+            res = await conn.query(query, dict(vars))
+            if isinstance(res, str) and is_retryable(res):
+                raise RetryableError(res)
+            return res
+
+        return await self.db.retry_policy.async_call(attempt, query)
+
+    async def relate_many(
+        self, edges: Iterable[Edge], *, chunk_size: int = 1000
+    ) -> RelateReport:
+        r"""Async version of `DB.relate_many`. Statements are sent one by
+        one, on the same connection."""
+        report = RelateReport()
+        edge_set = EdgeSet(edges, report)
+        errors: list[str] = []
+        async with self.connection() as conn:
+            for relation in list(edge_set.relations):
+                edge_set.drop_existing(
+                    relation,
+                    await self._statement(
+                        conn,
+                        EXISTING_EDGES_QUERY.format(relation=relation),
+                        edge_set.existing_vars(relation),
+                    ),
+                )
+            for relation, chunk in edge_set.chunks(chunk_size):
+                insert = f"INSERT RELATION INTO {relation} $edges RETURN NONE"
+                vars: Object = {"edges": chunk}
+                res = await self._statement(conn, insert, vars)
+                if not isinstance(res, str):
+                    report.inserted += len(chunk)
+                    continue
+                if not is_conflict(res):
+                    errors.append(res)
+                    continue
+                for edge in chunk:
+                    res = await self._statement(conn, insert, {"edges": [edge]})
+                    if not isinstance(res, str):
+                        report.inserted += 1
+                    elif is_conflict(res):
+                        report.existing += 1
+                    else:
+                        errors.append(res)
+        if errors:
+            raise BatchError(list(enumerate(errors)))
+        return report
+
+    async def upsert_nodes(
+        self, table: str, nodes: list[Node], *, chunk_size: int = 500
+    ) -> UpsertReport:
+        r"""Async version of `DB.upsert_nodes`. Statements are sent one by
+        one, on the same connection."""
+        report = UpsertReport()
+        query = NODE_UPSERT_QUERY.format(table=table)
+        async with self.connection() as conn:
+            for chunk, rows in node_chunks(table, nodes, chunk_size):
+                res = await self._statement(conn, query, {"nodes": rows})
+                if not isinstance(res, str):
+                    report.upserted += len(chunk)
+                    continue
+                for node, row in zip(chunk, rows):
+                    res = await self._statement(conn, query, {"nodes": [row]})
+                    if isinstance(res, str):
+                        report.errors.append((node, res))
+                    else:
+                        report.upserted += 1
+        return report
+
+    async def _add_graph_nodes(
+        self,
+        src_table: str,
+        dest_table: str,
+        destinations: list[Node],
+        edge_name: str,
+        relations: Relations,
+    ) -> None:
+        try:
+            upserts = await self.upsert_nodes(dest_table, destinations)
+        except Exception as e:
+            # the edges to the nodes that already exist can still be added
+            logger.error(f"Failed: {e}")
+        else:
+            for dest, error in upserts.errors:
+                logger.error(f"Failed: {error} with {dest.to_record()}")
+        try:
+            report = await self.relate_many(
+                (
+                    RecordID(src_table, doc_id),
+                    edge_name,
+                    RecordID(dest_table, cat),
+                )
+                for doc_id, cats in relations.items()
+                for cat in cats
+            )
+            logger.debug(f"{edge_name}: {report}")
+        except Exception as e:
+            logger.error(f"Failed: {e}")
+
+    async def add_graph_nodes(
+        self,
+        src_table: str,
+        dest_table: str,
+        destinations: set[str],
+        edge_name: str,
+        relations: Relations,
+    ) -> None:
+        node_destinations = [Node(dest, None) for dest in destinations]
+        return await self._add_graph_nodes(
+            src_table,
+            dest_table,
+            node_destinations,
+            edge_name,
+            relations,
+        )
+
+    async def add_graph_nodes_with_embeddings(
+        self,
+        src_table: str,
+        dest_table: str,
+        edge_name: str,
+        relations: Relations,
+    ) -> None:
+        embedder = self.db.embedder
+        if embedder is None:
+            raise ValueError("Embedder is not initialized")
+
+        destinations = self.db._graph_destinations(relations)  # pyright: ignore[reportPrivateUsage]
+        existing = await self._record_ids(
+            EMBEDDED_RECORDS_QUERY,
+            [RecordID(dest_table, dest) for dest in destinations],
+        )
+        missing = self.db._missing_nodes(destinations, dest_table, existing)  # pyright: ignore[reportPrivateUsage]
+        embeddings = await embedder.aembed_batch(missing) if missing else []
+        node_destinations = self.db._embedded_nodes(  # pyright: ignore[reportPrivateUsage]
+            missing, embeddings, embedder
+        )
+        return await self._add_graph_nodes(
+            src_table,
+            dest_table,
+            node_destinations,
+            edge_name,
+            relations,
+        )
+
+    async def recursive_graph_query(
+        self,
+        doc_type: type[GenericDocument],
+        id: RecordID,
+        rel: str,
+        levels: int = 5,
+    ) -> list[RecursiveResult[GenericDocument]]:
+        query = self.db._recursive_graph_surql(rel, levels)  # pyright: ignore[reportPrivateUsage]
+        async with self.connection() as conn:
+            res = await conn.query(query, {"record": id})
+        return self.db._extract_recursive_results(res, doc_type, levels, query)  # pyright: ignore[reportPrivateUsage]
+
+    async def graph_query_inward(
+        self,
+        doc_type: type[GenericDocument],
+        id: RecordID | list[RecordID],
+        rel: str,
+        src: str,
+        embedding: EmbeddingVector | None,
+        *,
+        fields: str = "*",
+        omit: Sequence[str] = ("embedding",),
+    ) -> tuple[list[GenericDocument], float]:
+        res, time = await self.execute(
+            "graph_query_in.surql",
+            {
+                "record": cast(RecordID, id),
+                "embedding": None
+                if embedding is None
+                else cast(list[Value], to_list(embedding)),
+            },
+            {
+                "relation": rel,
+                "src": src,
+                **self.db._projection(fields, omit),  # pyright: ignore[reportPrivateUsage]
+            },
+        )
+        if isinstance(res, list):
+            return [doc_type.model_validate(x) for x in res], time
+        raise ValueError(f"Unexpected result from graph_query_inward: {res}")
+
+    async def graph_siblings(
+        self,
+        doc_type: type[GenericDocument],
+        id: RecordID,
+        relation: str,
+        src: str,
+        dest: str,
+        *,
+        fields: str = "*",
+        omit: Sequence[str] = ("embedding",),
+    ) -> tuple[list[GenericDocument], float]:
+        res, time = await self.execute(
+            "graph_siblings.surql",
+            {"record": id},
+            {
+                "relation": relation,
+                "src": src,
+                "dest": dest,
+                **self.db._projection(fields, omit),  # pyright: ignore[reportPrivateUsage]
+            },
+        )
+        if isinstance(res, list):
+            return [doc_type.model_validate(x) for x in res], time
+        raise ValueError(f"Unexpected result from graph_siblings: {res}")
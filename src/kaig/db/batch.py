@@ -0,0 +1,214 @@
+import re
+import time
+from dataclasses import dataclass
+from typing import Self, cast
+
+from surrealdb import Value
+
+from ..definitions import Object, SurrealRawResponse
+from .protocols import SyncBackend
+from .retry import RetryableError, is_retryable
+from .utils import parse_time
+
+
+class BatchError(RuntimeError):
+    """One or more statements of a batch failed."""
+
+    def __init__(self, errors: list[tuple[int, str]]):
+        self.errors: list[tuple[int, str]] = errors
+        super().__init__(
+            f"{len(errors)} batch statement(s) failed: "
+            + "; ".join(f"#{i}: {e}" for i, e in errors[:5])
+        )
+
+
+@dataclass
+class BatchResult:
+    result: Value
+    time: float
+    """Server time in ms"""
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BatchStatement:
+    """Handle to a statement added to a `Batch`. Its result is available
+    after the batch is sent."""
+
+    def __init__(self, index: int):
+        self.index: int = index
+        self._result: BatchResult | None = None
+
+    def _get(self) -> BatchResult:
+        if self._result is None:
+            raise RuntimeError("Batch has not been sent yet")
+        return self._result
+
+    @property
+    def result(self) -> Value:
+        """The statement result. Raises `BatchError` if the statement
+        failed."""
+        res = self._get()
+        if res.error is not None:
+            raise BatchError([(self.index, res.error)])
+        return res.result
+
+    @property
+    def time(self) -> float:
+        return self._get().time
+
+    @property
+    def error(self) -> str | None:
+        return self._get().error
+
+
+class Batch:
+    """
+    Collects parameterized SurQL statements and sends them to SurrealDB in a
+    single `query_raw` round trip.
+
+    Each statement's variables are namespaced (`$rec` becomes `$s0_rec` for
+    the first statement, `$s1_rec` for the second one...) so statements can
+    reuse variable names. Only variables passed in `vars` are renamed, so
+    built-in parameters like `$parent` or `$value` keep working.
+
+    Add one statement per `add()` call, so that results can be matched to
+    statements.
+
+    Args:
+        db: The DB to send the statements to.
+        transaction: Wrap the statements in `BEGIN`/`COMMIT`, so either all or
+            none of them are applied.
+
+    Retryable errors are retried with the DB retry policy: the whole batch if
+    it's a transaction, otherwise only the statements that failed.
+
+    Example:
+    ```python
+    with db.batch() as b:
+        a = b.add("UPSERT $rec CONTENT $node", {"rec": rec, "node": node})
+        b.add("RELATE $in->has_keyword->$out", {"in": doc, "out": rec})
+    print(a.result, a.time)
+    ```
+    """
+
+    def __init__(self, db: SyncBackend, *, transaction: bool = False):
+        self._db: SyncBackend = db
+        self.transaction: bool = transaction
+        self._statements: list[str] = []
+        self._vars: list[dict[str, Value]] = []
+        self._handles: list[BatchStatement] = []
+        self.results: list[BatchResult] = []
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, *exc_info: object
+    ) -> None:
+        if exc_type is None and self._statements:
+            _ = self.send()
+
+    def add(self, statement: str, vars: Object | None = None) -> BatchStatement:
+        """Add a statement to the batch, and return a handle to its result."""
+        index = len(self._statements)
+        prefix = f"s{index}_"
+        namespaced: dict[str, Value] = {}
+        for name, value in (vars or {}).items():
+            statement = re.sub(
+                rf"\${re.escape(name)}\b", f"${prefix}{name}", statement
+            )
+            namespaced[prefix + name] = value
+        self._statements.append(statement.strip().rstrip(";") + ";")
+        self._vars.append(namespaced)
+        handle = BatchStatement(index)
+        self._handles.append(handle)
+        return handle
+
+    @property
+    def surql(self) -> str:
+        """The SurQL that will be sent."""
+        return self._surql(range(len(self._statements)))
+
+    def _surql(self, indexes: range | list[int]) -> str:
+        surql = "\n".join(self._statements[i] for i in indexes)
+        if self.transaction:
+            return f"BEGIN TRANSACTION;\n{surql}\nCOMMIT TRANSACTION;"
+        return surql
+
+    def _parse(self, res: Object, expected: int) -> list[BatchResult]:
+        response = SurrealRawResponse.model_validate(res)
+        if response.error is not None:
+            if is_retryable(response.error.message):
+                raise RetryableError(response.error.message)
+            raise RuntimeError(f"Batch failed: {response.error.message}")
+        items = response.result or []
+        if len(items) != expected:
+            raise RuntimeError(
+                f"Expected {expected} results, got {len(items)}. Make sure each batch statement is a single statement."
+            )
+        results: list[BatchResult] = []
+        for item in items:
+            server_time = parse_time(item.time)
+            if item.status == "OK":
+                results.append(
+                    BatchResult(cast(Value, item.result), server_time)
+                )
+            else:
+                error = str(item.result)  # pyright: ignore[reportAny]
+                if self.transaction and is_retryable(error):
+                    raise RetryableError(error)
+                results.append(BatchResult(None, server_time, error))
+        return results
+
+    def send(self) -> list[BatchResult]:
+        """Send all statements in one round trip. Returns one result per
+        statement, in order."""
+        if not self._statements:
+            return []
+        policy = self._db.retry_policy
+        if self.transaction:
+            self.results = policy.call(
+                lambda: self._run(list(range(len(self)))), "batch"
+            )
+        else:
+            self.results = self._run(list(range(len(self))))
+            # resend the statements that failed with a retryable error
+            for attempt in range(policy.max_attempts - 1):
+                retry = [
+                    i
+                    for i, r in enumerate(self.results)
+                    if r.error is not None and is_retryable(r.error)
+                ]
+                if not retry:
+                    break
+                policy.count_retry("batch", len(retry))
+                time.sleep(policy.delay(attempt))
+                for i, result in zip(retry, self._run(retry)):
+                    self.results[i] = result
+        for handle, result in zip(self._handles, self.results):
+            handle._result = result  # pyright: ignore[reportPrivateUsage]
+        return self.results
+
+    def _run(self, indexes: list[int]) -> list[BatchResult]:
+        vars: dict[str, Value] = {}
+        for i in indexes:
+            vars.update(self._vars[i])
+        with (
+            self._db.instrumentation.name("batch"),
+            self._db.connection() as conn,
+        ):
+            res: Object = conn.query_raw(self._surql(indexes), vars)
+        return self._parse(res, len(indexes))
+
+    def raise_for_errors(self) -> None:
+        """Raise `BatchError` if any of the sent statements failed."""
+        errors = [(i, r.error) for i, r in enumerate(self.results) if r.error]
+        if errors:
+            raise BatchError(errors)
@@ -0,0 +1,288 @@
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from typing import TYPE_CHECKING, cast
+
+from surrealdb import RecordID, Value
+
+from ..definitions import BaseDocument, GenericDocument
+from ..vectors import EmbeddingVector, _numpy  # pyright: ignore[reportPrivateUsage]
+from .protocols import SyncBackend
+
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
+
+def _normalize(matrix: "npt.NDArray[np.float32]") -> "npt.NDArray[np.float32]":
+    np = _numpy("ExactIndex")
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32, copy=False)
+
+
+def _top_k(
+    scores: "npt.NDArray[np.float32]", k: int, threshold: float
+) -> list[tuple[int, float]]:
+    """Indexes and scores of the `k` best `scores`, best first."""
+    np = _numpy("ExactIndex")
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+    values = cast(list[float], scores[ordered].tolist())
+    return [
+        (i, score)
+        for i, score in zip(cast(list[int], ordered.tolist()), values)
+        if score >= threshold
+    ]
+
+
+def rescore(
+    query_embedding: EmbeddingVector,
+    candidates: list[tuple[GenericDocument, float]],
+    k: int | None = None,
+) -> list[tuple[GenericDocument, float]]:
+    """Exact cosine re-scoring of vector search results, e.g. to get exact
+    top-k from an oversampled HNSW search. Candidates must have been fetched
+    with their embedding (`omit=()`); the ones without are dropped.
+
+    Example:
+    ```python
+    res, _ = db.vector_search(Chunk, q, table="chunk", k=40, omit=())
+    top = rescore(q, res, k=10)
+    ```
+    """
+    np = _numpy("rescore")
+    docs = [doc for doc, _ in candidates if doc.embedding is not None]
+    if not docs:
+        return []
+    matrix = _normalize(
+        np.asarray([doc.embedding for doc in docs], dtype=np.float32)
+    )
+    query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+    scores = matrix @ query
+    return [(docs[i], score) for i, score in _top_k(scores, k or len(docs), -1)]
+
+
+class ExactIndex[Doc: BaseDocument]:
+    """
+    In-process exact (brute force) cosine search over the embeddings of a
+    table, kept in a NumPy matrix of normalized `float32` vectors.
+
+    Meant for small, hot tables (categories, keywords...), where it's exact
+    and much faster than a round trip to an HNSW index. Results are the same
+    as `DB.vector_search` on a COSINE table: `(document, score)` pairs, with
+    documents without their embedding, and the search time in ms.
+
+    `refresh()` only fetches the records that were added (and, with
+    `updated_field`, updated) since the last load, and drops the deleted
+    ones. Writes made through this process can also be applied directly
+    with `upsert()` and `remove()`.
+
+    Get one with `db.exact_index(...)`.
+
+    Example:
+    ```python
+    keywords = db.exact_index(Keyword, "keyword")
+    res, ms = keywords.search(embedder.embed("surrealdb"), k=5)
+    ```
+    """
+
+    def __init__(
+        self,
+        db: SyncBackend,
+        doc_type: type[Doc],
+        table: str,
+        *,
+        updated_field: str | None = None,
+        page_size: int = 1000,
+    ):
+        self._db: SyncBackend = db
+        self.doc_type: type[Doc] = doc_type
+        self.table: str = table
+        self.updated_field: str | None = updated_field
+        self.page_size: int = page_size
+        self._lock: threading.Lock = threading.Lock()
+        self._keys: list[str] = []
+        self._positions: dict[str, int] = {}
+        self._docs: list[Doc] = []
+        self._matrix: npt.NDArray[np.float32] | None = None
+        self._loaded_at: Value = None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def load(self) -> None:
+        """(Re)load all the embedded records of the table."""
+        loaded_at = self._now()
+        rows: list[dict[str, Value]] = list(
+            self._db.iter_query(
+                self.table,
+                "WHERE embedding != NONE",
+                {},
+                dict[str, Value],
+                page_size=self.page_size,
+            )
+        )
+        with self._lock:
+            self._keys, self._positions, self._docs = [], {}, []
+            self._matrix = None
+            self._loaded_at = loaded_at
+        self._apply(rows)
+
+    def refresh(self) -> None:
+        """Fetch the records added (or updated, see `updated_field`) since
+        the last load, and drop the deleted ones."""
+        if self._matrix is None:
+            return self.load()
+        loaded_at = self._now()
+        with self._db.connection() as conn:
+            ids = conn.query(
+                f"SELECT VALUE id FROM {self.table} WHERE embedding != NONE"
+            )
+        ids = (
+            [x for x in ids if isinstance(x, RecordID)]
+            if isinstance(ids, list)
+            else []
+        )
+        current = {str(x): x for x in ids}
+        self.remove([key for key in self._keys if key not in current])
+        fetch: list[Value] = [
+            x for key, x in current.items() if key not in self._positions
+        ]
+        rows: list[dict[str, Value]] = []
+        if fetch:
+            rows.extend(
+                self._db.query("SELECT * FROM $ids", {"ids": fetch}, dict)
+            )
+        if self.updated_field is not None:
+            rows.extend(
+                self._db.query(
+                    f"SELECT * FROM {self.table} WHERE {self.updated_field} > $since AND embedding != NONE",
+                    {"since": self._loaded_at},
+                    dict,
+                )
+            )
+        self._loaded_at = loaded_at
+        self._apply(rows)
+
+    def upsert(self, records: Iterable[dict[str, Value]]) -> None:
+        """Add or replace records (with `id` and `embedding`)."""
+        self._apply(list(records))
+
+    def remove(self, ids: Iterable[RecordID | str]) -> None:
+        drop = {str(x) for x in ids} & set(self._positions)
+        if not drop:
+            return
+        with self._lock:
+            keep = [i for i, key in enumerate(self._keys) if key not in drop]
+            self._keys = [self._keys[i] for i in keep]
+            self._docs = [self._docs[i] for i in keep]
+            self._positions = {key: i for i, key in enumerate(self._keys)}
+            if self._matrix is not None:
+                self._matrix = self._matrix[keep]
+
+    def search(
+        self,
+        query_embedding: EmbeddingVector,
+        *,
+        k: int = 5,
+        threshold: float = 0,
+    ) -> tuple[list[tuple[Doc, float]], float]:
+        start = time.perf_counter()
+        np = _numpy("ExactIndex")
+        with self._lock:
+            matrix, docs = self._matrix, self._docs
+        if matrix is None or not len(docs):
+            return [], (time.perf_counter() - start) * 1000
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        scores = matrix @ query
+        results = [
+            (docs[i], score) for i, score in _top_k(scores, k, threshold)
+        ]
+        return results, (time.perf_counter() - start) * 1000
+
+    def rescore(
+        self,
+        query_embedding: EmbeddingVector,
+        candidates: Sequence[tuple[Doc, float]] | Sequence[RecordID],
+        k: int | None = None,
+    ) -> list[tuple[Doc, float]]:
+        """Exact scores of `candidates` (e.g. HNSW results, or record ids)
+        that are in the index, best first. Candidates that are not in the
+        index are dropped."""
+        np = _numpy("ExactIndex")
+        with self._lock:
+            # a consistent snapshot: `_apply` and `remove` replace these,
+            # they never change them in place
+            matrix, docs, positions = self._matrix, self._docs, self._positions
+        if matrix is None:
+            return []
+        rows: list[int] = []
+        for candidate in candidates:
+            if isinstance(candidate, tuple):
+                key = str(candidate[0].id)  # pyright: ignore[reportAttributeAccessIssue, reportUnknownMemberType, reportUnknownArgumentType]
+            else:
+                key = str(candidate)
+            if key in positions:
+                rows.append(positions[key])
+        if not rows:
+            return []
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        scores = matrix[rows] @ query
+        return [
+            (docs[rows[i]], score)
+            for i, score in _top_k(scores, k or len(rows), -1)
+        ]
+
+    def _now(self) -> Value:
+        with self._db.connection() as conn:
+            return conn.query("RETURN time::now()")
+
+    def _apply(self, rows: list[dict[str, Value]]) -> None:
+        np = _numpy("ExactIndex")
+        # the last version of each record wins
+        latest: dict[str, tuple[Doc, Value]] = {}
+        for row in rows:
+            row = dict(row)
+            embedding = row.pop("embedding", None)
+            if not isinstance(row.get("id"), RecordID) or embedding is None:
+                continue
+            latest[str(row["id"])] = (
+                self.doc_type.model_validate(row),
+                embedding,
+            )
+        if not latest:
+            return
+        keys = list(latest)
+        new = _normalize(
+            np.asarray([v for _, v in latest.values()], dtype=np.float32)
+        )
+        with self._lock:
+            # copy on write: searches running outside the lock keep a
+            # consistent snapshot
+            matrix = None if self._matrix is None else self._matrix.copy()
+            docs = list(self._docs)
+            positions = dict(self._positions)
+            all_keys = list(self._keys)
+            append: list[int] = []
+            for i, key in enumerate(keys):
+                position = positions.get(key)
+                if position is None or matrix is None:
+                    append.append(i)
+                    continue
+                docs[position] = latest[key][0]
+                matrix[position] = new[i]
+            for i in append:
+                positions[keys[i]] = len(all_keys)
+                all_keys.append(keys[i])
+                docs.append(latest[keys[i]][0])
+            if append:
+                matrix = (
+                    new[append]
+                    if matrix is None
+                    else np.concatenate([matrix, new[append]])
+                )
+            self._matrix, self._docs = matrix, docs
+            self._positions, self._keys = positions, all_keys
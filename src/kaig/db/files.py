@@ -0,0 +1,72 @@
+import hashlib
+import mimetypes
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from surrealdb import RecordID
+
+type ProgressCallback = Callable[[str, int, int], None]
+"""Called with the stage ("hash" or "upload"), the number of files done and
+the total number of files of that stage"""
+
+
+@dataclass
+class StoreReport:
+    """Result of `DB.store_original_documents`."""
+
+    inserted: dict[Path, RecordID] = field(default_factory=dict)
+    cached: dict[Path, RecordID] = field(default_factory=dict)
+    """Files that were already stored (or repeated in the input)"""
+    errors: dict[Path, str] = field(default_factory=dict)
+
+
+def hash_file(path: Path) -> tuple[str, int]:
+    """MD5 hex digest and size of a file, read with bounded buffers."""
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "md5").hexdigest()
+        return digest, f.tell()
+
+
+def guess_content_type(path: Path) -> str:
+    content_type, _ = mimetypes.guess_type(path)
+    return content_type or "application/octet-stream"
+
+
+def hash_files(
+    paths: list[Path],
+    workers: int,
+    report: StoreReport,
+    progress: ProgressCallback | None = None,
+) -> dict[Path, tuple[str, int]]:
+    """Hash files in a pool of `workers` processes (in this process if
+    `workers` is 1). Files that can't be read are added to `report.errors`."""
+    hashes: dict[Path, tuple[str, int]] = {}
+    if workers <= 1:
+        for done, path in enumerate(paths, 1):
+            try:
+                hashes[path] = hash_file(path)
+            except Exception as e:
+                report.errors[path] = str(e)
+            if progress is not None:
+                progress("hash", done, len(paths))
+        return hashes
+
+    # spawn: forking a process that holds connection threads isn't safe
+    with ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futures: dict[Future[tuple[str, int]], Path] = {
+            pool.submit(hash_file, path): path for path in paths
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                hashes[path] = future.result()
+            except Exception as e:
+                report.errors[path] = str(e)
+            if progress is not None:
+                progress("hash", done, len(paths))
+    return hashes
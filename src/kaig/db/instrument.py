@@ -0,0 +1,256 @@
+import logging
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from surrealdb import Value
+
+from .utils import parse_time
+from .stats import QueryEvent, QueryHook
+
+logger = logging.getLogger(__name__)
+
+# Name of the queries sent in the current context, see `Instrumentation.name`
+_query_name: ContextVar[str | None] = ContextVar(
+    "kaig_query_name", default=None
+)
+
+# Connection methods reported under their own name (e.g. "upsert")
+CRUD_METHODS: frozenset[str] = frozenset(
+    {
+        "select",
+        "create",
+        "insert",
+        "insert_relation",
+        "update",
+        "upsert",
+        "merge",
+        "patch",
+        "delete",
+    }
+)
+
+
+def query_key(query: str, max_len: int = 80) -> str:
+    """Default name of a query: its text with collapsed whitespace,
+    shortened to `max_len` characters."""
+    key = " ".join(query.split())
+    return key if len(key) <= max_len else key[: max_len - 1] + "…"
+
+
+def _payload_size(value: Any) -> int | None:  # pyright: ignore[reportExplicitAny, reportAny]
+    try:
+        from surrealdb.data.cbor import encode
+
+        return len(encode(value))
+    except Exception:
+        return None
+
+
+class Instrumentation:
+    """
+    Reports a `QueryEvent` for every call made through the connections
+    borrowed from a `DB` (`db.connection()`, `db.async_connection()`), to each
+    of its `hooks`.
+
+    Queries are named after the `.surql` template they were rendered from, or
+    their text. Use `name()` to group the queries sent in a block of code.
+
+    Args:
+        measure_payload: Measure the request and response sizes by encoding
+            them (CBOR) again. Costs CPU, so it's disabled by default.
+    """
+
+    def __init__(self, *, measure_payload: bool = False):
+        self.hooks: list[QueryHook] = []
+        self.measure_payload: bool = measure_payload
+
+    @contextmanager
+    def name(self, name: str) -> Iterator[None]:
+        """Report the queries sent in this block (and the tasks it starts)
+        under `name`."""
+        token = _query_name.set(name)
+        try:
+            yield
+        finally:
+            _query_name.reset(token)
+
+    def emit(self, event: QueryEvent) -> None:
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                logger.debug(f"Query hook error: {e}")
+
+    def _event(
+        self,
+        default_name: str,
+        start: float,
+        request: Any,  # pyright: ignore[reportExplicitAny, reportAny]
+        response: Any = None,  # pyright: ignore[reportExplicitAny, reportAny]
+        error: BaseException | None = None,
+    ) -> QueryEvent:
+        event = QueryEvent(
+            name=_query_name.get() or default_name,
+            client_time=(time.perf_counter() - start) * 1000,
+            error=None if error is None else str(error),
+        )
+        if self.measure_payload:
+            event.bytes_out = _payload_size(request)
+            if error is None:
+                event.bytes_in = _payload_size(response)
+        return event
+
+    def _raw_event(
+        self,
+        query: str,
+        params: dict[str, Value] | None,
+        start: float,
+        response: dict[str, Any],  # pyright: ignore[reportExplicitAny]
+    ) -> QueryEvent:
+        event = self._event(query_key(query), start, [query, params], response)
+        event.query = query
+        event.vars = params
+        if response.get("error") is not None:
+            event.error = str(response.get("error"))  # pyright: ignore[reportAny]
+        server_time = 0.0
+        for item in response.get("result") or []:  # pyright: ignore[reportAny]
+            if not isinstance(item, dict):
+                continue
+            try:
+                server_time += parse_time(str(item.get("time")))  # pyright: ignore[reportUnknownMemberType, reportUnknownArgumentType]
+            except ValueError:
+                pass
+            result = item.get("result")  # pyright: ignore[reportUnknownMemberType, reportUnknownVariableType]
+            if item.get("status") == "ERR":  # pyright: ignore[reportUnknownMemberType]
+                event.error = str(result)  # pyright: ignore[reportUnknownArgumentType]
+            elif isinstance(result, list):
+                event.rows += len(result)  # pyright: ignore[reportUnknownArgumentType]
+            elif result is not None:
+                event.rows += 1
+        event.server_time = server_time
+        return event
+
+    def wrap(self, conn: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+        if not self.hooks:
+            return conn  # pyright: ignore[reportAny]
+        return InstrumentedConnection(conn, self)
+
+    def wrap_async(self, conn: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+        if not self.hooks:
+            return conn  # pyright: ignore[reportAny]
+        return AsyncInstrumentedConnection(conn, self)
+
+
+class InstrumentedConnection:
+    """Blocking connection proxy reporting its calls to `Instrumentation`."""
+
+    def __init__(self, conn: Any, instrumentation: Instrumentation):  # pyright: ignore[reportExplicitAny, reportAny]
+        self._conn: Any = conn  # pyright: ignore[reportExplicitAny]
+        self._instrumentation: Instrumentation = instrumentation
+
+    def query_raw(
+        self, query: str, params: dict[str, Value] | None = None
+    ) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        start = time.perf_counter()
+        try:
+            response: dict[str, Any] = self._conn.query_raw(query, params)  # pyright: ignore[reportExplicitAny, reportAny]
+        except Exception as e:
+            self._instrumentation.emit(
+                self._instrumentation._event(  # pyright: ignore[reportPrivateUsage]
+                    query_key(query), start, [query, params], error=e
+                )
+            )
+            raise
+        self._instrumentation.emit(
+            self._instrumentation._raw_event(query, params, start, response)  # pyright: ignore[reportPrivateUsage]
+        )
+        return response
+
+    def query(self, query: str, vars: dict[str, Value] | None = None) -> Value:
+        # same as the SDK `query`, through `query_raw` to get the server time
+        response = self.query_raw(query, vars)
+        self._conn.check_response_for_error(response, "query")  # pyright: ignore[reportAny]
+        self._conn.check_response_for_result(response, "query")  # pyright: ignore[reportAny]
+        return response["result"][0]["result"]  # pyright: ignore[reportAny]
+
+    def __getattr__(self, name: str) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+        attr = getattr(self._conn, name)  # pyright: ignore[reportAny]
+        if name not in CRUD_METHODS:
+            return attr  # pyright: ignore[reportAny]
+        instrumentation = self._instrumentation
+
+        def call(*args: Any, **kwargs: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+            start = time.perf_counter()
+            try:
+                res = attr(*args, **kwargs)  # pyright: ignore[reportAny]
+            except Exception as e:
+                instrumentation.emit(
+                    instrumentation._event(name, start, list(args), error=e)  # pyright: ignore[reportPrivateUsage]
+                )
+                raise
+            event = instrumentation._event(name, start, list(args), res)  # pyright: ignore[reportPrivateUsage]
+            event.rows = len(res) if isinstance(res, list) else 1  # pyright: ignore[reportUnknownArgumentType]
+            instrumentation.emit(event)
+            return res  # pyright: ignore[reportAny]
+
+        return call
+
+
+class AsyncInstrumentedConnection:
+    """Async connection proxy reporting its calls to `Instrumentation`."""
+
+    def __init__(self, conn: Any, instrumentation: Instrumentation):  # pyright: ignore[reportExplicitAny, reportAny]
+        self._conn: Any = conn  # pyright: ignore[reportExplicitAny]
+        self._instrumentation: Instrumentation = instrumentation
+
+    async def query_raw(
+        self, query: str, params: dict[str, Value] | None = None
+    ) -> dict[str, Any]:  # pyright: ignore[reportExplicitAny]
+        start = time.perf_counter()
+        try:
+            response: dict[str, Any] = await self._conn.query_raw(query, params)  # pyright: ignore[reportExplicitAny, reportAny]
+        except Exception as e:
+            self._instrumentation.emit(
+                self._instrumentation._event(  # pyright: ignore[reportPrivateUsage]
+                    query_key(query), start, [query, params], error=e
+                )
+            )
+            raise
+        self._instrumentation.emit(
+            self._instrumentation._raw_event(query, params, start, response)  # pyright: ignore[reportPrivateUsage]
+        )
+        return response
+
+    async def query(
+        self, query: str, vars: dict[str, Value] | None = None
+    ) -> Value:
+        response = await self.query_raw(query, vars)
+        self._conn.check_response_for_error(response, "query")  # pyright: ignore[reportAny]
+        self._conn.check_response_for_result(response, "query")  # pyright: ignore[reportAny]
+        return response["result"][0]["result"]  # pyright: ignore[reportAny]
+
+    def __getattr__(self, name: str) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+        attr = getattr(self._conn, name)  # pyright: ignore[reportAny]
+        if name not in CRUD_METHODS:
+            return attr  # pyright: ignore[reportAny]
+        instrumentation = self._instrumentation
+        fn: Callable[..., Awaitable[Any]] = attr  # pyright: ignore[reportExplicitAny, reportAny]
+
+        async def call(*args: Any, **kwargs: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+            start = time.perf_counter()
+            try:
+                res = await fn(*args, **kwargs)  # pyright: ignore[reportAny]
+            except Exception as e:
+                instrumentation.emit(
+                    instrumentation._event(name, start, list(args), error=e)  # pyright: ignore[reportPrivateUsage]
+                )
+                raise
+            event = instrumentation._event(name, start, list(args), res)  # pyright: ignore[reportPrivateUsage]
+            event.rows = len(res) if isinstance(res, list) else 1  # pyright: ignore[reportUnknownArgumentType]
+            instrumentation.emit(event)
+            return res  # pyright: ignore[reportAny]
+
+        return call
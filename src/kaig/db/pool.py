@@ -0,0 +1,354 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Protocol
+
+from surrealdb import Value
+
+logger = logging.getLogger(__name__)
+
+
+class PoolConnection(Protocol):
+    def query(
+        self, query: str, vars: dict[str, Value] | None = None
+    ) -> Value: ...
+    def close(self) -> None: ...
+
+
+class AsyncPoolConnection(Protocol):
+    async def query(
+        self, query: str, vars: dict[str, Value] | None = None
+    ) -> Value: ...
+    async def close(self) -> None: ...
+
+
+class PoolTimeoutError(TimeoutError):
+    """Raised when no connection could be checked out in time."""
+
+
+@dataclass
+class _Idle[C]:
+    conn: C
+    last_used: float
+    needs_check: bool = False
+
+
+class ConnectionPool[Conn: PoolConnection]:
+    """
+    Bounded, thread-safe pool of blocking SurrealDB connections.
+
+    `connect` must return a ready to use connection, i.e. it must sign in and
+    select the namespace/database, so that replacing a broken connection
+    replays the whole session setup.
+
+    Args:
+        connect: Factory for new connections.
+        max_size: Maximum number of open connections.
+        idle_timeout: Idle connections older than this (in seconds) are closed.
+        health_check_after: Connections idle for longer than this (in seconds)
+            are pinged on checkout, and replaced if the ping fails.
+        checkout_timeout: How long to wait (in seconds) for a free connection
+            before raising `PoolTimeoutError`.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Conn],
+        *,
+        max_size: int = 8,
+        idle_timeout: float = 300,
+        health_check_after: float = 30,
+        checkout_timeout: float = 30,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect: Callable[[], Conn] = connect
+        self.max_size: int = max_size
+        self.idle_timeout: float = idle_timeout
+        self.health_check_after: float = health_check_after
+        self.checkout_timeout: float = checkout_timeout
+
+        self._idle: deque[_Idle[Conn]] = deque()
+        self._open: int = 0
+        self._closed: bool = False
+        self._cond: threading.Condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        """Number of open connections (idle and checked out)."""
+        return self._open
+
+    @property
+    def idle(self) -> int:
+        """Number of idle connections."""
+        return len(self._idle)
+
+    @contextmanager
+    def connection(self) -> Iterator[Conn]:
+        """Borrow a connection for the duration of the `with` block."""
+        conn = self._checkout()
+        failed = False
+        try:
+            yield conn
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._checkin(conn, failed)
+
+    def close(self) -> None:
+        """Close all idle connections. Borrowed connections are closed when
+        they are returned."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for item in idle:
+            self._close_conn(item.conn)
+
+    def _checkout(self) -> Conn:
+        deadline = time.monotonic() + self.checkout_timeout
+        expired: list[Conn] = []
+        item: _Idle[Conn] | None = None
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+                    expired.extend(self._prune_locked())
+                    if self._idle:
+                        item = self._idle.pop()
+                        break
+                    if self._open < self.max_size:
+                        self._open += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"No connection available after {self.checkout_timeout}s (max_size={self.max_size})"
+                        )
+                    _ = self._cond.wait(remaining)
+        finally:
+            for conn in expired:
+                self._close_conn(conn)
+
+        if item is None:
+            return self._new_conn()
+        if (
+            item.needs_check
+            or time.monotonic() - item.last_used > self.health_check_after
+        ):
+            return self._check_health(item.conn)
+        return item.conn
+
+    def _checkin(self, conn: Conn, failed: bool) -> None:
+        with self._cond:
+            if self._closed:
+                self._open -= 1
+                close = True
+            else:
+                # a connection that raised is health checked before reuse
+                self._idle.append(_Idle(conn, time.monotonic(), failed))
+                close = False
+            self._cond.notify()
+        if close:
+            self._close_conn(conn)
+
+    def _prune_locked(self) -> list[Conn]:
+        """Drop idle connections past `idle_timeout`. Must hold the lock; the
+        caller closes the returned connections after releasing it."""
+        now = time.monotonic()
+        expired: list[Conn] = []
+        # oldest connections are on the left
+        while self._idle and now - self._idle[0].last_used > self.idle_timeout:
+            expired.append(self._idle.popleft().conn)
+            self._open -= 1
+        return expired
+
+    def _new_conn(self) -> Conn:
+        try:
+            return self._connect()
+        except BaseException:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def _check_health(self, conn: Conn) -> Conn:
+        try:
+            _ = conn.query("RETURN true")
+            return conn
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {e}")
+            self._close_conn(conn)
+            return self._new_conn()
+
+    def _close_conn(self, conn: Conn) -> None:
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
+
+
+class AsyncConnectionPool[AsyncConn: AsyncPoolConnection]:
+    """
+    Bounded pool of async SurrealDB connections. The asyncio counterpart of
+    `ConnectionPool`, with the same arguments. It must only be used from one
+    event loop.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[AsyncConn]],
+        *,
+        max_size: int = 8,
+        idle_timeout: float = 300,
+        health_check_after: float = 30,
+        checkout_timeout: float = 30,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect: Callable[[], Awaitable[AsyncConn]] = connect
+        self.max_size: int = max_size
+        self.idle_timeout: float = idle_timeout
+        self.health_check_after: float = health_check_after
+        self.checkout_timeout: float = checkout_timeout
+
+        self._idle: deque[_Idle[AsyncConn]] = deque()
+        self._open: int = 0
+        self._closed: bool = False
+        self._cond: asyncio.Condition | None = None
+
+    @property
+    def size(self) -> int:
+        """Number of open connections (idle and checked out)."""
+        return self._open
+
+    @property
+    def idle(self) -> int:
+        """Number of idle connections."""
+        return len(self._idle)
+
+    @property
+    def _condition(self) -> asyncio.Condition:
+        # created lazily so the pool can be built outside of an event loop
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[AsyncConn]:
+        """Borrow a connection for the duration of the `async with` block."""
+        conn = await self._checkout()
+        failed = False
+        try:
+            yield conn
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            await self._checkin(conn, failed)
+
+    async def close(self) -> None:
+        """Close all idle connections. Borrowed connections are closed when
+        they are returned."""
+        async with self._condition:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._condition.notify_all()
+        for item in idle:
+            await self._close_conn(item.conn)
+
+    async def _checkout(self) -> AsyncConn:
+        deadline = time.monotonic() + self.checkout_timeout
+        expired: list[AsyncConn] = []
+        item: _Idle[AsyncConn] | None = None
+        try:
+            async with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+                    expired.extend(self._prune_locked())
+                    if self._idle:
+                        item = self._idle.pop()
+                        break
+                    if self._open < self.max_size:
+                        self._open += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"No connection available after {self.checkout_timeout}s (max_size={self.max_size})"
+                        )
+                    try:
+                        _ = await asyncio.wait_for(
+                            self._condition.wait(), remaining
+                        )
+                    except TimeoutError:
+                        pass
+        finally:
+            for conn in expired:
+                await self._close_conn(conn)
+
+        if item is None:
+            return await self._new_conn()
+        if (
+            item.needs_check
+            or time.monotonic() - item.last_used > self.health_check_after
+        ):
+            return await self._check_health(item.conn)
+        return item.conn
+
+    async def _checkin(self, conn: AsyncConn, failed: bool) -> None:
+        async with self._condition:
+            if self._closed:
+                self._open -= 1
+                close = True
+            else:
+                # a connection that raised is health checked before reuse
+                self._idle.append(_Idle(conn, time.monotonic(), failed))
+                close = False
+            self._condition.notify()
+        if close:
+            await self._close_conn(conn)
+
+    def _prune_locked(self) -> list[AsyncConn]:
+        now = time.monotonic()
+        expired: list[AsyncConn] = []
+        while self._idle and now - self._idle[0].last_used > self.idle_timeout:
+            expired.append(self._idle.popleft().conn)
+            self._open -= 1
+        return expired
+
+    async def _new_conn(self) -> AsyncConn:
+        try:
+            return await self._connect()
+        except BaseException:
+            async with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+
+    async def _check_health(self, conn: AsyncConn) -> AsyncConn:
+        try:
+            _ = await conn.query("RETURN true")
+            return conn
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {e}")
+            await self._close_conn(conn)
+            return await self._new_conn()
+
+    async def _close_conn(self, conn: AsyncConn) -> None:
+        try:
+            await conn.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
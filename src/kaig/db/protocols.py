@@ -0,0 +1,183 @@
+"""
+Connection aliases and the parts of `DB` used by its helper modules.
+
+`Batch`, `SlowQueryLog`, `ExactIndex` and `AsyncDB` keep a reference to the
+`DB` that created them. They type it with these protocols instead of
+importing `kaig.db`, which imports them.
+"""
+
+from collections.abc import AsyncIterator, Iterator, Sequence
+from contextlib import AbstractAsyncContextManager, AbstractContextManager
+from pathlib import Path
+from typing import Protocol
+
+from surrealdb import (
+    AsyncHttpSurrealConnection,
+    AsyncWsSurrealConnection,
+    BlockingHttpSurrealConnection,
+    BlockingWsSurrealConnection,
+    RecordID,
+    Value,
+)
+
+from ..definitions import (
+    GenericDocument,
+    Node,
+    Object,
+    RecursiveResult,
+    Relations,
+)
+from ..embeddings import Embedder
+from ..vectors import EmbeddingBatch, EmbeddingVector
+from .instrument import Instrumentation
+from .retry import RetryPolicy
+from .utils import RecordType
+
+type SyncConnection = (
+    BlockingHttpSurrealConnection | BlockingWsSurrealConnection
+)
+type AsyncConnection = AsyncHttpSurrealConnection | AsyncWsSurrealConnection
+
+
+class SyncBackend(Protocol):
+    """The sync `DB` API used by `Batch`, `SlowQueryLog` and `ExactIndex`."""
+
+    retry_policy: RetryPolicy
+    instrumentation: Instrumentation
+
+    def connection(self) -> AbstractContextManager[SyncConnection]: ...
+
+    def query(
+        self,
+        query: str,
+        vars: Object,
+        record_type: type[RecordType],
+    ) -> list[RecordType]: ...
+
+    def iter_query(
+        self,
+        table: str,
+        where_clause: str,
+        where_vars: Object,
+        record_type: type[RecordType],
+        *,
+        fields: str = "*",
+        page_size: int = 1000,
+    ) -> Iterator[RecordType]: ...
+
+
+class AsyncBackend(Protocol):
+    """The `DB` configuration and helpers used by `AsyncDB`."""
+
+    retry_policy: RetryPolicy
+    embedder: Embedder | None
+    _analytics_table: str
+
+    @property
+    def _vector_table(self) -> str: ...
+
+    def async_connection(
+        self,
+    ) -> AbstractAsyncContextManager[AsyncConnection]: ...
+
+    async def async_execute(
+        self,
+        file: str | Path,
+        vars: dict[str, Value] | None = None,
+        template_vars: Object | None = None,
+    ) -> tuple[Value, float]: ...
+
+    def aiter_query(
+        self,
+        table: str,
+        where_clause: str,
+        where_vars: Object,
+        record_type: type[RecordType],
+        *,
+        fields: str = "*",
+        page_size: int = 1000,
+    ) -> AsyncIterator[RecordType]: ...
+
+    async def async_vector_search(
+        self,
+        doc_type: type[GenericDocument],
+        query_embeddings: EmbeddingVector,
+        *,
+        table: str | None = None,
+        k: int = 5,
+        effort: None = None,
+        threshold: float = 0,
+        fields: str = "*",
+        omit: Sequence[str] = ("embedding",),
+    ) -> tuple[list[tuple[GenericDocument, float]], float]: ...
+
+    @staticmethod
+    def _count_query(
+        table: str, where_clause: str, group_by: str | None
+    ) -> str: ...
+
+    @staticmethod
+    def _extract_count(count_result: dict[str, int] | None) -> int: ...
+
+    @staticmethod
+    def _extract_record_ids(res: Value) -> list[RecordID]: ...
+
+    @staticmethod
+    def _new_docs(
+        docs: list[GenericDocument],
+        record_ids: list[RecordID],
+        existing: list[RecordID],
+    ) -> list[int]: ...
+
+    @staticmethod
+    def _embedded_rows(
+        docs: list[GenericDocument],
+        ids: list[str],
+        table: str,
+        idxs: list[int],
+        embeddings: Sequence[Sequence[float]] | EmbeddingBatch,
+        embedder: Embedder,
+    ) -> list[Value]: ...
+
+    @staticmethod
+    def _projection(fields: str, omit: Sequence[str]) -> dict[str, str]: ...
+
+    def _extract_similarity_results(
+        self, res: Value, doc_type: type[GenericDocument]
+    ) -> list[tuple[GenericDocument, float]]: ...
+
+    def _rerank(
+        self,
+        query: EmbeddingVector,
+        results: list[tuple[GenericDocument, float]],
+        k: int,
+        omit: Sequence[str],
+    ) -> list[tuple[GenericDocument, float]]: ...
+
+    @staticmethod
+    def _graph_destinations(relations: Relations) -> list[str]: ...
+
+    @staticmethod
+    def _missing_nodes(
+        destinations: list[str],
+        dest_table: str,
+        existing: list[RecordID],
+    ) -> list[str]: ...
+
+    @staticmethod
+    def _embedded_nodes(
+        contents: list[str],
+        embeddings: Sequence[Sequence[float]] | EmbeddingBatch,
+        embedder: Embedder,
+    ) -> list[Node]: ...
+
+    @staticmethod
+    def _recursive_graph_surql(rel: str, levels: int) -> str: ...
+
+    @staticmethod
+    def _extract_recursive_results(
+        res: Value,
+        doc_type: type[GenericDocument],
+        levels: int,
+        query: str,
+    ) -> list[RecursiveResult[GenericDocument]]: ...
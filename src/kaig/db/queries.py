@@ -15,6 +15,41 @@ COUNT_QUERY: Final[str] = dedent("""
 """)
 
 
+# Keyset pagination: `id > $iter_last` is added to the where clause after the
+# first page
+ITER_QUERY: Final[str] = dedent("""
+    SELECT {fields}
+    FROM {table}
+    {where_clause}
+    ORDER BY id
+    LIMIT $iter_limit
+""")
+
+# Edges of `relation` among `$ins` and `$outs`, to skip the existing ones
+EXISTING_EDGES_QUERY: Final[str] = dedent("""
+    SELECT in, out
+    FROM {relation}
+    WHERE in IN $ins AND out IN $outs
+""")
+
+# Ids of the records of `$ids` that exist
+EXISTING_RECORDS_QUERY: Final[str] = "SELECT VALUE id FROM $ids"
+
+# Ids of the records of `$ids` that already have an embedding
+EMBEDDED_RECORDS_QUERY: Final[str] = (
+    "SELECT VALUE id FROM $ids WHERE embedding != NONE"
+)
+
+# Same as `UPSERT $record CONTENT $node` for each node in `$nodes`
+NODE_UPSERT_QUERY: Final[str] = dedent("""
+    INSERT INTO {table} $nodes
+    ON DUPLICATE KEY UPDATE
+        content = $input.content,
+        embedding = $input.embedding
+    RETURN NONE
+""")
+
+
 class WhereClause:
     def __init__(self):
         self._conditions: list[str] = []
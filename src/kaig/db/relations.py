@@ -0,0 +1,100 @@
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from surrealdb import RecordID, Value
+
+from ..definitions import Node
+
+type Edge = tuple[RecordID, str, RecordID]
+"""`(in, relation, out)`"""
+
+type EdgeKey = tuple[str, str]
+
+
+@dataclass
+class RelateReport:
+    inserted: int = 0
+    duplicates: int = 0
+    """Edges repeated in the input"""
+    existing: int = 0
+    """Edges that were already in the database"""
+
+    @property
+    def skipped(self) -> int:
+        return self.duplicates + self.existing
+
+
+@dataclass
+class UpsertReport:
+    upserted: int = 0
+    errors: list[tuple[Node, str]] = field(default_factory=list)
+    """Nodes that could not be written, with their error"""
+
+
+def node_chunks(
+    table: str, nodes: list[Node], size: int
+) -> list[tuple[list[Node], list[Value]]]:
+    """`(nodes, rows)` upsert batches of at most `size` nodes. Nodes are
+    keyed by their content."""
+    rows: list[Value] = [
+        {"id": RecordID(table, node.content), **node.to_record()}
+        for node in nodes
+    ]
+    return [
+        (nodes[start : start + size], rows[start : start + size])
+        for start in range(0, len(nodes), size)
+    ]
+
+
+def edge_key(in_: RecordID, out: RecordID) -> EdgeKey:
+    # `str` tells `a:1` from `a:⟨1⟩`, and RecordIDs aren't hashable
+    return str(in_), str(out)
+
+
+def is_conflict(error: str) -> bool:
+    """Whether `error` is a unique index (or record id) violation."""
+    return "already contains" in error or "already exists" in error
+
+
+class EdgeSet:
+    """Edges to insert, grouped by relation, without duplicates."""
+
+    def __init__(self, edges: Iterable[Edge], report: RelateReport):
+        self.report: RelateReport = report
+        self.relations: dict[str, dict[EdgeKey, tuple[RecordID, RecordID]]] = {}
+        for in_, relation, out in edges:
+            pending = self.relations.setdefault(relation, {})
+            key = edge_key(in_, out)
+            if key in pending:
+                report.duplicates += 1
+            else:
+                pending[key] = (in_, out)
+
+    def existing_vars(self, relation: str) -> dict[str, Value]:
+        """Variables of `EXISTING_EDGES_QUERY` for `relation`."""
+        pending = self.relations[relation]
+        ins = {str(in_): in_ for in_, _ in pending.values()}
+        outs = {str(out): out for _, out in pending.values()}
+        return {"ins": list(ins.values()), "outs": list(outs.values())}
+
+    def drop_existing(self, relation: str, rows: Value) -> None:
+        pending = self.relations[relation]
+        for row in rows if isinstance(rows, list) else []:
+            if not isinstance(row, dict):
+                continue
+            in_, out = row.get("in"), row.get("out")
+            if not isinstance(in_, RecordID) or not isinstance(out, RecordID):
+                continue
+            if pending.pop(edge_key(in_, out), None) is not None:
+                self.report.existing += 1
+
+    def chunks(self, size: int) -> list[tuple[str, list[Value]]]:
+        """`(relation, edges)` insert batches of at most `size` edges."""
+        chunks: list[tuple[str, list[Value]]] = []
+        for relation, pending in self.relations.items():
+            edges: list[Value] = [
+                {"in": in_, "out": out} for in_, out in pending.values()
+            ]
+            for start in range(0, len(edges), size):
+                chunks.append((relation, edges[start : start + size]))
+        return chunks
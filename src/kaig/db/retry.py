@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import TypeVar
+
+from .pool import PoolTimeoutError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Substrings (lowercase) of SurrealDB errors that are safe to retry
+RETRYABLE_MESSAGES: tuple[str, ...] = (
+    "can be retried",
+    "read or write conflict",
+    "transaction conflict",
+    "write conflict",
+    "resource busy",
+)
+
+# Exception class names (anywhere in the MRO) of transient connection errors.
+# Matched by name so we don't depend on the transport libraries directly
+# (websockets, aiohttp, requests).
+TRANSIENT_ERRORS: tuple[str, ...] = (
+    "ConnectionError",
+    "ConnectionClosed",
+    "ClientConnectionError",
+    "TimeoutError",
+)
+
+
+class RetryableError(Exception):
+    """A statement failed with an error that is safe to retry (e.g. a
+    transaction conflict returned as the statement result)."""
+
+
+def is_retryable(error: BaseException | str) -> bool:
+    """Whether `error` is a retryable concurrency conflict or a transient
+    connection error."""
+    if isinstance(error, str):
+        message = error.lower()
+        return any(m in message for m in RETRYABLE_MESSAGES)
+    if isinstance(error, RetryableError):
+        return True
+    if isinstance(error, PoolTimeoutError):
+        return False
+    if any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__):
+        return True
+    return is_retryable(str(error))
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Retries retryable errors with jittered exponential backoff.
+
+    The delay before retry `n` (starting at 0) is drawn uniformly from
+    `[0, min(max_delay, base_delay * 2**n)]` ("full jitter"), so workers that
+    conflicted on the same records don't retry in lockstep.
+
+    Args:
+        max_attempts: Total number of attempts, including the first one. Use 1
+            to disable retries.
+        base_delay: Backoff base, in seconds.
+        max_delay: Backoff cap, in seconds.
+    """
+
+    max_attempts: int = 5
+    base_delay: float = 0.05
+    max_delay: float = 2.0
+    retries: Counter[str] = field(default_factory=Counter)
+    """Number of retries per query (or `.surql` file)."""
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2**attempt)
+        )
+
+    def count_retry(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.retries[key] += n
+
+    def _should_retry(self, e: Exception, attempt: int, key: str) -> bool:
+        if attempt + 1 >= self.max_attempts or not is_retryable(e):
+            return False
+        self.count_retry(key)
+        logger.warning(
+            f"Retrying ({attempt + 1}/{self.max_attempts - 1}) after retryable error: {e}. Query: {key}"
+        )
+        return True
+
+    def call(self, fn: Callable[[], T], key: str = "") -> T:
+        """Call `fn` until it succeeds, retrying retryable errors."""
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if not self._should_retry(e, attempt, key):
+                    raise
+            time.sleep(self.delay(attempt))
+            attempt += 1
+
+    async def async_call(
+        self, fn: Callable[[], Awaitable[T]], key: str = ""
+    ) -> T:
+        """Async version of `call`."""
+        attempt = 0
+        while True:
+            try:
+                return await fn()
+            except Exception as e:
+                if not self._should_retry(e, attempt, key):
+                    raise
+            await asyncio.sleep(self.delay(attempt))
+            attempt += 1
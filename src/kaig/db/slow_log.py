@@ -0,0 +1,185 @@
+import logging
+import queue
+import re
+import threading
+from collections import deque
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from typing import Any
+
+from surrealdb import Value
+
+from .protocols import SyncBackend
+from .stats import QueryEvent
+
+logger = logging.getLogger(__name__)
+
+# Name of the queries sent by the slow query log itself, which are not logged
+SLOW_LOG_QUERY_NAME = "slow_query_log"
+
+# Lists of numbers at least this long are considered vectors, and redacted
+MIN_VECTOR_LEN = 16
+
+_COMMENT = re.compile(r"^\s*--.*$", re.MULTILINE)
+# Statements and functions that can write, possibly in a subquery: a query
+# using any of them (even in a string) isn't explained
+_WRITE = re.compile(
+    r"\b(CREATE|UPDATE|UPSERT|DELETE|INSERT|RELATE|DEFINE|REMOVE|ALTER"
+    r"|REBUILD|KILL|LIVE)\b|fn::|http::",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class SlowQuery:
+    name: str
+    query: str
+    vars: dict[str, Value]
+    """Query variables, with vectors redacted"""
+    client_time: float
+    """Client wall time in ms"""
+    server_time: float | None
+    """SurrealDB execution time in ms"""
+    plan: Value = None
+    """Result of `EXPLAIN`, for single `SELECT` statements"""
+    full_scan: bool = False
+    """The plan iterates over a whole table, e.g. a vector search that
+    doesn't use its HNSW index"""
+    at: datetime = field(default_factory=lambda: datetime.now(UTC))
+
+
+def redact(value: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+    """Replace vectors (long lists of numbers) by a short placeholder."""
+    if isinstance(value, Mapping):
+        return {k: redact(v) for k, v in value.items()}  # pyright: ignore[reportUnknownVariableType]
+    if isinstance(value, (list, tuple)):
+        if len(value) >= MIN_VECTOR_LEN and all(  # pyright: ignore[reportUnknownArgumentType]
+            isinstance(x, (int, float))
+            for x in value  # pyright: ignore[reportUnknownVariableType]
+        ):
+            return f"<vector dim={len(value)}>"  # pyright: ignore[reportUnknownArgumentType]
+        return [redact(x) for x in value]  # pyright: ignore[reportUnknownVariableType]
+    if hasattr(value, "tolist") and hasattr(value, "__len__"):
+        # numpy arrays and array('f')
+        return f"<vector dim={len(value)}>"  # pyright: ignore[reportAny, reportArgumentType]
+    return value  # pyright: ignore[reportAny]
+
+
+def explain_statement(query: str) -> str | None:
+    """The `EXPLAIN` statement for `query`, if it's a single read-only
+    `SELECT`. `EXPLAIN` only plans the query, it doesn't run it."""
+    statement = _COMMENT.sub("", query).strip().rstrip(";").rstrip()
+    if (
+        ";" in statement
+        or not statement.upper().startswith("SELECT")
+        or _WRITE.search(statement)
+    ):
+        return None
+    return f"{statement} EXPLAIN"
+
+
+def _is_full_scan(plan: Value) -> bool:
+    if not isinstance(plan, list):
+        return False
+    return any(
+        isinstance(step, dict) and step.get("operation") == "Iterate Table"
+        for step in plan
+    )
+
+
+class SlowQueryLog:
+    """
+    Instrumentation hook keeping the last `size` queries slower than
+    `threshold` (client wall time, in ms), with their redacted variables and
+    their `EXPLAIN` plan.
+
+    Plans are captured in a background thread, through a pooled connection,
+    so logging doesn't slow the caller down any further. Embedded databases
+    (e.g. `mem://`) have a single connection, shared with the caller: with
+    `background=False` plans are captured in the caller's thread instead,
+    once its query is done. Entries are also written to `table`, if set.
+
+    Enable it with `DB(..., slow_query_ms=...)` and read `db.slow_queries`.
+    """
+
+    def __init__(
+        self,
+        db: SyncBackend,
+        threshold: float,
+        *,
+        size: int = 100,
+        table: str | None = None,
+        background: bool = True,
+    ):
+        self._db: SyncBackend = db
+        self.background: bool = background
+        self.threshold: float = threshold
+        self.table: str | None = table
+        self.entries: deque[SlowQuery] = deque(maxlen=size)
+        # entries waiting for their plan, with their (unredacted) variables
+        self._queue: queue.Queue[
+            tuple[SlowQuery, Mapping[str, Value] | None]
+        ] = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def __call__(self, event: QueryEvent) -> None:
+        if (
+            event.query is None
+            or event.client_time < self.threshold
+            or event.name == SLOW_LOG_QUERY_NAME
+        ):
+            return
+        entry = SlowQuery(
+            event.name,
+            event.query,
+            redact(dict(event.vars or {})),  # pyright: ignore[reportAny]
+            event.client_time,
+            event.server_time,
+        )
+        if not self.background:
+            self._log(entry, event.vars)
+            return
+        self._queue.put((entry, event.vars))
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="kaig-slow-query-log", daemon=True
+                )
+                self._worker.start()
+
+    def flush(self) -> None:
+        """Wait until all the pending slow queries are logged."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            entry, vars = self._queue.get()
+            try:
+                self._log(entry, vars)
+            except Exception as e:
+                logger.debug(f"Slow query log error: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _log(self, entry: SlowQuery, vars: Mapping[str, Value] | None) -> None:
+        logger.warning(
+            f"Slow query ({entry.client_time:.1f}ms, server {entry.server_time}ms): {entry.name}"
+        )
+        statement = explain_statement(entry.query)
+        with self._db.instrumentation.name(SLOW_LOG_QUERY_NAME):
+            if statement is not None:
+                try:
+                    with self._db.connection() as conn:
+                        entry.plan = conn.query(statement, dict(vars or {}))
+                    entry.full_scan = _is_full_scan(entry.plan)
+                except Exception as e:
+                    entry.plan = f"EXPLAIN failed: {e}"
+            self.entries.append(entry)
+            if self.table is not None:
+                with self._db.connection() as conn:
+                    _ = conn.query(
+                        "CREATE type::table($table) CONTENT $entry",
+                        {"table": self.table, "entry": asdict(entry)},
+                    )
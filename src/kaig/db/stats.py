@@ -0,0 +1,192 @@
+import bisect
+import math
+import threading
+from collections import deque
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+
+from surrealdb import Value
+
+
+@dataclass
+class QueryEvent:
+    """One call to SurrealDB, as seen by the client."""
+
+    name: str
+    """The `.surql` template, or the (shortened) query text"""
+    client_time: float
+    """Wall time in ms, including the network round trip and (de)serialization"""
+    server_time: float | None = None
+    """Execution time in ms reported by SurrealDB, when available"""
+    bytes_out: int | None = None
+    """Size of the request (CBOR), when payload measurement is enabled"""
+    bytes_in: int | None = None
+    """Size of the response (CBOR), when payload measurement is enabled"""
+    rows: int = 0
+    error: str | None = None
+    query: str | None = None
+    """The query text, for `query`/`query_raw` calls"""
+    vars: Mapping[str, Value] | None = None
+
+
+type QueryHook = Callable[[QueryEvent], None]
+
+# Histogram bucket upper bounds, in ms
+BUCKETS: tuple[float, ...] = (
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+    math.inf,
+)
+
+
+@dataclass
+class LatencySummary:
+    count: int = 0
+    mean: float = 0
+    p50: float = 0
+    p90: float = 0
+    p99: float = 0
+    max: float = 0
+    histogram: dict[str, int] = field(default_factory=dict)
+    """Number of samples per bucket (`"<=1ms"`...), empty buckets omitted"""
+
+    @classmethod
+    def from_samples(cls, samples: list[float]) -> "LatencySummary":
+        if not samples:
+            return cls()
+        ordered = sorted(samples)
+
+        def percentile(p: float) -> float:
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+        counts = [0] * len(BUCKETS)
+        for x in ordered:
+            counts[bisect.bisect_left(BUCKETS, x)] += 1
+        return cls(
+            count=len(ordered),
+            mean=sum(ordered) / len(ordered),
+            p50=percentile(0.5),
+            p90=percentile(0.9),
+            p99=percentile(0.99),
+            max=ordered[-1],
+            histogram={
+                f"<={bound:g}ms": n for bound, n in zip(BUCKETS, counts) if n
+            },
+        )
+
+
+@dataclass
+class QueryStatsSnapshot:
+    name: str
+    calls: int
+    errors: int
+    rows: int
+    bytes_out: int
+    bytes_in: int
+    client: LatencySummary
+    """Client wall time"""
+    server: LatencySummary
+    """SurrealDB execution time"""
+    overhead: LatencySummary
+    """Client minus server time: network, queueing and (de)serialization"""
+
+
+class _Series:
+    def __init__(self, window: int):
+        self.calls: int = 0
+        self.errors: int = 0
+        self.rows: int = 0
+        self.bytes_out: int = 0
+        self.bytes_in: int = 0
+        self.client: deque[float] = deque(maxlen=window)
+        self.server: deque[float] = deque(maxlen=window)
+        self.overhead: deque[float] = deque(maxlen=window)
+
+
+class QueryStats:
+    """
+    In-process, thread-safe collector of `QueryEvent`s, keeping totals and the
+    latencies of the last `window` calls of each query.
+
+    It's registered as a hook on every `DB`, see `DB.stats()`.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.window: int = window
+        self._series: dict[str, _Series] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def __call__(self, event: QueryEvent) -> None:
+        with self._lock:
+            series = self._series.get(event.name)
+            if series is None:
+                series = self._series[event.name] = _Series(self.window)
+            series.calls += 1
+            series.rows += event.rows
+            series.bytes_out += event.bytes_out or 0
+            series.bytes_in += event.bytes_in or 0
+            if event.error is not None:
+                series.errors += 1
+            series.client.append(event.client_time)
+            if event.server_time is not None:
+                series.server.append(event.server_time)
+                series.overhead.append(
+                    max(0, event.client_time - event.server_time)
+                )
+
+    def snapshot(self) -> dict[str, QueryStatsSnapshot]:
+        with self._lock:
+            series = {
+                name: (
+                    s.calls,
+                    s.errors,
+                    s.rows,
+                    s.bytes_out,
+                    s.bytes_in,
+                    list(s.client),
+                    list(s.server),
+                    list(s.overhead),
+                )
+                for name, s in self._series.items()
+            }
+        return {
+            name: QueryStatsSnapshot(
+                name,
+                calls,
+                errors,
+                rows,
+                bytes_out,
+                bytes_in,
+                LatencySummary.from_samples(client),
+                LatencySummary.from_samples(server),
+                LatencySummary.from_samples(overhead),
+            )
+            for name, (
+                calls,
+                errors,
+                rows,
+                bytes_out,
+                bytes_in,
+                client,
+                server,
+                overhead,
+            ) in series.items()
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
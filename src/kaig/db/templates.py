@@ -0,0 +1,146 @@
+import threading
+from functools import lru_cache
+from pathlib import Path
+from string import Formatter
+
+from surrealdb import Value
+
+from ..definitions import Object
+
+SURQL_DIR = Path(__file__).parent / "surql"
+
+
+class SurqlTemplate:
+    """
+    A `.surql` file loaded once, with the names of its template fields.
+
+    Templates use the `str.format` syntax: `{table}` is replaced, `{{`/`}}`
+    are literal braces. Without template variables the source is used as is.
+    """
+
+    def __init__(self, name: str, source: str):
+        self.name: str = name
+        self.source: str = source
+        try:
+            parts = list(Formatter().parse(source))
+        except ValueError:
+            # not a template, e.g. a plain query with object literals
+            parts = []
+        self.fields: frozenset[str] = frozenset(
+            field.split(".")[0].split("[")[0]
+            for _, field, _, _ in parts
+            if field
+        )
+
+    def render(self, template_vars: Object | None = None) -> str:
+        if template_vars is None:
+            return self.source
+        missing = self.fields - template_vars.keys()
+        if missing:
+            raise KeyError(
+                f"Missing template variables for {self.name}: {sorted(missing)}"
+            )
+        return self.source.format(**template_vars)
+
+
+class TemplateRegistry:
+    """
+    Registry of compiled SurQL templates, with an LRU cache of rendered
+    statements keyed by template name and template variables.
+
+    The `.surql` files shipped with kaig are registered on creation. Register
+    your own files with `register`, and refer to them by name (defaults to
+    the file name) or by path.
+
+    Example:
+    ```python
+    db.templates.register(Path("surql/search_chunks.surql"))
+    res, time = db.execute("search_chunks.surql", {"embedding": embedding})
+    ```
+
+    Args:
+        max_rendered: Maximum number of rendered statements to cache.
+        directory: Directory of `.surql` files to register on creation.
+    """
+
+    def __init__(
+        self, max_rendered: int = 256, directory: Path | None = SURQL_DIR
+    ):
+        # keyed by name, or by path as given (resolving it on every lookup
+        # would cost a few syscalls per query)
+        self._templates: dict[str | Path, SurqlTemplate] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._render_cached = lru_cache(maxsize=max_rendered)(self._render)
+        if directory is not None:
+            _ = self.register_dir(directory)
+
+    def __contains__(self, name: str | Path) -> bool:
+        return name in self._templates
+
+    def register(
+        self,
+        path: Path,
+        name: str | None = None,
+        source: str | None = None,
+    ) -> SurqlTemplate:
+        """Load and compile `path`. The template can then be referred to by
+        `name` (defaults to the file name) or by its path.
+
+        Pass `source` to register a template that is not read from `path`.
+        """
+        if source is None:
+            with open(path, "r") as file:
+                source = file.read()
+        template = SurqlTemplate(name or path.name, source)
+        with self._lock:
+            self._templates[template.name] = template
+            self._templates[path] = template
+        return template
+
+    def register_dir(self, directory: Path) -> list[SurqlTemplate]:
+        """Register all the `.surql` files in `directory`."""
+        return [
+            self.register(path) for path in sorted(directory.glob("*.surql"))
+        ]
+
+    def get(self, name: str | Path) -> SurqlTemplate:
+        """Get a template by name or path. Paths that were not registered yet
+        are registered on first use."""
+        template = self._templates.get(name)
+        if template is not None:
+            return template
+        if isinstance(name, Path):
+            # only registered by path, so it doesn't shadow a template with
+            # the same file name
+            with open(name, "r") as file:
+                template = SurqlTemplate(name.name, file.read())
+            with self._lock:
+                self._templates[name] = template
+            return template
+        raise KeyError(f"SurQL template not registered: {name}")
+
+    def render(
+        self, name: str | Path, template_vars: Object | None = None
+    ) -> str:
+        """Render a template, reusing a previous rendering with the same
+        template variables."""
+        template = self.get(name)
+        if template_vars is None:
+            return template.source
+        key = tuple(sorted(template_vars.items()))
+        try:
+            _ = hash(key)
+        except TypeError:
+            # e.g. a list, possibly nested in a tuple
+            return template.render(template_vars)
+        return self._render_cached(template, key)
+
+    @staticmethod
+    def _render(
+        template: SurqlTemplate, key: tuple[tuple[str, Value], ...]
+    ) -> str:
+        return template.render(dict(key))
+
+    def cache_info(self):
+        """Hits/misses of the rendered statements cache."""
+        return self._render_cached.cache_info()
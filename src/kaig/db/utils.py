@@ -2,15 +2,20 @@ import dataclasses
 import logging
 import types
 import typing
+from collections.abc import Callable
 from typing import Any, TypeVar, cast, get_args, get_origin, get_type_hints
 
+from pydantic import BaseModel
 from surrealdb import (
+    AsyncHttpSurrealConnection,
+    AsyncWsSurrealConnection,
     BlockingHttpSurrealConnection,
     BlockingWsSurrealConnection,
     Value,
 )
 
 from ..definitions import Object
+from .retry import RetryableError, RetryPolicy, is_retryable
 
 RecordType = TypeVar("RecordType")
 
@@ -18,79 +23,165 @@ RecordType = TypeVar("RecordType")
 logger = logging.getLogger(__name__)
 
 
-def _coerce_value(value: Any, target_type: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
-    """Recursively coerce SurrealDB-returned values (dict/list) into typed values.
+type Decoder = Callable[[Any], Any]  # pyright: ignore[reportExplicitAny]
 
-    Intended primarily for nested dataclass graphs (e.g. dict -> dataclass, list[dataclass], etc.).
-    """
+# Compiled decoders, by target type
+_decoders: dict[Any, Decoder] = {}  # pyright: ignore[reportExplicitAny]
+_record_decoders: dict[Any, Decoder] = {}  # pyright: ignore[reportExplicitAny]
+
+
+def _identity(value: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+    return value  # pyright: ignore[reportAny]
+
+
+def _decoder(target_type: Any) -> Decoder:  # pyright: ignore[reportExplicitAny, reportAny]
+    """Get the decoder for `target_type`, compiling it on first use."""
+    try:
+        return _decoders[target_type]
+    except KeyError:
+        pass
+    except TypeError:
+        # unhashable type annotation, don't cache it
+        return _compile_decoder(target_type)
+    decoder = _compile_decoder(target_type)
+    _decoders[target_type] = decoder
+    return decoder
+
+
+def _compile_decoder(target_type: Any) -> Decoder:  # pyright: ignore[reportExplicitAny, reportAny]
+    """Build a callable specialized for `target_type`, so `get_origin`,
+    `get_args` and `get_type_hints` run once per type instead of once per
+    value. See `_coerce_value` for the conversion rules."""
     if target_type is Any or target_type is object:
-        return value  # pyright: ignore[reportAny]
+        return _identity
 
-    if value is None:
-        return None
+    # Optional[T] / Union[...]
+    if target_type is None or target_type is type(None):
+        return lambda _value: None  # pyright: ignore[reportUnknownLambdaType]
 
     origin = get_origin(target_type)  # pyright: ignore[reportAny]
     args = get_args(target_type)
 
-    # Optional[T] / Union[...]
-    if target_type is None or target_type is type(None):
-        return None
     if origin in (typing.Union, types.UnionType):  # pyright: ignore[reportDeprecated]
-        # Best-effort: try each option and return the first successful conversion.
-        for opt in args:  # pyright: ignore[reportAny]
-            if opt is type(None):  # noqa: E721
-                continue
-            try:
-                return _coerce_value(value, opt)  # pyright: ignore[reportAny]
-            except Exception:
-                continue
-        return value  # pyright: ignore[reportAny]
+        options = [
+            _decoder(opt)
+            for opt in args  # pyright: ignore[reportAny]
+            if opt is not type(None)  # noqa: E721
+        ]
+
+        def decode_union(value: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+            if value is None:
+                return None
+            # Best-effort: try each option and return the first successful conversion.
+            for decode in options:
+                try:
+                    return decode(value)  # pyright: ignore[reportAny]
+                except Exception:
+                    continue
+            return value  # pyright: ignore[reportAny]
+
+        return decode_union
 
     # dataclass types
     if isinstance(target_type, type) and dataclasses.is_dataclass(target_type):
-        if isinstance(value, target_type):
-            return value
-        if isinstance(value, dict):
-            return _coerce_dataclass(value, target_type)  # pyright: ignore[reportAny, reportUnknownArgumentType]
-        return value  # pyright: ignore[reportAny]
+        return _DataclassDecoder(target_type)
 
     # Containers
     if origin in (list, tuple, set):
-        inner_t = args[0] if len(args) >= 1 else Any
-        if isinstance(value, list):
-            coerced_list = [_coerce_value(v, inner_t) for v in value]  # pyright: ignore[reportUnknownVariableType]
-            if origin is tuple:
-                return tuple(coerced_list)
-            if origin is set:
-                return set(coerced_list)
-            return coerced_list
-        return value  # pyright: ignore[reportAny]
+        decode_item = _decoder(args[0] if len(args) >= 1 else Any)
+        container: type = origin  # pyright: ignore[reportMissingTypeArgument, reportAny]
+
+        def decode_container(value: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+            if not isinstance(value, list):
+                return value  # pyright: ignore[reportAny]
+            if decode_item is _identity:
+                coerced = list(value)  # pyright: ignore[reportUnknownArgumentType]
+            else:
+                coerced = [decode_item(v) for v in value]  # pyright: ignore[reportUnknownVariableType, reportAny]
+            return coerced if container is list else container(coerced)
+
+        return decode_container
 
     if origin is dict:
         key_t, val_t = args if len(args) == 2 else (Any, Any)
-        if isinstance(value, dict):
+        decode_key = _decoder(key_t)
+        decode_val = _decoder(val_t)
+
+        def decode_dict(value: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+            if not isinstance(value, dict):
+                return value  # pyright: ignore[reportAny]
             return {
-                _coerce_value(k, key_t): _coerce_value(v, val_t)
+                decode_key(k): decode_val(v)
                 for k, v in value.items()  # pyright: ignore[reportUnknownVariableType]
             }
-        return value  # pyright: ignore[reportAny]
+
+        return decode_dict
 
     # Primitive / passthrough
-    if isinstance(target_type, type) and isinstance(value, target_type):
-        return value  # pyright: ignore[reportAny]
-    return value  # pyright: ignore[reportAny]
+    return _identity
+
+
+class _DataclassDecoder:
+    """Builds dataclass `cls` from a dict, recursively coercing nested fields.
+
+    Field decoders are compiled on the first call, so self-referencing
+    dataclasses resolve to this (cached) decoder.
+    """
+
+    def __init__(self, cls: type[Any]):  # pyright: ignore[reportExplicitAny]
+        self.cls: type[Any] = cls  # pyright: ignore[reportExplicitAny]
+        self._fields: list[tuple[str, Decoder]] | None = None
+
+    def _compile(self) -> list[tuple[str, Decoder]]:
+        type_hints = get_type_hints(self.cls)
+        return [
+            (field.name, _decoder(type_hints.get(field.name, Any)))
+            for field in dataclasses.fields(self.cls)
+        ]
+
+    def __call__(self, value: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+        if value is None:
+            return None
+        if isinstance(value, self.cls) or not isinstance(value, dict):
+            return value  # pyright: ignore[reportAny]
+        fields = self._fields
+        if fields is None:
+            fields = self._fields = self._compile()
+        data = cast(dict[str, Any], value)  # pyright: ignore[reportExplicitAny]
+        kwargs: dict[str, Any] = {}  # pyright: ignore[reportExplicitAny]
+        for name, decode in fields:
+            if name in data:
+                kwargs[name] = decode(data[name])
+        return self.cls(**kwargs)
+
+
+def _coerce_value(value: Any, target_type: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+    """Recursively coerce SurrealDB-returned values (dict/list) into typed values.
+
+    Intended primarily for nested dataclass graphs (e.g. dict -> dataclass, list[dataclass], etc.).
+    """
+    return _decoder(target_type)(value)  # pyright: ignore[reportAny]
 
 
-def _coerce_dataclass(data: dict[str, Any], cls: type[Any]) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
-    """Build dataclass `cls` from dict `data`, recursively coercing nested fields."""
-    type_hints = get_type_hints(cls)
-    kwargs: dict[str, Any] = {}  # pyright: ignore[reportExplicitAny]
-    for field in dataclasses.fields(cls):
-        name = field.name
-        if name not in data:
-            continue
-        kwargs[name] = _coerce_value(data[name], type_hints.get(name, Any))
-    return cls(**kwargs)  # pyright: ignore[reportAny]
+def _record_decoder[RecordType](
+    record_type: type[RecordType],
+) -> Callable[[Any], RecordType]:  # pyright: ignore[reportExplicitAny]
+    """Decoder for a query result row of type `record_type`."""
+    decoder = _record_decoders.get(record_type)
+    if decoder is not None:
+        return decoder
+    if dataclasses.is_dataclass(record_type) and hasattr(
+        record_type, "from_dict"
+    ):
+        decoder = cast(Decoder, getattr(record_type, "from_dict"))
+    elif dataclasses.is_dataclass(record_type):
+        decoder = _decoder(record_type)
+    elif isinstance(record_type, type) and issubclass(record_type, BaseModel):
+        decoder = record_type.model_validate
+    else:
+        decoder = lambda x: record_type(**x)  # pyright: ignore[reportUnknownLambdaType]
+    _record_decoders[record_type] = decoder
+    return decoder
 
 
 def parse_time(time: str) -> float:
@@ -118,73 +209,135 @@ def parse_time(time: str) -> float:
     raise ValueError(f"Invalid time format: {time}")
 
 
+def _raise_if_retryable(response: Value) -> Value:
+    # statement errors (e.g. transaction conflicts) are returned as strings
+    if isinstance(response, str) and is_retryable(response):
+        raise RetryableError(response)
+    return response
+
+
 def _query_aux(
     client: BlockingWsSurrealConnection | BlockingHttpSurrealConnection,
     query: str,
     vars: Object,
+    retry: RetryPolicy | None = None,
 ) -> Value:
+    def run() -> Value:
+        return _raise_if_retryable(
+            client.query(query, cast(dict[str, Value], vars))
+        )
+
     try:
-        response = client.query(query, cast(dict[str, Value], vars))
+        response = run() if retry is None else retry.call(run, query)
         logger.debug(f"Query: {query} with {vars}, Response: {response}")
     except Exception as e:
         logger.error(f"Query execution error: {query} with {vars}, Error: {e}")
-        raise e
+        raise
     return response
 
 
-def query(
-    client: BlockingWsSurrealConnection | BlockingHttpSurrealConnection,
+async def _async_query_aux(
+    client: AsyncWsSurrealConnection | AsyncHttpSurrealConnection,
     query: str,
     vars: Object,
-    record_type: type[RecordType],
+    retry: RetryPolicy | None = None,
+) -> Value:
+    async def run() -> Value:
+        return _raise_if_retryable(
+            await client.query(query, cast(dict[str, Value], vars))
+        )
+
+    try:
+        response = (
+            await run() if retry is None else await retry.async_call(run, query)
+        )
+        logger.debug(f"Query: {query} with {vars}, Response: {response}")
+    except Exception as e:
+        logger.error(f"Query execution error: {query} with {vars}, Error: {e}")
+        raise
+    return response
+
+
+def _cast_list[RecordType](
+    response: Value, record_type: type[RecordType]
 ) -> list[RecordType]:
-    response = _query_aux(client, query, vars)
     if isinstance(response, list):
-        if dataclasses.is_dataclass(record_type) and hasattr(
-            record_type, "from_dict"
-        ):
-            cast_fn = getattr(record_type, "from_dict")  # pyright: ignore[reportAny]
-            casted: list[RecordType] = [cast_fn.__call__(x) for x in response]  # pyright: ignore[reportAny]
-            assert all(isinstance(x, record_type) for x in casted)
-            return casted
+        decode = _record_decoder(record_type)
+        casted: list[RecordType] = [decode(x) for x in response]
         if dataclasses.is_dataclass(record_type):
-            casted = [_coerce_value(x, record_type) for x in response]
             assert all(isinstance(x, record_type) for x in casted)
-            # return cast(list[RecordType], casted)
-            return casted
-        else:
-            return [record_type(**x) for x in response]
+        return casted
     else:
         raise TypeError(
             f"Unexpected response type: {type(response)}. Response: {response}"
         )
 
 
-def query_one(
-    client: BlockingWsSurrealConnection | BlockingHttpSurrealConnection,
-    query: str,
-    vars: Object,
-    record_type: type[RecordType],
+def _cast_one[RecordType](
+    response: Value, record_type: type[RecordType]
 ) -> RecordType | None:
-    response = _query_aux(client, query, vars)
     if response is None:
         return None
     elif not isinstance(response, list):
         if dataclasses.is_dataclass(record_type) and hasattr(
             record_type, "from_dict"
         ):
-            casted = getattr(record_type, "from_dict").__call__(response)  # pyright: ignore[reportAny]
+            casted = _record_decoder(record_type)(response)
             assert isinstance(casted, record_type)
             return casted
         if dataclasses.is_dataclass(record_type) and isinstance(response, dict):
-            casted = _coerce_value(response, record_type)  # pyright: ignore[reportAny]
+            casted = _record_decoder(record_type)(response)
             assert isinstance(casted, record_type)
             return casted
         elif isinstance(response, dict):
             try:
-                return record_type(**response)
+                return _record_decoder(record_type)(response)
             except Exception as e:
                 print(f"Error creating record: {e}. Response: {response}")
-                raise e
+                raise
 
     raise TypeError(f"Unexpected response type: {type(response)}")
+
+
+def query[RecordType](
+    client: BlockingWsSurrealConnection | BlockingHttpSurrealConnection,
+    query: str,
+    vars: Object,
+    record_type: type[RecordType],
+    retry: RetryPolicy | None = None,
+) -> list[RecordType]:
+    response = _query_aux(client, query, vars, retry)
+    return _cast_list(response, record_type)
+
+
+def query_one[RecordType](
+    client: BlockingWsSurrealConnection | BlockingHttpSurrealConnection,
+    query: str,
+    vars: Object,
+    record_type: type[RecordType],
+    retry: RetryPolicy | None = None,
+) -> RecordType | None:
+    response = _query_aux(client, query, vars, retry)
+    return _cast_one(response, record_type)
+
+
+async def async_query[RecordType](
+    client: AsyncWsSurrealConnection | AsyncHttpSurrealConnection,
+    query: str,
+    vars: Object,
+    record_type: type[RecordType],
+    retry: RetryPolicy | None = None,
+) -> list[RecordType]:
+    response = await _async_query_aux(client, query, vars, retry)
+    return _cast_list(response, record_type)
+
+
+async def async_query_one[RecordType](
+    client: AsyncWsSurrealConnection | AsyncHttpSurrealConnection,
+    query: str,
+    vars: Object,
+    record_type: type[RecordType],
+    retry: RetryPolicy | None = None,
+) -> RecordType | None:
+    response = await _async_query_aux(client, query, vars, retry)
+    return _cast_one(response, record_type)
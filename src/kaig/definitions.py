@@ -1,18 +1,49 @@
 from collections.abc import Mapping
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Generic, Literal, TypeVar
-
-from pydantic import BaseModel, Field
+from typing import (
+    TYPE_CHECKING,
+    Annotated,
+    Any,
+    Generic,
+    Literal,
+    TypeVar,
+    cast,
+)
+
+from pydantic import BaseModel, BeforeValidator, Field, PlainSerializer
 from surrealdb import RecordID, Value
 
+from .vectors import EmbeddingVector, is_vector, to_list
+
 Relations = dict[str, set[str]]
 Object = Mapping[str, Value]
 
 
+def _validate_embedding(value: Any) -> Any:  # pyright: ignore[reportExplicitAny, reportAny]
+    # compact vectors are kept as is, they're converted when serialized
+    if is_vector(value):
+        return value  # pyright: ignore[reportAny]
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f"Invalid embedding: {type(value)}")  # pyright: ignore[reportAny]
+    return [float(x) for x in value]  # pyright: ignore[reportUnknownVariableType, reportUnknownArgumentType]
+
+
+if TYPE_CHECKING:
+    Embedding = EmbeddingVector
+else:
+    # list[float], numpy float32 array or array('f'), always sent to the DB as
+    # a list
+    Embedding = Annotated[
+        Any,
+        BeforeValidator(_validate_embedding),
+        PlainSerializer(to_list),
+    ]
+
+
 class BaseDocument(BaseModel):
     content: str
-    embedding: list[float] | None = Field(default=None)
+    embedding: Embedding | None = Field(default=None)
 
 
 GenericDocument = TypeVar("GenericDocument", bound="BaseDocument")
@@ -28,6 +59,11 @@ class OriginalDocument:
     deleted_at: datetime | None = None
     file: bytes | None = None
     content: str | None = None
+    size: int | None = None
+    """File size in bytes, for files stored with `store_original_document`"""
+    chunks: int | None = None
+    """Number of blob chunks when the file is too large to be stored inline
+    in `file`, see `DB.iter_original_document`"""
 
 
 @dataclass
@@ -39,7 +75,15 @@ class RecursiveResult(Generic[GenericDocument]):
 @dataclass
 class Node:
     content: str
-    embedding: list[float] | None
+    embedding: EmbeddingVector | None
+
+    def to_record(self) -> dict[str, Value]:
+        return {
+            "content": self.content,
+            "embedding": None
+            if self.embedding is None
+            else cast(list[Value], to_list(self.embedding)),
+        }
 
 
 @dataclass
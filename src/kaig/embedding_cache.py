@@ -0,0 +1,200 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass
+class EmbeddingCacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    memory_entries: int = 0
+    disk_entries: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0
+
+
+def cache_key(provider: str, model: str, text: str) -> str:
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{provider}:{model}:{digest}"
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: an in-memory LRU of `max_entries` vectors, in
+    front of an optional SQLite file (`path`) keeping up to
+    `max_disk_entries` vectors across runs (oldest entries are evicted
+    first, 5% more than needed at a time, so eviction doesn't run on every
+    insert once the cache is full).
+
+    Entries are keyed by provider, model and a hash of the text, and stored
+    as `float32` (4 bytes per dimension) in both tiers. It's thread-safe, and
+    can be shared by several `Embedder`s.
+
+    Example:
+    ```python
+    cache = EmbeddingCache("embeddings.sqlite")
+    embedder = Embedder(..., cache=cache)
+    print(cache.stats().hit_rate)
+    ```
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        *,
+        max_entries: int = 10_000,
+        max_disk_entries: int | None = 1_000_000,
+    ):
+        self.max_entries: int = max_entries
+        self.max_disk_entries: int | None = max_disk_entries
+        self._memory: OrderedDict[str, array[float]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self._stats: EmbeddingCacheStats = EmbeddingCacheStats()
+        self._db: sqlite3.Connection | None = None
+        # upper bound of the number of disk entries (replaced keys are
+        # counted twice), only counted again when it reaches the limit
+        self._disk_count: int = 0
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            _ = self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embedding (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+            self._disk_count = self._count_disk()
+
+    def get_many(self, keys: Sequence[str]) -> list[array[float] | None]:
+        """The cached vectors of `keys` (None for misses)."""
+        results: list[array[float] | None] = [None] * len(keys)
+        with self._lock:
+            missing: list[int] = []
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(i)
+                    continue
+                self._memory.move_to_end(key)
+                self._stats.memory_hits += 1
+                results[i] = vector
+            if missing and self._db is not None:
+                found = self._disk_get([keys[i] for i in missing])
+                for i in missing:
+                    vector = found.get(keys[i])
+                    if vector is not None:
+                        self._stats.disk_hits += 1
+                        self._remember(keys[i], vector)
+                        results[i] = vector
+            self._stats.misses += sum(1 for x in results if x is None)
+        return results
+
+    def get(self, key: str) -> array[float] | None:
+        return self.get_many([key])[0]
+
+    def put_many(
+        self, items: Sequence[tuple[str, Sequence[float] | array[float]]]
+    ) -> None:
+        vectors = [
+            (key, v if isinstance(v, array) else array("f", v))
+            for key, v in items
+        ]
+        with self._lock:
+            for key, vector in vectors:
+                self._remember(key, vector)
+            if self._db is not None and vectors:
+                _ = self._db.executemany(
+                    "INSERT OR REPLACE INTO embedding (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in vectors],
+                )
+                self._disk_count += len(vectors)
+                self._evict_disk()
+                self._db.commit()
+
+    def put(self, key: str, vector: Sequence[float] | array[float]) -> None:
+        self.put_many([(key, vector)])
+
+    def stats(self) -> EmbeddingCacheStats:
+        with self._lock:
+            disk_entries = 0
+            if self._db is not None:
+                disk_entries = self._count_disk()
+            return EmbeddingCacheStats(
+                self._stats.memory_hits,
+                self._stats.disk_hits,
+                self._stats.misses,
+                len(self._memory),
+                disk_entries,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._stats = EmbeddingCacheStats()
+            if self._db is not None:
+                _ = self._db.execute("DELETE FROM embedding")
+                self._db.commit()
+                self._disk_count = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, vector: array[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            _ = self._memory.popitem(last=False)
+
+    def _disk_get(self, keys: list[str]) -> dict[str, array[float]]:
+        assert self._db is not None
+        found: dict[str, array[float]] = {}
+        # stay under SQLite's limit on the number of variables
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            rows: list[tuple[str, bytes]] = self._db.execute(
+                f"SELECT key, vector FROM embedding WHERE key IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for key, blob in rows:
+                vector = array("f")
+                vector.frombytes(blob)
+                found[key] = vector
+        return found
+
+    def _count_disk(self) -> int:
+        assert self._db is not None
+        return int(
+            self._db.execute("SELECT count(*) FROM embedding").fetchone()[0]  # pyright: ignore[reportAny]
+        )
+
+    def _evict_disk(self) -> None:
+        assert self._db is not None
+        if (
+            self.max_disk_entries is None
+            or self._disk_count <= self.max_disk_entries
+        ):
+            return
+        count = self._count_disk()
+        if count > self.max_disk_entries:
+            evicted = (
+                count - self.max_disk_entries + self.max_disk_entries // 20
+            )
+            _ = self._db.execute(
+                "DELETE FROM embedding WHERE rowid IN (SELECT rowid FROM embedding ORDER BY rowid LIMIT ?)",
+                (evicted,),
+            )
+            count -= evicted
+        self._disk_count = count
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable, Sequence
+from concurrent.futures import Future
+
+type EmbedBatch = Callable[[list[str]], Sequence[Sequence[float]]]
+type AsyncEmbedBatch = Callable[
+    [list[str]], Awaitable[Sequence[Sequence[float]]]
+]
+
+
+class EmbedCoalescer:
+    """
+    Merges the `embed` calls made by concurrent threads within `window_ms` (or
+    until `max_items` texts are waiting) into one `embed_batch` call, and
+    hands each caller its own embedding (DataLoader pattern).
+
+    The batch is sent by the thread filling it up, or by a timer thread when
+    the window closes. If the batch fails, every caller gets the error.
+    """
+
+    def __init__(
+        self,
+        embed_batch: EmbedBatch,
+        *,
+        window_ms: float = 5,
+        max_items: int = 64,
+    ):
+        self._embed_batch: EmbedBatch = embed_batch
+        self.window_ms: float = window_ms
+        self.max_items: int = max_items
+        self._pending: list[tuple[str, Future[Sequence[float]]]] = []
+        self._timer: threading.Timer | None = None
+        self._lock: threading.Lock = threading.Lock()
+        self.batches: int = 0
+        """Number of `embed_batch` calls made"""
+
+    def embed(self, text: str) -> Sequence[float]:
+        return self.submit(text).result()
+
+    def submit(self, text: str) -> Future[Sequence[float]]:
+        future: Future[Sequence[float]] = Future()
+        batch = None
+        with self._lock:
+            self._pending.append((text, future))
+            if len(self._pending) >= self.max_items:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(
+                    self.window_ms / 1000, self._flush
+                )
+                self._timer.daemon = True
+                self._timer.start()
+        if batch is not None:
+            self._run(batch)
+        return future
+
+    def _take(self) -> list[tuple[str, Future[Sequence[float]]]]:
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if batch:
+            self.batches += 1
+        return batch
+
+    def _flush(self) -> None:
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._run(batch)
+
+    def _run(self, batch: list[tuple[str, Future[Sequence[float]]]]) -> None:
+        distinct = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vecs = self._embed_batch(distinct)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        by_text = dict(zip(distinct, vecs))
+        for text, future in batch:
+            future.set_result(by_text[text])
+
+
+class AsyncEmbedCoalescer:
+    """`EmbedCoalescer` for the `aembed` calls of concurrent tasks, bound to
+    the event loop it's created in."""
+
+    def __init__(
+        self,
+        embed_batch: AsyncEmbedBatch,
+        *,
+        window_ms: float = 5,
+        max_items: int = 64,
+    ):
+        self._embed_batch: AsyncEmbedBatch = embed_batch
+        self.window_ms: float = window_ms
+        self.max_items: int = max_items
+        self._pending: list[tuple[str, asyncio.Future[Sequence[float]]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+        self.batches: int = 0
+        """Number of `embed_batch` calls made"""
+
+    async def embed(self, text: str) -> Sequence[float]:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[Sequence[float]] = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if batch:
+            # keep a reference, so the task isn't garbage collected
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self, batch: list[tuple[str, asyncio.Future[Sequence[float]]]]
+    ) -> None:
+        self.batches += 1
+        distinct = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vecs = await self._embed_batch(distinct)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        by_text = dict(zip(distinct, vecs))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
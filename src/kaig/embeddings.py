@@ -1,37 +1,216 @@
+import asyncio
+import json
 import logging
 import os
+from array import array
 from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
 from typing import Literal
 
 import ollama
-from openai import OpenAI
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    AuthenticationError,
+    OpenAI,
+    PermissionDeniedError,
+    RateLimitError,
+)
+
+from .embedding_cache import EmbeddingCache, cache_key
+from .embedding_coalescer import AsyncEmbedCoalescer, EmbedCoalescer
+from .local_embeddings import LocalModel
+from .quantization import Int8Quantizer
+from .vectors import (
+    EmbeddingBatch,
+    EmbeddingFormat,
+    EmbeddingVector,
+    batch_to_format,
+    to_format,
+)
 
 logger = logging.getLogger(__name__)
 
+# Output dimension of common models, so it doesn't have to be detected with
+# an embedding call
+KNOWN_DIMENSIONS: dict[tuple[str, str], int] = {
+    ("openai", "text-embedding-3-small"): 1536,
+    ("openai", "text-embedding-3-large"): 3072,
+    ("openai", "text-embedding-ada-002"): 1536,
+    ("ollama", "all-minilm"): 384,
+    ("ollama", "all-minilm:22m"): 384,
+    ("ollama", "all-minilm:33m"): 384,
+    ("ollama", "nomic-embed-text"): 768,
+    ("ollama", "mxbai-embed-large"): 1024,
+    ("ollama", "bge-m3"): 1024,
+    ("ollama", "snowflake-arctic-embed"): 1024,
+}
+
+
+def model_metadata_path() -> Path:
+    """File caching the detected dimension of the other models:
+    `$KAIG_CACHE_DIR/models.json`, `~/.cache/kaig/models.json` by default."""
+    cache_dir = os.getenv("KAIG_CACHE_DIR")
+    if not cache_dir:
+        xdg = os.getenv("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+        cache_dir = os.path.join(xdg, "kaig")
+    return Path(cache_dir) / "models.json"
+
+
+def pack_batches(
+    texts: Sequence[str], max_items: int, max_chars: int
+) -> list[list[int]]:
+    """Group the indexes of `texts` into batches of at most `max_items`
+    texts and `max_chars` characters (a proxy for the token budget). A text
+    longer than `max_chars` gets a batch of its own."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    chars = 0
+    for i, text in enumerate(texts):
+        if current and (
+            len(current) >= max_items or chars + len(text) > max_chars
+        ):
+            batches.append(current)
+            current, chars = [], 0
+        current.append(i)
+        chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+# Errors of the providers when an input is longer than the model context
+_INPUT_TOO_LONG = (
+    "the input length exceeds the context length",  # ollama
+    "maximum context length",  # openai
+    "maximum input length",
+    "too many tokens",
+)
+
+
+def _input_too_long(e: Exception) -> bool:
+    """Whether a request failed because of the length of its inputs, the
+    only error that bisecting a batch and clipping its texts can fix."""
+    if isinstance(
+        e,
+        (
+            APIConnectionError,
+            AuthenticationError,
+            PermissionDeniedError,
+            RateLimitError,
+        ),
+    ):
+        return False
+    message = str(e).lower()
+    return any(m in message for m in _INPUT_TOO_LONG)
+
+
+def _model_key(provider: str, model: str) -> tuple[str, str]:
+    return provider, model.removesuffix(":latest")
+
+
+def _load_model_metadata() -> dict[str, dict[str, int]]:
+    try:
+        with open(model_metadata_path()) as f:
+            data = json.load(f)  # pyright: ignore[reportAny]
+        return data if isinstance(data, dict) else {}  # pyright: ignore[reportUnknownVariableType]
+    except (OSError, ValueError):
+        return {}
+
+
+def known_dimension(provider: str, model: str) -> int | None:
+    """The dimension of a model, from `KNOWN_DIMENSIONS` or the models
+    metadata cache, without calling the provider."""
+    key = _model_key(provider, model)
+    if key in KNOWN_DIMENSIONS:
+        return KNOWN_DIMENSIONS[key]
+    dimension = _load_model_metadata().get(":".join(key), {}).get("dimension")
+    return dimension if isinstance(dimension, int) else None
+
+
+def known_quantizer(provider: str, model: str) -> Int8Quantizer | None:
+    """The int8 quantizer calibrated for a model with
+    `Embedder.calibrate_quantizer`, from the models metadata cache."""
+    key = ":".join(_model_key(provider, model))
+    data = _load_model_metadata().get(key, {}).get("int8")
+    return Int8Quantizer.from_dict(data) if isinstance(data, dict) else None
+
+
+def _save_model_metadata(provider: str, model: str, **fields: object) -> None:
+    path = model_metadata_path()
+    data = _load_model_metadata()
+    key = ":".join(_model_key(provider, model))
+    data[key] = {**data.get(key, {}), **fields}  # pyright: ignore[reportArgumentType]
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.debug(f"Could not cache the metadata of {model}: {e}")
+
+
+@dataclass
+class _AsyncClients:
+    """Async clients and semaphore of an `Embedder`, bound to an event loop."""
+
+    loop: asyncio.AbstractEventLoop
+    semaphore: asyncio.Semaphore
+    ollama: ollama.AsyncClient | None
+    openai: AsyncOpenAI | None
+    coalescer: AsyncEmbedCoalescer | None
+
 
 class Embedder:
     def __init__(
         self,
         *,
-        provider: Literal["ollama", "openai"],
+        provider: Literal["ollama", "openai", "local"],
         model_name: str,
         vector_type: str,
         safe_max_chars: int = 1000,
+        embedding_format: EmbeddingFormat = "list",
+        cache: EmbeddingCache | None = None,
+        dimension: int | None = None,
+        max_batch_items: int = 256,
+        max_batch_chars: int = 200_000,
+        max_concurrency: int = 4,
+        coalesce_ms: float | None = None,
+        coalesce_max_items: int = 64,
+        local_model: LocalModel | None = None,
+        quantizer: Int8Quantizer | None = None,
     ):
         """
         Initialize embedder with specified provider.
 
         Params:
         ======
-        - provider: "ollama" or "openai"
+        - provider: "ollama", "openai" or "local" (in-process sentence-transformers model, see `LocalModel`)
         - model_name: model name (e.g., "nomic-embed-text" for Ollama, "text-embedding-3-small" for OpenAI)
         - vector_type: vector type for database (e.g., "F32", "I8")
         - safe_max_chars: if embedding fails, we'll clip the text to this many characters and try again
+        - embedding_format: "list" (default), "numpy" (float32 arrays, requires numpy) or "array" (`array('f')`). Compact formats use 4 bytes per dimension instead of ~32, and are converted to lists only when sent to SurrealDB
+        - cache: embedding cache (`EmbeddingCache`), so the same text is only sent to the provider once. Cached vectors are float32
+        - max_batch_items, max_batch_chars: `embed_batch` splits its input into provider requests of at most this many texts and characters (~4 characters per token)
+        - max_concurrency: number of concurrent provider requests of `embed_batch`, and of all the `aembed`/`aembed_batch` calls of this embedder
+        - coalesce_ms: if set, the `embed`/`aembed` calls made concurrently (by threads or tasks) within this window are sent as one batch, of at most `coalesce_max_items` texts. Sequential calls are delayed by up to `coalesce_ms`
+        - local_model: model of the "local" provider, to set its device, threads, backend... `LocalModel(model_name)` by default
+        - quantizer: if set, embeddings are returned quantized to int8 (lists of ints, `array('b')` or numpy int8 arrays), to be stored and searched as is with an integer HNSW index. See `calibrate_quantizer` and `known_quantizer`
+        - dimension: output dimension of the model. By default it's looked up in `KNOWN_DIMENSIONS` and the models metadata cache, or detected (and cached) on first use, so creating an embedder makes no network call
         """
-        self._provider: Literal["ollama", "openai"] = provider
+        self._provider: Literal["ollama", "openai", "local"] = provider
         self.model_name: str = model_name
         self.vector_type: str = vector_type
         self.safe_max_chars: int = safe_max_chars
+        self.embedding_format: EmbeddingFormat = embedding_format
+        self.cache: EmbeddingCache | None = cache
+        self.max_batch_items: int = max_batch_items
+        self.max_batch_chars: int = max_batch_chars
+        self.max_concurrency: int = max_concurrency
+        self.quantizer: Int8Quantizer | None = quantizer
 
         # Initialize OpenAI client if needed
         if provider == "openai":
@@ -41,18 +220,49 @@ class Embedder:
             self._openai_client: OpenAI | None = OpenAI(api_key=api_key)
         else:
             self._openai_client = None
+        # loaded on first use
+        self._local: LocalModel | None = None
+        if provider == "local":
+            self._local = local_model or LocalModel(model_name)
 
-        # Detect dimension by embedding a test string
-        if provider == "ollama":
-            vec = ollama.embed(model=self.model_name, input="hi").embeddings[0]
-            self.dimension: int = len(vec)
-        else:
-            if self._openai_client is None:
-                raise ValueError("OpenAI client not initialized")
-            response = self._openai_client.embeddings.create(
-                model=self.model_name, input="hi"
+        self.coalesce_ms: float | None = coalesce_ms
+        self.coalesce_max_items: int = coalesce_max_items
+        self._coalescer: EmbedCoalescer | None = None
+        if coalesce_ms is not None:
+            self._coalescer = EmbedCoalescer(
+                self._embed_batch,
+                window_ms=coalesce_ms,
+                max_items=coalesce_max_items,
+            )
+        # created on first async use, see `_async_clients`
+        self._async: _AsyncClients | None = None
+
+        # no network call: the dimension is detected on first use if needed
+        self._dimension: int | None = dimension or known_dimension(
+            provider, model_name
+        )
+
+    @property
+    def dimension(self) -> int:
+        """Output dimension of the model, detected with an embedding call
+        (once per model, see `model_metadata_path`) if it's unknown."""
+        if self._dimension is None:
+            _ = self._embed("hi")
+        assert self._dimension is not None
+        return self._dimension
+
+    @dimension.setter
+    def dimension(self, value: int) -> None:
+        """Override the dimension, e.g. for a model that truncates its
+        embeddings. It's not saved to the models metadata cache."""
+        self._dimension = value
+
+    def _learn_dimension(self, vec: Sequence[float]) -> None:
+        if self._dimension is None and len(vec):
+            self._dimension = len(vec)
+            _save_model_metadata(
+                self._provider, self.model_name, dimension=len(vec)
             )
-            self.dimension = len(response.data[0].embedding)
 
     def _embed_ollama(self, text: str) -> list[float]:
         """Generate embedding using Ollama."""
@@ -88,13 +298,57 @@ class Embedder:
         )
         return [data.embedding for data in response.data]
 
-    def embed(self, text: str) -> list[float]:
+    def _cache_key(self, text: str) -> str:
+        return cache_key(self._provider, self.model_name, text)
+
+    def embed(self, text: str, *, quantize: bool = True) -> EmbeddingVector:
+        """Embed `text`. With `quantize=False`, the float embedding is
+        returned even if the embedder has a `quantizer` (e.g. to re-rank)."""
+        if self.cache is None:
+            return self._format(self._embed_one(text), quantize)
+        key = self._cache_key(text)
+        cached = self.cache.get(key)
+        if cached is None:
+            vec = self._embed_one(text)
+            self.cache.put(key, vec)
+            return self._format(vec, quantize)
+        return self._format(cached, quantize)
+
+    def calibrate_quantizer(
+        self,
+        texts: list[str],
+        *,
+        percentile: float = 99.9,
+        symmetric: bool = True,
+    ) -> Int8Quantizer:
+        """Calibrate an int8 quantizer on the embeddings of a representative
+        sample of `texts`, use it, and save it in the models metadata cache
+        (see `known_quantizer`)."""
+        vecs = self._embed_batch(texts)
+        self.quantizer = Int8Quantizer.calibrate(
+            vecs, percentile=percentile, symmetric=symmetric
+        )
+        _save_model_metadata(
+            self._provider, self.model_name, int8=self.quantizer.to_dict()
+        )
+        return self.quantizer
+
+    def _embed_one(self, text: str) -> Sequence[float]:
+        if self._coalescer is not None:
+            return self._coalescer.embed(text)
+        return self._embed(text)
+
+    def _embed(self, text: str) -> list[float]:
         while True:
             try:
-                if self._provider == "ollama":
-                    return self._embed_ollama(text)
+                if self._local is not None:
+                    vec = self._local.embed([text])[0]
+                elif self._provider == "ollama":
+                    vec = self._embed_ollama(text)
                 else:
-                    return self._embed_openai(text)
+                    vec = self._embed_openai(text)
+                self._learn_dimension(vec)
+                return vec
             except Exception as e:
                 if "the input length exceeds the context length" in str(e):
                     # retry
@@ -106,8 +360,272 @@ class Embedder:
                 )
                 raise e
 
-    def embed_batch(self, texts: list[str]) -> Sequence[Sequence[float]]:
-        if self._provider == "ollama":
-            return self._embed_batch_ollama(texts)
+    def embed_batch(
+        self, texts: list[str]
+    ) -> Sequence[Sequence[float]] | EmbeddingBatch:
+        if self.cache is None:
+            return self._format_batch(self._embed_batch(texts))
+        cached, misses = self._cache_misses(texts)
+        vecs = self._embed_batch(misses) if misses else []
+        return self._cache_merge(texts, cached, misses, vecs)
+
+    def _format(
+        self, vec: Sequence[float], quantize: bool = True
+    ) -> EmbeddingVector:
+        if quantize and self.quantizer is not None:
+            return self.quantizer.quantize(vec, self.embedding_format)
+        return to_format(vec, self.embedding_format)
+
+    def _format_batch(
+        self, vecs: Sequence[Sequence[float]]
+    ) -> Sequence[Sequence[float]] | EmbeddingBatch:
+        if self.quantizer is not None:
+            return self.quantizer.quantize_batch(vecs, self.embedding_format)
+        if self.embedding_format == "list":
+            return vecs
+        return batch_to_format(vecs, self.embedding_format)
+
+    def _cache_misses(
+        self, texts: list[str]
+    ) -> tuple[list[array[float] | None], list[str]]:
+        """The cached vectors of `texts`, and the distinct texts to send to
+        the provider."""
+        assert self.cache is not None
+        cached = self.cache.get_many([self._cache_key(text) for text in texts])
+        misses = list(
+            dict.fromkeys(t for t, v in zip(texts, cached) if v is None)
+        )
+        return cached, misses
+
+    def _cache_merge(
+        self,
+        texts: list[str],
+        cached: list[array[float] | None],
+        misses: list[str],
+        vecs: Sequence[Sequence[float]],
+    ) -> EmbeddingBatch:
+        assert self.cache is not None
+        if misses:
+            fresh = dict(zip(misses, vecs))
+            self.cache.put_many(
+                [(self._cache_key(text), vec) for text, vec in fresh.items()]
+            )
+            cached = [
+                fresh[text] if v is None else v  # pyright: ignore[reportAssignmentType]
+                for text, v in zip(texts, cached)
+            ]
+        if self.quantizer is not None:
+            return self.quantizer.quantize_batch(cached, self.embedding_format)  # pyright: ignore[reportArgumentType]
+        if self.embedding_format == "numpy":
+            return batch_to_format(cached, "numpy")  # pyright: ignore[reportArgumentType]
+        return [to_format(v, self.embedding_format) for v in cached]  # pyright: ignore[reportArgumentType]
+
+    def _embed_batch(self, texts: list[str]) -> Sequence[Sequence[float]]:
+        """Embed `texts` in budgeted requests, sent concurrently, and return
+        the embeddings in the same order."""
+        batches = pack_batches(
+            texts, self.max_batch_items, self.max_batch_chars
+        )
+        if len(batches) <= 1:
+            return self._embed_batch_safe(texts)
+
+        def run(batch: list[int]) -> Sequence[Sequence[float]]:
+            return self._embed_batch_safe([texts[i] for i in batch])
+
+        vecs: list[Sequence[float]] = [[] for _ in texts]
+        with ThreadPoolExecutor(self.max_concurrency) as pool:
+            for batch, res in zip(batches, pool.map(run, batches)):
+                for i, vec in zip(batch, res):
+                    vecs[i] = vec
+        return vecs
+
+    def _embed_batch_safe(self, texts: list[str]) -> Sequence[Sequence[float]]:
+        """Embed a single request. If an input is too long for the model, the
+        request is bisected to isolate the texts that fail, which are clipped
+        to `safe_max_chars` and retried. Other errors (transport, auth, rate
+        limit...) are raised right away."""
+        try:
+            return self._embed_batch_provider(texts)
+        except Exception as e:
+            if not _input_too_long(e):
+                logger.error(
+                    f"Error embedding batch of {len(texts)}: {type(e)} {e}"
+                )
+                raise
+            if len(texts) > 1:
+                logger.info(f"Batch of {len(texts)} failed ({e}), bisecting")
+                middle = len(texts) // 2
+                return [
+                    *self._embed_batch_safe(texts[:middle]),
+                    *self._embed_batch_safe(texts[middle:]),
+                ]
+            if texts and len(texts[0]) > self.safe_max_chars:
+                logger.info(
+                    f"Retry embedding chunk, clipped to {self.safe_max_chars} chars"
+                )
+                return self._embed_batch_provider(
+                    [texts[0][: self.safe_max_chars]]
+                )
+            logger.error(
+                f"Error embedding doc with len={len(texts[0]) if texts else 0}: {type(e)} {e}"
+            )
+            raise
+
+    def _embed_batch_provider(
+        self, texts: list[str]
+    ) -> Sequence[Sequence[float]]:
+        if self._local is not None:
+            vecs = self._local.embed(texts)
+        elif self._provider == "ollama":
+            vecs = self._embed_batch_ollama(texts)
         else:
-            return self._embed_batch_openai(texts)
+            vecs = self._embed_batch_openai(texts)
+        if len(vecs):
+            self._learn_dimension(vecs[0])
+        return vecs
+
+    # ==========================================================================
+    # Async
+    # ==========================================================================
+
+    def _async_clients(self) -> _AsyncClients:
+        """The async clients of the running event loop. They are shared by
+        all the async calls, so their HTTP connections are reused."""
+        loop = asyncio.get_running_loop()
+        if self._async is None or self._async.loop is not loop:
+            openai_client = None
+            if self._openai_client is not None:
+                openai_client = AsyncOpenAI(api_key=self._openai_client.api_key)
+            self._async = _AsyncClients(
+                loop,
+                asyncio.Semaphore(self.max_concurrency),
+                ollama.AsyncClient() if self._provider == "ollama" else None,
+                openai_client,
+                None
+                if self.coalesce_ms is None
+                else AsyncEmbedCoalescer(
+                    self._aembed_batch,
+                    window_ms=self.coalesce_ms,
+                    max_items=self.coalesce_max_items,
+                ),
+            )
+        return self._async
+
+    async def aembed(
+        self, text: str, *, quantize: bool = True
+    ) -> EmbeddingVector:
+        """Async `embed`."""
+        if self.cache is None:
+            return self._format(await self._aembed_one(text), quantize)
+        key = self._cache_key(text)
+        cached = self.cache.get(key)
+        if cached is None:
+            vec = await self._aembed_one(text)
+            self.cache.put(key, vec)
+            return self._format(vec, quantize)
+        return self._format(cached, quantize)
+
+    async def _aembed_one(self, text: str) -> Sequence[float]:
+        coalescer = self._async_clients().coalescer
+        if coalescer is not None:
+            return await coalescer.embed(text)
+        return await self._aembed(text)
+
+    async def _aembed(self, text: str) -> Sequence[float]:
+        try:
+            return (await self._aembed_batch_provider([text]))[0]
+        except Exception as e:
+            if _input_too_long(e):
+                logger.info(
+                    f"Retry embedding chunk, clipped to {self.safe_max_chars} chars"
+                )
+                clipped = text[: self.safe_max_chars]
+                return (await self._aembed_batch_provider([clipped]))[0]
+            logger.error(
+                f"Error embedding doc with len={len(text)}: {type(e)} {e}"
+            )
+            raise
+
+    async def aembed_batch(
+        self, texts: list[str]
+    ) -> Sequence[Sequence[float]] | EmbeddingBatch:
+        """Async `embed_batch`. The requests of all the async calls of this
+        embedder share its `max_concurrency` limit."""
+        if self.cache is None:
+            return self._format_batch(await self._aembed_batch(texts))
+        cached, misses = self._cache_misses(texts)
+        vecs = await self._aembed_batch(misses) if misses else []
+        return self._cache_merge(texts, cached, misses, vecs)
+
+    async def _aembed_batch(
+        self, texts: list[str]
+    ) -> Sequence[Sequence[float]]:
+        batches = pack_batches(
+            texts, self.max_batch_items, self.max_batch_chars
+        )
+        results = await asyncio.gather(
+            *(
+                self._aembed_batch_safe([texts[i] for i in batch])
+                for batch in batches
+            )
+        )
+        vecs: list[Sequence[float]] = [[] for _ in texts]
+        for batch, res in zip(batches, results):
+            for i, vec in zip(batch, res):
+                vecs[i] = vec
+        return vecs
+
+    async def _aembed_batch_safe(
+        self, texts: list[str]
+    ) -> Sequence[Sequence[float]]:
+        """Async `_embed_batch_safe`. The halves of a bisected batch are
+        sent one after the other, so a failing half stops the bisection."""
+        try:
+            return await self._aembed_batch_provider(texts)
+        except Exception as e:
+            if not _input_too_long(e):
+                logger.error(
+                    f"Error embedding batch of {len(texts)}: {type(e)} {e}"
+                )
+                raise
+            if len(texts) > 1:
+                logger.info(f"Batch of {len(texts)} failed ({e}), bisecting")
+                middle = len(texts) // 2
+                left = await self._aembed_batch_safe(texts[:middle])
+                right = await self._aembed_batch_safe(texts[middle:])
+                return [*left, *right]
+            if texts and len(texts[0]) > self.safe_max_chars:
+                logger.info(
+                    f"Retry embedding chunk, clipped to {self.safe_max_chars} chars"
+                )
+                return await self._aembed_batch_provider(
+                    [texts[0][: self.safe_max_chars]]
+                )
+            logger.error(
+                f"Error embedding doc with len={len(texts[0]) if texts else 0}: {type(e)} {e}"
+            )
+            raise
+
+    async def _aembed_batch_provider(
+        self, texts: list[str]
+    ) -> Sequence[Sequence[float]]:
+        clients = self._async_clients()
+        vecs: Sequence[Sequence[float]]
+        async with clients.semaphore:
+            if self._local is not None:
+                vecs = await asyncio.to_thread(self._local.embed, texts)
+            elif clients.ollama is not None:
+                res = await clients.ollama.embed(
+                    model=self.model_name, input=texts, truncate=True
+                )
+                vecs = res.embeddings
+            elif clients.openai is not None:
+                response = await clients.openai.embeddings.create(
+                    model=self.model_name, input=texts
+                )
+                vecs = [data.embedding for data in response.data]
+            else:
+                raise ValueError("OpenAI client not initialized")
+        if len(vecs):
+            self._learn_dimension(vecs[0])
+        return vecs
@@ -11,6 +11,7 @@ from typing import Any, Protocol, cast, runtime_checkable
 from surrealdb import RecordID
 
 from kaig.db import DB
+from kaig.db.batch import Batch, BatchStatement
 
 from .definitions import Flow, Record
 
@@ -79,8 +80,23 @@ class Executor:
     Full example in [./tests/flow_test.py](./tests/flow_test.py)
     """
 
-    def __init__(self, db: DB):
+    def __init__(
+        self, db: DB, *, stamp_batch_size: int = 1, page_size: int = 1000
+    ):
+        """
+        Args:
+            db (DB): The database to run flows against.
+            stamp_batch_size (int, optional): Stamps are sent to the DB in
+                batches of up to this many records, and at the end of every
+                flow execution. Larger batches save round trips, but up to
+                this many processed records stay unstamped (and are picked
+                up again) if the executor crashes. Defaults to 1.
+            page_size (int, optional): Number of candidate records fetched
+                per query. Defaults to 1000.
+        """
         self.db: DB = db
+        self.stamp_batch_size: int = stamp_batch_size
+        self.page_size: int = page_size
         self._handlers: dict[str, FlowHandler] = {}
         self._stop: bool = False
 
@@ -99,14 +115,15 @@ class Executor:
         logger.debug(f"Registering handler for {flow}")
 
         # Insert flow into database
-        res = self.db.sync_conn.query(
-            # TODO: try type::record back when this is solved: https://github.com/surrealdb/surrealdb/issues/6980
-            # "UPSERT ONLY type::record('flow', $name) CONTENT $obj",
-            # {"name": flow.name, "obj": flow.model_dump()},
-            # Workaround:
-            f"UPSERT ONLY flow:`{flow.name}` CONTENT $obj",
-            {"obj": flow.model_dump()},
-        )
+        with self.db.connection() as conn:
+            res = conn.query(
+                # TODO: try type::record back when this is solved: https://github.com/surrealdb/surrealdb/issues/6980
+                # "UPSERT ONLY type::record('flow', $name) CONTENT $obj",
+                # {"name": flow.name, "obj": flow.model_dump()},
+                # Workaround:
+                f"UPSERT ONLY flow:`{flow.name}` CONTENT $obj",
+                {"obj": flow.model_dump()},
+            )
         assert isinstance(res, dict)
         assert res.get("id") is not None
 
@@ -141,31 +158,33 @@ class Executor:
         count = 0
 
         # Find candidate records that fulfill the flow dependencies
-        candidates = self.db.query(
+        # (streamed in pages, so large tables aren't loaded in memory at once)
+        candidates = self.db.iter_query(
+            flow.table,
             # TODO: try type::field back when this is solved: https://github.com/surrealdb/surrealdb/issues/6980
             # textwrap.dedent(r"""
-            #     SELECT * FROM type::table($table)
             #     WHERE ((type::field($field) == NONE) OR ($rerun_when_updated AND type::field($field) != $hash))
             #     AND (NONE NOT IN $deps.map(|$x| type::field($x)))
             # """),
             # Workaround:
             textwrap.dedent(f"""
-                SELECT * FROM type::table($table)
                 WHERE (({flow.stamp} == NONE) OR ($rerun_when_updated AND {flow.stamp} != $hash))
                 AND (NONE NOT IN [{", ".join(flow.dependencies)}])
                 AND {flow.stamp} != 'failed'
             """),
             {
                 "rerun_when_updated": flow.rerun_when_updated,
-                "table": flow.table,
                 # "field": flow.stamp,
                 "hash": flow.hash,
                 # "deps": cast(list[Value], flow.dependencies),
             },
             dict[str, Any],  # pyright: ignore[reportExplicitAny]
+            page_size=self.page_size,
         )
         # logger.info(f"Found {len(candidates)} candidates for flow {flow.name}")
 
+        stamps = self.db.batch()
+        expected: list[tuple[BatchStatement, str]] = []
         for candidate in candidates:
             rec_id = candidate.get("id")
 
@@ -177,19 +196,11 @@ class Executor:
                     # stamp
                     if flow.auto_stamp:
                         # TODO: try type::field back when this is solved: https://github.com/surrealdb/surrealdb/issues/6980
-                        res = self.db.sync_conn.query(
-                            f"UPDATE $rec SET {flow.stamp} = $hash",
+                        handle = stamps.add(
+                            f"UPDATE $rec SET {flow.stamp} = $hash RETURN VALUE {flow.stamp}",
                             {"rec": rec_id, "hash": flow.hash},
                         )
-                        assert isinstance(res, list), (
-                            f"Expected list, got {res}"
-                        )
-                        assert isinstance(res[0], dict), (
-                            f"Expected dict, got {type(res[0])}"
-                        )
-                        assert res[0].get(flow.stamp) == flow.hash, (
-                            f"Expected hash {hash}, got {res[0].get(flow.stamp)}"
-                        )
+                        expected.append((handle, flow.hash))
 
                     count += 1
                 except Exception as e:
@@ -197,17 +208,37 @@ class Executor:
                         f"Error executing flow '{flow.name}' with record {candidate.get('id')}. Stamping as failed. Error: {e}"
                     )
                     # to prevent endless retries
-                    res = self.db.sync_conn.query(
+                    handle = stamps.add(
                         # TODO: try type::field back when this is solved: https://github.com/surrealdb/surrealdb/issues/6980
-                        f"UPDATE $rec SET {flow.stamp} = 'failed'",
+                        f"UPDATE $rec SET {flow.stamp} = 'failed' RETURN VALUE {flow.stamp}",
                         {"rec": rec_id},
                     )
+                    expected.append((handle, "failed"))
+                if len(stamps) >= self.stamp_batch_size:
+                    self._send_stamps(stamps, expected)
+                    stamps = self.db.batch()
+                    expected = []
             else:
                 logger.error(f"No handler registered for flow '{flow.name}'")
             if self._stop:
                 break
+        self._send_stamps(stamps, expected)
         return count
 
+    @staticmethod
+    def _send_stamps(
+        stamps: Batch, expected: list[tuple[BatchStatement, str]]
+    ) -> None:
+        """Send the stamps collected while executing a flow in one round
+        trip, and check that every record was stamped."""
+        _ = stamps.send()
+        stamps.raise_for_errors()
+        for handle, value in expected:
+            if handle.result != [value]:
+                raise RuntimeError(
+                    f"Expected stamp {value}, got {handle.result}"
+                )
+
     def flow(
         self,
         table: str,
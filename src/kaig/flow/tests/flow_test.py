@@ -1,4 +1,7 @@
+import pytest
+
 from kaig.db import DB
+from kaig.db.batch import BatchError
 
 from ..definitions import Flow, Record
 from ..executor import Executor
@@ -60,3 +63,18 @@ def test_flow():
     results = exe.execute_flows_once()
     assert results["chunk_flow"] == 0
     assert results["metadata_flow"] == 0
+
+
+def test_flow_stamp_errors_raise():
+    db = DB("mem://", "root", "root", "kaig", "test-flow-stamp")
+    exe = Executor(db)
+    _ = db.sync_conn.query(
+        "DEFINE FIELD done ON note TYPE option<int>; CREATE note:1"
+    )
+
+    @exe.flow(table="note", stamp="done")
+    def note_flow(record: Record, flow: Flow):  # pyright: ignore[reportUnusedFunction, reportUnusedParameter]
+        pass
+
+    with pytest.raises(BatchError):
+        _ = exe.execute_flows_once()
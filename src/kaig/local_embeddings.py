@@ -0,0 +1,91 @@
+import threading
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any, Literal
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+type LocalBackend = Literal["torch", "onnx", "openvino"]
+
+
+def _sentence_transformers():
+    try:
+        import sentence_transformers
+    except ImportError as e:
+        raise ImportError(
+            'provider="local" requires sentence-transformers: pip install "kaig[local]"'
+        ) from e
+    return sentence_transformers
+
+
+class LocalModel:
+    """
+    In-process embedding model (sentence-transformers), for
+    `Embedder(provider="local")`: no embedding server, no HTTP hop.
+
+    The model is loaded on first use, from a local path or the Hugging Face
+    cache.
+
+    Args:
+        model: path or name of the model
+        device: "cpu" (default), "cuda", "mps"...
+        threads: number of CPU threads used by torch (all cores by default)
+        batch_size: number of texts encoded at once
+        normalize: return unit vectors, so cosine similarity is a dot product
+        backend: "torch" (default), or "onnx"/"openvino", which can load
+            quantized models, e.g. with
+            `model_kwargs={"file_name": "onnx/model_qint8_avx512_vnni.onnx"}`
+        model_kwargs: passed to the backend when loading the model
+    """
+
+    def __init__(
+        self,
+        model: str,
+        *,
+        device: str = "cpu",
+        threads: int | None = None,
+        batch_size: int = 32,
+        normalize: bool = True,
+        backend: LocalBackend = "torch",
+        model_kwargs: Mapping[str, Any] | None = None,  # pyright: ignore[reportExplicitAny]
+    ):
+        self.model: str = model
+        self.device: str = device
+        self.threads: int | None = threads
+        self.batch_size: int = batch_size
+        self.normalize: bool = normalize
+        self.backend: LocalBackend = backend
+        self.model_kwargs: dict[str, Any] = dict(model_kwargs or {})  # pyright: ignore[reportExplicitAny]
+        self._model: SentenceTransformer | None = None
+        # encoding already uses all the threads, requests are run one by one
+        self._lock: threading.Lock = threading.Lock()
+
+    def _load(self) -> "SentenceTransformer":
+        if self._model is None:
+            st = _sentence_transformers()
+            if self.threads is not None:
+                import torch
+
+                torch.set_num_threads(self.threads)
+            self._model = st.SentenceTransformer(
+                self.model,
+                device=self.device,
+                backend=self.backend,
+                model_kwargs=self.model_kwargs or None,
+            )
+        return self._model
+
+    @property
+    def dimension(self) -> int | None:
+        with self._lock:
+            return self._load().get_sentence_embedding_dimension()
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        with self._lock:
+            vecs = self._load().encode(  # pyright: ignore[reportUnknownMemberType]
+                texts,
+                batch_size=self.batch_size,
+                normalize_embeddings=self.normalize,
+                convert_to_numpy=True,
+            )
+        return vecs.tolist()  # pyright: ignore[reportAny]
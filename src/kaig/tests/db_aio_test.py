@@ -0,0 +1,71 @@
+import asyncio
+from dataclasses import dataclass
+
+from surrealdb import RecordID
+
+from kaig.db import DB
+from kaig.definitions import Node
+
+
+@dataclass
+class User:
+    id: RecordID
+    name: str
+
+
+def test_async_facade():
+    db = DB("mem://", "root", "root", "kaig", "test-aio")
+
+    async def run():
+        async with db.aio.connection() as conn:
+            _ = await conn.query("CREATE user:1 SET name = 'one'")
+            _ = await conn.query("CREATE user:2 SET name = 'two'")
+            _ = await conn.query("CREATE team:green")
+
+        users = await db.aio.query("SELECT * FROM user ORDER BY id", {}, User)
+        assert [u.name for u in users] == ["one", "two"]
+        user = await db.aio.query_one(
+            "SELECT * FROM ONLY $record", {"record": RecordID("user", 1)}, User
+        )
+        assert user is not None and user.name == "one"
+        assert await db.aio.count("user", "", {}) == 2
+        assert await db.aio.exists(RecordID("user", 2))
+        assert not await db.aio.exists(RecordID("user", 3))
+
+        await db.aio.relate(
+            RecordID("user", 1),
+            "member_of",
+            [RecordID("team", "green")],
+        )
+        teams = await db.aio.query(
+            "SELECT ->member_of->team AS teams FROM user:1", {}, dict
+        )
+        assert teams == [{"teams": [RecordID("team", "green")]}]
+        report = await db.aio.relate_many(
+            [
+                (RecordID("user", 1), "member_of", RecordID("team", "green")),
+                (RecordID("user", 2), "member_of", RecordID("team", "green")),
+                (RecordID("user", 2), "member_of", RecordID("team", "green")),
+            ]
+        )
+        assert (report.inserted, report.duplicates, report.existing) == (
+            1,
+            1,
+            1,
+        )
+
+        nodes = await db.aio.upsert_nodes("team", [Node("green", [1, 0])])
+        assert nodes.upserted == 1 and not nodes.errors
+        team = await db.aio.query_one(
+            "SELECT content, embedding FROM ONLY team:green", {}, dict
+        )
+        assert team == {"content": "green", "embedding": [1, 0]}
+
+        # concurrent queries share the facade
+        counts = await asyncio.gather(
+            *[db.aio.count("user", "", {}) for _ in range(10)]
+        )
+        assert counts == [2] * 10
+        await db.async_close()
+
+    asyncio.run(run())
@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+from surrealdb import RecordID
+
+from kaig.db import DB
+from kaig.db.batch import BatchError
+from kaig.definitions import Node
+
+
+def test_batch_namespaces_vars_and_returns_results():
+    db = DB("mem://", "root", "root", "kaig", "test-batch")
+
+    with db.batch() as b:
+        one = b.add(
+            "CREATE $rec SET name = $name",
+            {"rec": RecordID("user", 1), "name": "one"},
+        )
+        two = b.add(
+            "CREATE $rec SET name = $name",
+            {"rec": RecordID("user", 2), "name": "two"},
+        )
+        bad = b.add(
+            "CREATE $rec SET name = $name",
+            {"rec": RecordID("user", 1), "name": "dup"},
+        )
+        count = b.add("RETURN count(SELECT * FROM user)")
+    assert "$s0_rec" in b.surql and "$s1_name" in b.surql
+
+    assert one.result == [{"id": RecordID("user", 1), "name": "one"}]
+    assert two.result == [{"id": RecordID("user", 2), "name": "two"}]
+    assert one.time >= 0
+    assert bad.error is not None and "already exists" in bad.error
+    with pytest.raises(BatchError):
+        _ = bad.result
+    # statements run in order, the failed one didn't create anything
+    assert count.result == 2
+    with pytest.raises(BatchError):
+        b.raise_for_errors()
+
+
+def test_batch_transaction_is_all_or_nothing():
+    db = DB("mem://", "root", "root", "kaig", "test-batch-tx")
+    batch = db.batch(transaction=True)
+    _ = batch.add("CREATE user:1")
+    _ = batch.add("CREATE user:1")
+    results = batch.send()
+    assert len(results) == 2
+    assert all(r.error is not None for r in results)
+    with db.connection() as conn:
+        assert conn.query("SELECT * FROM user") == []
+
+
+def test_relate_skips_existing_edges_in_sync_and_async_apis():
+    db = DB("mem://", "root", "root", "kaig", "test-batch-relate")
+    user = RecordID("user", 1)
+    teams = [RecordID("team", "green"), RecordID("team", "blue")]
+    query = "SELECT VALUE out FROM member_of ORDER BY out"
+    db.relate(user, "member_of", teams)
+    db.relate(user, "member_of", teams[0])
+    with db.connection() as conn:
+        assert conn.query(query) == [teams[1], teams[0]]
+
+    # embedded databases are private to their connection, so the async API
+    # starts from an empty database
+    async def relate_twice():
+        await db.aio.relate(user, "member_of", teams)
+        await db.aio.relate(user, "member_of", teams[0])
+        async with db.async_connection() as conn:
+            return await conn.query(query)
+
+    assert asyncio.run(relate_twice()) == [teams[1], teams[0]]
+
+
+def _keyword_edges(files: range, keywords: range):
+    return [
+        (RecordID("file", f), "has_keyword", RecordID("keyword", k))
+        for f in files
+        for k in keywords
+    ]
+
+
+def test_relate_many_dedupes_and_skips_existing_edges(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    db = DB("mem://", "root", "root", "kaig", "test-relate-many")
+    _ = db.execute(
+        "define_relation.surql",
+        None,
+        {"name": "has_keyword", "in_tb": "file", "out_tb": "keyword"},
+    )
+    db.relate(RecordID("file", 0), "has_keyword", RecordID("keyword", 0))
+
+    edges = _keyword_edges(range(3), range(4))
+    report = db.relate_many(edges + edges[:2], chunk_size=5)
+    assert (report.inserted, report.duplicates, report.existing) == (11, 2, 1)
+    assert report.skipped == 3
+
+    # conflicts missed by the existence check are skipped edge by edge
+    monkeypatch.setattr(
+        "kaig.db.relations.EdgeSet.drop_existing", lambda *_: None
+    )
+    report = db.relate_many(_keyword_edges(range(2, 4), range(4)))
+    assert (report.inserted, report.existing) == (4, 4)
+    with db.connection() as conn:
+        assert conn.query("SELECT count() FROM has_keyword GROUP ALL") == [
+            {"count": 16}
+        ]
+
+
+def test_upsert_nodes_reports_failed_rows():
+    db = DB("mem://", "root", "root", "kaig", "test-upsert-nodes")
+    with db.connection() as conn:
+        _ = conn.query(
+            """
+            DEFINE FIELD embedding ON keyword TYPE option<array<float>>;
+            CREATE keyword:a SET content = 'a', embedding = [1.0];
+            """
+        )
+    nodes = [Node("a", None), Node("b", [2]), Node("c", None)]
+    bad = Node("d", "not a vector")  # pyright: ignore[reportArgumentType]
+    report = db.upsert_nodes("keyword", nodes + [bad], chunk_size=2)
+    assert report.upserted == 3
+    assert [(node.content, "embedding" in e) for node, e in report.errors] == [
+        ("d", True)
+    ]
+    with db.connection() as conn:
+        res = conn.query(
+            "SELECT content, embedding FROM keyword ORDER BY content"
+        )
+    assert res == [
+        {"content": "a", "embedding": None},
+        {"content": "b", "embedding": [2.0]},
+        {"content": "c", "embedding": None},
+    ]
+
+    db.add_graph_nodes(
+        "file", "keyword", {"a", "e"}, "has_keyword", {"f": {"a", "e"}}
+    )
+    with db.connection() as conn:
+        res = conn.query("SELECT VALUE out FROM has_keyword ORDER BY out")
+    assert res == [RecordID("keyword", "a"), RecordID("keyword", "e")]
+
+
+def test_add_graph_nodes_relates_even_if_upsert_fails(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    db = DB("mem://", "root", "root", "kaig", "test-upsert-fails")
+    with db.connection() as conn:
+        _ = conn.query("CREATE keyword:a SET content = 'a'")
+
+    def fail(*_: object):
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(db, "upsert_nodes", fail)
+    db.add_graph_nodes("file", "keyword", {"a"}, "has_keyword", {"f": {"a"}})
+    with db.connection() as conn:
+        res = conn.query("SELECT VALUE out FROM has_keyword")
+    assert res == [RecordID("keyword", "a")]
@@ -0,0 +1,74 @@
+from typing import cast
+
+import numpy as np
+from surrealdb import RecordID, Value
+
+from kaig.db import DB
+from kaig.db.exact import rescore
+from kaig.definitions import BaseDocument
+
+
+class Keyword(BaseDocument):
+    id: RecordID | None = None
+
+
+def test_exact_index_search_and_refresh():
+    db = DB("mem://", "root", "root", "kaig", "test-exact")
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(50, 8)).astype(np.float32)
+    vectors = cast(list[list[float]], matrix.tolist())
+    # the same vectors, as query parameters
+    values = cast(list[Value], vectors)
+    with db.connection() as conn:
+        _ = conn.query(
+            "INSERT INTO keyword $rows",
+            {
+                "rows": [
+                    {"id": i, "content": f"k{i}", "embedding": v}
+                    for i, v in enumerate(values)
+                ]
+            },
+        )
+        _ = conn.query("CREATE keyword:none SET content = 'no embedding'")
+
+    index = db.exact_index(Keyword, "keyword", updated_field="updated_at")
+    assert len(index) == 50
+    query = [x + 0.01 for x in vectors[7]]
+    res, ms = index.search(query, k=3, threshold=-1)
+    normalized = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    scores = normalized @ np.asarray(query, dtype=np.float32)
+    expected = cast(list[int], np.argsort(-scores)[:3].tolist())
+    assert [d.content for d, _ in res] == [f"k{i}" for i in expected]
+    assert (
+        res[0][0].id == RecordID("keyword", 7) and res[0][0].embedding is None
+    )
+    assert abs(res[0][1] - 1) < 1e-3 and ms >= 0
+
+    with db.connection() as conn:
+        _ = conn.query(
+            """
+            DELETE keyword:7;
+            CREATE keyword:new SET content = 'new', embedding = $v;
+            UPDATE keyword:8 SET content = 'k8b', updated_at = time::now();
+            """,
+            {"v": values[7]},
+        )
+    index.refresh()
+    assert len(index) == 50
+    res, _ = index.search(vectors[7], k=1)
+    assert res[0][0].id == RecordID("keyword", "new")
+    res, _ = index.search(vectors[8], k=1)
+    assert res[0][0].content == "k8b"
+
+    candidates = [
+        (Keyword(content="x", id=RecordID("keyword", i)), 0.0)
+        for i in (1, 2, 3)
+    ]
+    rescored = index.rescore(vectors[2], candidates, k=2)
+    assert next(d.id for d, _ in rescored) == RecordID("keyword", 2)
+    assert len(rescored) == 2
+
+    fetched = [
+        (Keyword(content=f"k{i}", embedding=vectors[i]), 0.0) for i in (4, 5)
+    ]
+    assert rescore(vectors[5], fetched)[0][0].content == "k5"
@@ -0,0 +1,82 @@
+from pathlib import Path
+
+from surrealdb import RecordID
+
+from kaig.db import DB
+from kaig.definitions import OriginalDocument
+
+
+def test_store_original_document_streams_large_files_in_chunks(tmp_path: Path):
+    db = DB("mem://", "root", "root", "kaig", "test-files")
+    db.apply_schemas()
+
+    small = tmp_path / "small.txt"
+    _ = small.write_bytes(b"hello")
+    doc, cached = db.store_original_document(str(small), "text/plain")
+    assert not cached
+    assert (doc.file, doc.size, doc.chunks) == (b"hello", 5, None)
+    assert db.read_original_document(doc) == b"hello"
+
+    content = bytes(range(256)) * 10
+    large = tmp_path / "large.bin"
+    _ = large.write_bytes(content)
+    doc, cached = db.store_original_document(
+        str(large), "application/octet-stream", chunk_size=1000
+    )
+    assert not cached
+    assert (doc.file, doc.size, doc.chunks) == (None, 2560, 3)
+    assert [len(x) for x in db.iter_original_document(doc)] == [1000, 1000, 560]
+    assert db.read_original_document(doc) == content
+
+    again, cached = db.store_original_document(
+        str(large), "application/octet-stream", chunk_size=1000
+    )
+    assert cached and again.id == doc.id
+    with db.connection() as conn:
+        blobs = conn.query("SELECT VALUE id FROM file_blob")
+    assert isinstance(blobs, list)
+    assert len(blobs) == 3 and RecordID("file_blob", [doc.id.id, 2]) in blobs
+
+    from_bytes, cached = db.store_original_document_from_bytes(
+        "copy.bin", "application/octet-stream", content
+    )
+    assert cached and from_bytes.id == doc.id
+
+
+def test_store_original_documents_in_bulk(tmp_path: Path):
+    db = DB("mem://", "root", "root", "kaig", "test-files-bulk")
+    db.apply_schemas()
+    paths: list[Path] = []
+    for i in range(6):
+        path = tmp_path / f"{i}.md"
+        _ = path.write_text(f"# doc {i % 5}")
+        paths.append(path)
+    stored, _ = db.store_original_document(str(paths[0]), "text/markdown")
+
+    events: list[tuple[str, int, int]] = []
+    report = db.store_original_documents(
+        paths + [tmp_path / "missing.md"],
+        workers=2,
+        chunk_size=4,
+        progress=lambda *event: events.append(event),
+    )
+    # 0.md is stored, and 5.md has the same content
+    assert sorted(p.name for p in report.cached) == ["0.md", "5.md"]
+    assert report.cached[paths[0]] == stored.id
+    assert sorted(p.name for p in report.inserted) == [
+        "1.md",
+        "2.md",
+        "3.md",
+        "4.md",
+    ]
+    assert list(report.errors) == [tmp_path / "missing.md"]
+    assert events[-1] == ("upload", 4, 4)
+    assert ("hash", 7, 7) in events
+
+    doc = db.query_one(
+        "SELECT * FROM ONLY $rec",
+        {"rec": report.inserted[paths[1]]},
+        OriginalDocument,
+    )
+    assert doc is not None and doc.content_type == "text/markdown"
+    assert doc.chunks == 2 and db.read_original_document(doc) == b"# doc 1"
@@ -0,0 +1,58 @@
+import asyncio
+from dataclasses import dataclass
+
+from surrealdb import RecordID
+
+from kaig.db import DB
+
+
+@dataclass
+class Item:
+    id: RecordID
+    n: int
+
+
+def test_iter_query_pages_by_id():
+    db = DB("mem://", "root", "root", "kaig", "test-iter")
+    with db.connection() as conn:
+        _ = conn.query(
+            "FOR $i IN 1..=25 { CREATE type::thing('item', $i) SET n = $i; }"
+        )
+
+    items = db.iter_query("item", "", {}, Item, page_size=10)
+    first = next(items)
+    assert first == Item(RecordID("item", 1), 1)
+    assert [x.n for x in items] == list(range(2, 26))
+
+    even = db.iter_query(
+        "item",
+        "WHERE n % 2 = $rem",
+        {"rem": 0},
+        Item,
+        fields="id, n",
+        page_size=4,
+    )
+    assert [x.n for x in even] == list(range(2, 26, 2))
+
+    # records stamped while iterating are not skipped nor repeated
+    seen: list[int] = []
+    for x in db.iter_query("item", "WHERE !done", {}, Item, page_size=5):
+        seen.append(x.n)
+        with db.connection() as conn:
+            _ = conn.query("UPDATE $rec SET done = true", {"rec": x.id})
+    assert seen == list(range(1, 26))
+
+    async def collect() -> list[int]:
+        # the async connection of an embedded DB is a separate database
+        async with db.aio.connection() as conn:
+            _ = await conn.query(
+                "FOR $i IN 1..=25 { CREATE type::thing('item', $i) SET n = $i; }"
+            )
+        return [
+            x.n
+            async for x in db.aio.iter_query(
+                "item", "n > 20", {}, Item, page_size=2
+            )
+        ]
+
+    assert asyncio.run(collect()) == [21, 22, 23, 24, 25]
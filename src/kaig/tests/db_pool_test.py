@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+from surrealdb import Value
+
+from kaig.db.pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed: bool = False
+        self.healthy: bool = True
+        self.queries: int = 0
+
+    def query(self, query: str, vars: dict[str, Value] | None = None) -> Value:  # pyright: ignore[reportUnusedParameter]
+        if not self.healthy:
+            raise ConnectionError("socket closed")
+        self.queries += 1
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_pool_is_bounded_and_reuses_connections():
+    created: list[FakeConnection] = []
+
+    def connect() -> FakeConnection:
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    pool = ConnectionPool(connect, max_size=2, checkout_timeout=0.05)
+    with pool.connection() as a, pool.connection() as b:
+        assert a is not b
+        with pytest.raises(PoolTimeoutError), pool.connection():
+            pass
+    with pool.connection() as c:
+        assert c is a  # LIFO: `a` was returned last
+    assert len(created) == 2
+    assert pool.size == 2
+
+    pool.close()
+    assert all(conn.closed for conn in created)
+
+
+def test_pool_health_check_and_idle_timeout():
+    pool = ConnectionPool(
+        FakeConnection, idle_timeout=60, health_check_after=60
+    )
+
+    # a connection that raised is health checked and replaced if broken
+    broken: FakeConnection | None = None
+    with pytest.raises(RuntimeError), pool.connection() as conn:
+        broken = conn
+        broken.healthy = False
+        raise RuntimeError("boom")
+    assert broken is not None
+    with pool.connection() as replacement:
+        assert replacement is not broken
+    assert broken.closed
+
+    # idle connections past the timeout are closed on the next checkout
+    pool.idle_timeout = 0
+    time.sleep(0.01)
+    with pool.connection() as fresh:
+        assert fresh is not replacement
+    assert replacement.closed
+    assert pool.size == 1
+
+
+def test_pool_threads():
+    pool = ConnectionPool(FakeConnection, max_size=3)
+    in_use: set[int] = set()
+    lock = threading.Lock()
+    errors: list[str] = []
+
+    def worker():
+        for _ in range(50):
+            with pool.connection() as conn:
+                with lock:
+                    if id(conn) in in_use:
+                        errors.append("connection shared between threads")
+                    in_use.add(id(conn))
+                _ = conn.query("RETURN true")
+                with lock:
+                    in_use.discard(id(conn))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert pool.size <= 3
@@ -0,0 +1,72 @@
+import pytest
+from surrealdb import Value
+
+from kaig.db import utils as db_utils
+from kaig.db.retry import RetryableError, RetryPolicy, is_retryable
+
+CONFLICT = "Failed to commit transaction due to a read or write conflict. This transaction can be retried"
+
+
+def test_is_retryable():
+    assert is_retryable(CONFLICT)
+    assert is_retryable(Exception(CONFLICT))
+    assert is_retryable(ConnectionResetError("reset by peer"))
+    assert is_retryable(RetryableError("x"))
+    assert not is_retryable(Exception("Parse error: unexpected token"))
+    assert not is_retryable(ValueError("bad value"))
+
+
+def test_retry_policy_retries_and_counts():
+    policy = RetryPolicy(max_attempts=4, base_delay=0)
+    calls: list[int] = []
+
+    def flaky() -> str:
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError(CONFLICT)
+        return "ok"
+
+    assert policy.call(flaky, "UPSERT keyword") == "ok"
+    assert len(calls) == 3
+    assert policy.retries["UPSERT keyword"] == 2
+
+    def broken() -> str:
+        raise ValueError("not retryable")
+
+    with pytest.raises(ValueError):
+        _ = policy.call(broken, "other")
+    assert policy.retries["other"] == 0
+
+    def always_conflicts() -> str:
+        raise RuntimeError(CONFLICT)
+
+    with pytest.raises(Exception, match="can be retried"):
+        _ = policy.call(always_conflicts, "conflict")
+    assert policy.retries["conflict"] == 3
+
+
+def test_retry_policy_backoff_is_capped():
+    policy = RetryPolicy(base_delay=1, max_delay=3)
+    for attempt in range(10):
+        assert 0 <= policy.delay(attempt) <= 3
+
+
+def test_query_aux_retries_statement_conflicts():
+    class Client:
+        def __init__(self):
+            self.calls: int = 0
+
+        def query(self, query: str, vars: dict[str, Value]) -> Value:  # pyright: ignore[reportUnusedParameter]
+            self.calls += 1
+            return CONFLICT if self.calls == 1 else [{"id": 1}]
+
+    client = Client()
+    res = db_utils.query(
+        client,  # pyright: ignore[reportArgumentType]
+        "SELECT * FROM x",
+        {},
+        dict,
+        RetryPolicy(base_delay=0),
+    )
+    assert res == [{"id": 1}]
+    assert client.calls == 2
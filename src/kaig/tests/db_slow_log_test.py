@@ -0,0 +1,62 @@
+from typing import cast
+
+from surrealdb import RecordID, Value
+
+from kaig.db import DB
+from kaig.db.slow_log import explain_statement, redact
+
+
+def test_redact_and_explain_statement():
+    assert redact({"embedding": [0.1] * 32, "k": 5, "ids": [1, 2]}) == {
+        "embedding": "<vector dim=32>",
+        "k": 5,
+        "ids": [1, 2],
+    }
+    assert explain_statement("-- c\nSELECT * FROM x;\n") == (
+        "SELECT * FROM x EXPLAIN"
+    )
+    assert explain_statement("SELECT *, (DELETE y) AS d FROM x") is None
+    assert explain_statement("SELECT fn::write() FROM x") is None
+    # fields named after write statements don't prevent the plan
+    assert explain_statement("SELECT * FROM file WHERE updated_at > $t") == (
+        "SELECT * FROM file WHERE updated_at > $t EXPLAIN"
+    )
+    assert explain_statement("SELECT id, created_at FROM chunk") == (
+        "SELECT id, created_at FROM chunk EXPLAIN"
+    )
+    assert explain_statement("CREATE x") is None
+    assert explain_statement("SELECT * FROM x; SELECT * FROM y") is None
+
+
+def test_slow_queries_are_logged_with_their_plan():
+    db = DB(
+        "mem://",
+        "root",
+        "root",
+        "kaig",
+        "test-slow",
+        slow_query_ms=0,
+        slow_query_table="slow_query",
+    )
+    assert db.slow_queries is not None
+    _ = db.query(
+        "SELECT * FROM item WHERE embedding = $embedding",
+        {"embedding": cast(list[Value], [0.5] * 20)},
+        dict,
+    )
+    _ = db.query_one(
+        "CREATE ONLY $rec SET n = 1", {"rec": RecordID("item", 1)}, dict
+    )
+    db.slow_queries.flush()
+
+    select, create = list(db.slow_queries.entries)
+    assert select.vars == {"embedding": "<vector dim=20>"}
+    assert select.full_scan
+    assert isinstance(select.plan, list)
+    assert create.plan is None and not create.full_scan
+
+    # entries are also written to the table, the log's own queries aren't
+    # logged
+    with db.connection() as conn:
+        logged = conn.query("SELECT name, full_scan FROM slow_query")
+    assert isinstance(logged, list) and len(logged) == 2
@@ -0,0 +1,48 @@
+from surrealdb import RecordID
+
+from kaig.db import DB
+from kaig.db.stats import LatencySummary, QueryEvent
+
+
+def test_latency_summary():
+    summary = LatencySummary.from_samples([float(x) for x in range(1, 101)])
+    assert summary.count == 100
+    assert summary.p50 == 51 and summary.p99 == 100 and summary.max == 100
+    assert summary.histogram["<=1ms"] == 1
+    assert sum(summary.histogram.values()) == 100
+    assert LatencySummary.from_samples([]) == LatencySummary()
+
+
+def test_db_stats_per_query():
+    db = DB(
+        "mem://", "root", "root", "kaig", "test-stats", measure_payload=True
+    )
+    events: list[QueryEvent] = []
+    db.instrumentation.hooks.append(events.append)
+
+    _ = db.execute("flow.surql")
+    for i in range(3):
+        _ = db.query(
+            "CREATE $rec SET n = 1", {"rec": RecordID("item", i)}, dict
+        )
+    _ = db.query("SELECT * FROM item", {}, dict)
+    with db.connection() as conn:
+        # already exists
+        assert isinstance(conn.query("CREATE item:0"), str)
+    db.relate(RecordID("item", 0), "rel", RecordID("item", 1))
+
+    stats = db.stats()
+    assert stats["flow.surql"].calls == 1
+    create = stats["CREATE $rec SET n = 1"]
+    assert create.calls == 3 and create.rows == 3 and create.errors == 0
+    assert create.client.count == create.server.count == 3
+    assert create.client.mean >= create.server.mean > 0
+    assert create.bytes_out > 0 and create.bytes_in > 0
+    assert stats["SELECT * FROM item"].rows == 3
+    assert stats["CREATE item:0"].errors == 1
+    # relate: existing edges check, then insert
+    assert stats["batch"].calls == 2
+    assert len(events) == sum(s.calls for s in stats.values())
+
+    db.reset_stats()
+    assert db.stats() == {}
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import pytest
+
+from kaig.db import DB
+from kaig.db.templates import TemplateRegistry
+
+
+def test_registry_renders_and_caches(tmp_path: Path):
+    registry = TemplateRegistry()
+    assert "vector_search.surql" in registry
+
+    vars = {
+        "table": "chunk",
+        "k": 5,
+        "effort_param": ",40",
+        "fields": "*",
+        "omit_clause": "",
+    }
+    first = registry.render("vector_search.surql", vars)
+    assert "FROM chunk" in first and "<|5,40|>" in first
+    assert registry.render("vector_search.surql", dict(vars)) is first
+    assert registry.cache_info().hits == 1
+    # unhashable variables, even nested in a tuple, are rendered uncached
+    nested = {**vars, "fields": ("id", ["content"])}
+    rendered = registry.render("vector_search.surql", nested)  # pyright: ignore[reportArgumentType]
+    assert "FROM chunk" in rendered
+    assert registry.cache_info().misses == 1
+
+    with pytest.raises(KeyError, match="effort_param"):
+        _ = registry.render(
+            "vector_search.surql", {"table": "chunk", "k": 5, "fields": "*"}
+        )
+    with pytest.raises(KeyError):
+        _ = registry.get("unknown.surql")
+
+    # user files, with object literals that are not template fields
+    path = tmp_path / "search.surql"
+    _ = path.write_text("RETURN {a: 1};")
+    _ = registry.register(path, "search")
+    assert registry.render("search") == "RETURN {a: 1};"
+    assert registry.get(path) is registry.get("search")
+
+    # unregistered paths are loaded once, without shadowing names
+    other = tmp_path / "vector_search.surql"
+    _ = other.write_text("RETURN 1;")
+    assert registry.render(other) == "RETURN 1;"
+    assert registry.get("vector_search.surql").source != "RETURN 1;"
+    _ = other.write_text("RETURN 2;")
+    assert registry.render(other) == "RETURN 1;"
+
+
+def test_execute_registered_template(tmp_path: Path):
+    db = DB("mem://", "root", "root", "kaig", "test-templates")
+    path = tmp_path / "add.surql"
+    _ = path.write_text("RETURN $a + {b};")
+    _ = db.templates.register(path)
+    res, _time = db.execute("add.surql", {"a": 1}, {"b": 2})
+    assert res == 3
+    res, _time = db.execute(path, {"a": 1}, {"b": 2})
+    assert res == 3
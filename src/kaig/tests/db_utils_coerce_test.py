@@ -2,7 +2,8 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 
-from surrealdb import RecordID
+from pydantic import BaseModel, ConfigDict
+from surrealdb import RecordID, Value
 
 from kaig.db import utils as db_utils
 
@@ -46,3 +47,44 @@ def test_coerce_nested_dataclasses():
     assert [c.id.id for c in coerced.children] == ["2", "3"]
     assert all(isinstance(c, Child) for c in coerced.children)
     assert coerced.maybe is None
+
+
+@dataclass
+class Tree:
+    name: str
+    children: list[Tree]
+    tags: dict[str, tuple[int, ...]] | None = None
+
+
+class Model(BaseModel):
+    id: RecordID
+    score: float
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+def test_decoders_are_compiled_once_and_cached():
+    decode = db_utils._decoder(Tree)  # pyright: ignore[reportPrivateUsage]
+    assert db_utils._decoder(Tree) is decode  # pyright: ignore[reportPrivateUsage]
+
+    tree = decode(
+        {
+            "name": "root",
+            "children": [
+                {"name": "leaf", "children": [], "tags": {"a": [1, 2]}}
+            ],
+        }
+    )
+    assert tree == Tree("root", [Tree("leaf", [], {"a": (1, 2)})])
+
+
+def test_cast_list_record_types():
+    rows: list[Value] = [
+        {"id": RecordID("child", i), "score": i / 10} for i in range(3)
+    ]
+    children = db_utils._cast_list(rows, Child)  # pyright: ignore[reportPrivateUsage]
+    assert children[2] == Child(RecordID("child", 2), 0.2)
+    models = db_utils._cast_list(rows, Model)  # pyright: ignore[reportPrivateUsage]
+    assert models[1] == Model(id=RecordID("child", 1), score=0.1)
+    assert db_utils._cast_list(rows, dict) == rows  # pyright: ignore[reportPrivateUsage]
+    assert db_utils._cast_one(rows[0], Model) == models[0]  # pyright: ignore[reportPrivateUsage]
@@ -0,0 +1,279 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from kaig.embedding_cache import EmbeddingCache
+from kaig.embeddings import Embedder, model_metadata_path
+
+
+class FakeOllama:
+    def __init__(self):
+        self.inputs: list[str | list[str]] = []
+
+    def embed(self, model: str, input: str | list[str], **_: object):  # pyright: ignore[reportUnusedParameter]
+        self.inputs.append(input)
+        texts = [input] if isinstance(input, str) else input
+        return SimpleNamespace(embeddings=[[len(t), 0.5] for t in texts])
+
+    def AsyncClient(self) -> "FakeAsyncOllama":
+        return FakeAsyncOllama(self)
+
+
+class FakeAsyncOllama:
+    def __init__(self, sync: FakeOllama):
+        self.sync: FakeOllama = sync
+        self.in_flight: int = 0
+        self.max_in_flight: int = 0
+
+    async def embed(self, model: str, input: str | list[str], **_: object):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return self.sync.embed(model, input)
+
+
+@pytest.fixture
+def ollama(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> FakeOllama:
+    fake = FakeOllama()
+    monkeypatch.setattr("kaig.embeddings.ollama", fake)
+    monkeypatch.setenv("KAIG_CACHE_DIR", str(tmp_path / "kaig"))
+    return fake
+
+
+def test_dimension_is_detected_lazily_and_cached(ollama: FakeOllama):
+    known = Embedder(
+        provider="ollama", model_name="all-minilm:22m", vector_type="F32"
+    )
+    assert known.dimension == 384
+    embedder = Embedder(provider="ollama", model_name="m", vector_type="F32")
+    assert ollama.inputs == []
+
+    assert embedder.dimension == 2
+    assert ollama.inputs == ["hi"]
+    assert model_metadata_path().exists()
+    # the next embedders (e.g. in other processes) use the cached dimension
+    again = Embedder(
+        provider="ollama", model_name="m:latest", vector_type="F32"
+    )
+    assert again.dimension == 2 and len(ollama.inputs) == 1
+
+    # or learn it from their first embedding
+    other = Embedder(provider="ollama", model_name="other", vector_type="F32")
+    _ = other.embed_batch(["a", "b"])
+    assert other.dimension == 2 and len(ollama.inputs) == 2
+
+    # an explicit dimension overrides the detected one
+    other.dimension = 1
+    assert other.dimension == 1 and len(ollama.inputs) == 2
+
+
+def test_embedding_cache_serves_hits_and_batches_misses(
+    ollama: FakeOllama, tmp_path: Path
+):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite", max_entries=2)
+    embedder = Embedder(
+        provider="ollama", model_name="m", vector_type="F32", cache=cache
+    )
+    assert embedder.embed("abc") == [3.0, 0.5]
+    assert embedder.embed("abc") == [3.0, 0.5]
+    assert ollama.inputs == ["abc"]
+
+    res = embedder.embed_batch(["abc", "de", "fghi", "de"])
+    assert [list(v) for v in res] == [[3, 0.5], [2, 0.5], [4, 0.5], [2, 0.5]]
+    # only the distinct misses are sent
+    assert ollama.inputs[-1] == ["de", "fghi"]
+    stats = cache.stats()
+    assert (stats.memory_hits, stats.misses) == (2, 4)
+    assert (stats.memory_entries, stats.disk_entries) == (2, 3)
+
+    # a new process only has the disk tier
+    cache.close()
+    cache = EmbeddingCache(tmp_path / "cache.sqlite", max_disk_entries=3)
+    embedder.cache = cache
+    embedder.embedding_format = "numpy"
+    res = embedder.embed_batch(["abc", "xyz"])
+    assert isinstance(res, np.ndarray) and res.tolist() == [[3, 0.5], [3, 0.5]]
+    assert ollama.inputs[-1] == ["xyz"]
+    stats = cache.stats()
+    assert (stats.disk_hits, stats.misses, stats.disk_entries) == (1, 1, 3)
+    assert stats.hit_rate == 0.5
+
+
+def test_embedding_cache_evicts_disk_entries_in_batches(tmp_path: Path):
+    cache = EmbeddingCache(tmp_path / "cache.sqlite", max_disk_entries=40)
+    cache.put_many([(f"k{i}", [float(i)]) for i in range(40)])
+    cache.put("k0", [0.0])
+    assert cache.stats().disk_entries == 40
+    # over the limit: the oldest entries are evicted, 5% more than needed
+    cache.put("k40", [40.0])
+    assert cache.stats().disk_entries == 38
+    cache.close()
+    cache = EmbeddingCache(tmp_path / "cache.sqlite", max_entries=0)
+    assert cache.get("k1") is None and cache.get("k0") is not None
+
+
+def test_embed_batch_packs_bisects_and_keeps_order(
+    ollama: FakeOllama, monkeypatch: pytest.MonkeyPatch
+):
+    embed = ollama.embed
+
+    def embed_or_fail(model: str, input: str | list[str], **kwargs: object):
+        texts = [input] if isinstance(input, str) else input
+        if any(len(t) > 5 for t in texts):
+            raise ValueError("the input length exceeds the context length")
+        return embed(model, input, **kwargs)
+
+    monkeypatch.setattr(ollama, "embed", embed_or_fail)
+    embedder = Embedder(
+        provider="ollama",
+        model_name="m",
+        vector_type="F32",
+        safe_max_chars=4,
+        max_batch_items=3,
+        max_batch_chars=8,
+        max_concurrency=2,
+    )
+    texts = ["a", "bb", "ccc", "dddd", "e", "ffffffff", "g"]
+    vecs = embedder.embed_batch(texts)
+    # the long text is clipped, everything else is embedded as is, in order
+    assert [v[0] for v in vecs] == [1, 2, 3, 4, 1, 4, 1]
+    assert all(len(batch) <= 3 for batch in ollama.inputs)
+    assert all(
+        sum(len(t) for t in batch) <= 8
+        for batch in ollama.inputs
+        if len(batch) > 1
+    )
+
+
+def test_embed_batch_raises_other_errors_without_bisecting(
+    ollama: FakeOllama, monkeypatch: pytest.MonkeyPatch
+):
+    calls: list[str | list[str]] = []
+
+    def unavailable(model: str, input: str | list[str], **_: object):  # pyright: ignore[reportUnusedParameter]
+        calls.append(input)
+        raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(ollama, "embed", unavailable)
+    embedder = Embedder(provider="ollama", model_name="m", vector_type="F32")
+    with pytest.raises(ConnectionError):
+        _ = embedder.embed_batch(["a", "bb", "ccc", "dddd"])
+    assert calls == [["a", "bb", "ccc", "dddd"]]
+
+
+def test_async_embed_batch_bisects_sequentially(
+    ollama: FakeOllama, monkeypatch: pytest.MonkeyPatch
+):
+    embed = ollama.embed
+
+    def embed_or_fail(model: str, input: str | list[str], **kwargs: object):
+        texts = [input] if isinstance(input, str) else input
+        if "ffffffff" in texts and len(texts) > 1:
+            raise ValueError("the input length exceeds the context length")
+        if "ffffffff" in texts:
+            raise ConnectionError("connection refused")
+        return embed(model, input, **kwargs)
+
+    monkeypatch.setattr(ollama, "embed", embed_or_fail)
+    embedder = Embedder(
+        provider="ollama",
+        model_name="m",
+        vector_type="F32",
+        safe_max_chars=4,
+        max_batch_items=4,
+    )
+    with pytest.raises(ConnectionError):
+        _ = asyncio.run(embedder.aembed_batch(["a", "ffffffff", "ccc", "d"]))
+    # the failing half stopped the bisection before the other half was sent
+    assert ollama.inputs == [["a"]]
+
+
+def test_async_embedder_bounds_concurrency(ollama: FakeOllama):
+    embedder = Embedder(
+        provider="ollama",
+        model_name="m",
+        vector_type="F32",
+        max_batch_items=2,
+        max_concurrency=2,
+    )
+
+    async def run():
+        vecs = await embedder.aembed_batch(["a", "bb", "ccc", "dddd", "e"])
+        assert [v[0] for v in vecs] == [1, 2, 3, 4, 1]
+        singles = await asyncio.gather(*(embedder.aembed(t) for t in "xyz"))
+        assert [v[0] for v in singles] == [1, 1, 1]
+        return embedder._async_clients()  # pyright: ignore[reportPrivateUsage]
+
+    clients = asyncio.run(run())
+    # one client per event loop, shared by all the calls
+    client = clients.ollama
+    assert isinstance(client, FakeAsyncOllama)
+    assert client.max_in_flight == 2
+    assert sorted(ollama.inputs[:3]) == [["a", "bb"], ["ccc", "dddd"], ["e"]]
+    assert len(ollama.inputs) == 6
+
+
+def test_concurrent_embed_calls_are_coalesced(ollama: FakeOllama):
+    embedder = Embedder(
+        provider="ollama",
+        model_name="m",
+        vector_type="F32",
+        coalesce_ms=50,
+        coalesce_max_items=4,
+    )
+    texts = ["a", "bb", "a", "ccc", "dddd", "e"]
+    with ThreadPoolExecutor(len(texts)) as pool:
+        vecs = list(pool.map(embedder.embed, texts))
+    assert [v[0] for v in vecs] == [1, 2, 1, 3, 4, 1]
+    # one batch filled up to coalesce_max_items, the rest after the window
+    assert len(ollama.inputs) == 2
+
+    async def run():
+        return await asyncio.gather(*(embedder.aembed(t) for t in texts))
+
+    vecs = asyncio.run(run())
+    assert [v[0] for v in vecs] == [1, 2, 1, 3, 4, 1]
+    assert len(ollama.inputs) == 4
+
+
+class FakeSentenceTransformer:
+    loads: int = 0
+
+    def __init__(self, model: str, **_: object):
+        FakeSentenceTransformer.loads += 1
+        self.model: str = model
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 2
+
+    def encode(self, texts: list[str], normalize_embeddings: bool, **_: object):
+        vecs = np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+        if normalize_embeddings:
+            vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        return vecs
+
+
+def test_local_provider_loads_the_model_lazily(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+):
+    monkeypatch.setenv("KAIG_CACHE_DIR", str(tmp_path / "kaig"))
+    monkeypatch.setattr(
+        "kaig.local_embeddings._sentence_transformers",
+        lambda: SimpleNamespace(SentenceTransformer=FakeSentenceTransformer),
+    )
+    embedder = Embedder(
+        provider="local", model_name="./models/minilm", vector_type="F32"
+    )
+    assert FakeSentenceTransformer.loads == 0
+
+    vecs = embedder.embed_batch(["", "a"])
+    assert list(vecs[0]) == [0, 1]
+    assert list(vecs[1]) == pytest.approx([0.7071, 0.7071], abs=1e-4)
+    assert embedder.dimension == 2
+    assert asyncio.run(embedder.aembed(""))[0] == 0
+    assert FakeSentenceTransformer.loads == 1
@@ -0,0 +1,98 @@
+from array import array
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from surrealdb import RecordID, Value
+
+from kaig.db import DB
+from kaig.definitions import BaseDocument
+from kaig.embeddings import Embedder, known_quantizer
+from kaig.quantization import Int8Quantizer, quantization_recall
+
+VECTORS = {
+    "north": [0.9, 0.1, 0.0],
+    "north-east": [0.6, 0.6, 0.1],
+    "east": [0.1, 0.9, 0.0],
+    "south": [-0.9, -0.1, 0.1],
+}
+
+
+class Doc(BaseDocument):
+    id: RecordID | None = None
+
+
+class FakeOllama:
+    def embed(self, model: str, input: str | list[str], **_: object):  # pyright: ignore[reportUnusedParameter]
+        texts = [input] if isinstance(input, str) else input
+        return SimpleNamespace(embeddings=[VECTORS[t] for t in texts])
+
+
+@pytest.fixture
+def embedder(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Embedder:
+    monkeypatch.setattr("kaig.embeddings.ollama", FakeOllama())
+    monkeypatch.setenv("KAIG_CACHE_DIR", str(tmp_path / "kaig"))
+    return Embedder(provider="ollama", model_name="m", vector_type="I16")
+
+
+def test_int8_quantizer():
+    quantizer = Int8Quantizer.calibrate(
+        [[0.5, -1.0], [0.25, 2.0]], percentile=100
+    )
+    assert quantizer == Int8Quantizer(2 / 127)
+    assert quantizer.quantize([1.0, -2.0, 4.0]) == [64, -127, 127]
+    assert quantizer.dequantize([127]) == pytest.approx([2.0])
+    assert quantizer.quantize([1.0], "array") == array("b", [64])
+    batch = quantizer.quantize_batch([[1.0], [2.0]], "numpy")
+    assert isinstance(batch, np.ndarray)
+    assert batch.dtype == np.int8  # pyright: ignore[reportUnknownMemberType]
+
+    asymmetric = Int8Quantizer.calibrate(
+        [[0.0, 1.0]], percentile=100, symmetric=False
+    )
+    assert asymmetric.quantize([0.0, 1.0]) == [-128, 127]
+    assert Int8Quantizer.from_dict(asymmetric.to_dict()) == asymmetric
+
+
+def test_quantization_recall():
+    rng = np.random.default_rng(0)
+    corpus = rng.normal(size=(500, 32)).astype(np.float32)
+    queries = corpus[:50] + rng.normal(scale=0.1, size=(50, 32))
+    quantizer = Int8Quantizer.calibrate(corpus)
+    report = quantization_recall(quantizer, corpus, queries, k=10, rerank=4)
+    assert report.queries == 50
+    assert 0.8 < report.recall <= 1
+    assert report.reranked_recall is not None
+    assert report.reranked_recall >= report.recall
+
+
+def test_quantized_search_and_rerank(embedder: Embedder):
+    quantizer = embedder.calibrate_quantizer(list(VECTORS), percentile=100)
+    assert known_quantizer("ollama", "m") == quantizer
+    assert embedder.embed("north") == [127, 14, 0]
+    assert embedder.embed("north", quantize=False) == VECTORS["north"]
+
+    db = DB("mem://", "root", "root", "kaig", "test-quantized", embedder)
+    with db.connection() as conn:
+        _ = conn.query(
+            """
+            DEFINE FIELD embedding ON doc TYPE option<array<int>>;
+            DEFINE INDEX hnsw ON doc FIELDS embedding HNSW DIMENSION 3 DIST COSINE TYPE I16;
+            """
+        )
+    inserted = db.embed_and_insert_batch(
+        [Doc(content=text) for text in VECTORS], list(VECTORS), "doc"
+    )
+    assert len(inserted) == 4
+    stored = db.query("SELECT embedding FROM doc:north", {}, dict[str, Value])
+    assert stored[0]["embedding"] == [127, 14, 0]
+
+    res, _ = db.vector_search_from_text(Doc, "north", table="doc", k=2)
+    assert [d.content for d, _ in res] == ["north", "north-east"]
+    res, _ = db.vector_search_from_text(
+        Doc, "north", table="doc", k=2, rerank=2
+    )
+    assert [d.content for d, _ in res] == ["north", "north-east"]
+    assert res[0][1] == pytest.approx(1, abs=1e-3)
+    assert all(d.embedding is None for d, _ in res)
@@ -0,0 +1,162 @@
+from array import array
+from typing import cast
+
+import numpy as np
+from surrealdb import RecordID
+
+from kaig.db import DB
+from kaig.definitions import BaseDocument, Node
+from kaig.embeddings import Embedder
+from kaig.vectors import EmbeddingVector, batch_to_format, to_format, to_list
+
+
+class Doc(BaseDocument):
+    id: RecordID | None = None
+
+
+class FakeEmbedder(Embedder):
+    def __init__(self):
+        super().__init__(
+            provider="ollama", model_name="fake", vector_type="F32", dimension=2
+        )
+
+    def embed(self, text: str, *, quantize: bool = True) -> EmbeddingVector:  # pyright: ignore[reportImplicitOverride]
+        return [1, 0.1]
+
+
+def test_formats():
+    vec = [0.5, 1.0, 2.0]
+    as_np = to_format(vec, "numpy")
+    assert isinstance(as_np, np.ndarray) and as_np.dtype == np.float32
+    as_array = to_format(vec, "array")
+    assert isinstance(as_array, array) and as_array.itemsize == 4
+    assert to_list(as_np) == to_list(as_array) == vec
+
+    batch = batch_to_format([vec, vec], "numpy")
+    assert isinstance(batch, np.ndarray) and batch.shape == (2, 3)
+    # rows are views into the batch
+    row = cast(EmbeddingVector, batch[1])
+    assert np.shares_memory(to_format(row, "numpy"), batch)
+    assert batch_to_format([vec], "array") == [array("f", vec)]
+
+
+def test_compact_embeddings_are_lists_on_the_wire():
+    doc = Doc(content="x", embedding=np.asarray([1, 2], dtype=np.float32))
+    assert isinstance(doc.embedding, np.ndarray)
+    assert doc.model_dump()["embedding"] == [1.0, 2.0]
+    assert Doc(content="x", embedding=[1, 2]).embedding == [1.0, 2.0]
+    assert Node("a", array("f", [3])).to_record() == {
+        "content": "a",
+        "embedding": [3.0],
+    }
+
+    db = DB("mem://", "root", "root", "kaig", "test-vectors")
+    inserted = db.insert_document(doc, "a", "doc")
+    assert inserted.embedding == [1.0, 2.0]
+
+
+def test_vector_and_graph_queries_omit_embeddings_by_default():
+    db = DB("mem://", "root", "root", "kaig", "test-projection")
+    with db.connection() as conn:
+        _ = conn.query(
+            """
+            DEFINE INDEX hnsw ON doc FIELDS embedding HNSW DIMENSION 2 DIST COSINE;
+            CREATE doc:1 SET content = 'a', embedding = [1, 0];
+            CREATE doc:2 SET content = 'b', embedding = [0, 1];
+            RELATE doc:1->rel->doc:2;
+            RELATE doc:2->rel->doc:1;
+            """
+        )
+
+    db.embedder = FakeEmbedder()
+    res, _ = db.vector_search_from_text(Doc, "a", table="doc", k=2)
+    assert [(d.content, d.embedding) for d, _ in res] == [
+        ("a", None),
+        ("b", None),
+    ]
+    res, _ = db.vector_search_from_text(Doc, "a", table="doc", k=1, omit=())
+    assert res[0][0].embedding == [1.0, 0.0]
+    res, _ = db.vector_search_from_text(
+        Doc, "a", table="doc", k=1, fields="id, content", omit=()
+    )
+    assert res[0][0].embedding is None
+
+    docs, _ = db.graph_query_inward(
+        Doc, RecordID("doc", 1), "rel", "doc", [1, 0]
+    )
+    assert [(d.content, d.embedding) for d in docs] == [("b", None)]
+    docs, _ = db.graph_siblings(Doc, RecordID("doc", 1), "rel", "doc", "doc")
+    assert [(d.content, d.embedding) for d in docs] == [("a", None)]
+    docs, _ = db.graph_siblings(
+        Doc, RecordID("doc", 1), "rel", "doc", "doc", omit=()
+    )
+    assert docs[0].embedding == [1.0, 0.0]
+
+
+class BatchEmbedder(FakeEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.batches: list[list[str]] = []
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:  # pyright: ignore[reportImplicitOverride]
+        self.batches.append(texts)
+        return [[float(len(text)), 1] for text in texts]
+
+
+def test_embed_and_insert_batch_skips_existing_and_chunks_inserts():
+    db = DB("mem://", "root", "root", "kaig", "test-embed-batch")
+    embedder = BatchEmbedder()
+    db.embedder = embedder
+    _ = db.insert_document(Doc(content="old"), "b", "doc")
+
+    texts = ["a", "bb", "ccc", "dddd", "", "a2"]
+    ids = ["a", "b", "c", "d", "e", "a"]
+    with db.instrumentation.name("embed_batch_test"):
+        inserted = db.embed_and_insert_batch(
+            [Doc(content=t) for t in texts], ids, "doc", chunk_size=2
+        )
+    # existing, empty and repeated docs are neither embedded nor inserted
+    assert embedder.batches == [["a", "ccc", "dddd"]]
+    assert [(d.id, d.embedding) for d in inserted] == [
+        (RecordID("doc", "a"), [1.0, 1.0]),
+        (RecordID("doc", "c"), [3.0, 1.0]),
+        (RecordID("doc", "d"), [4.0, 1.0]),
+    ]
+    # one existence check and 2 inserts
+    assert db.stats()["embed_batch_test"].calls == 3
+    assert db.embed_and_insert_batch([Doc(content="a")], ["a"], "doc") == []
+
+
+def test_graph_nodes_with_embeddings_only_embeds_missing_nodes():
+    db = DB("mem://", "root", "root", "kaig", "test-graph-embeddings")
+    embedder = BatchEmbedder()
+    db.embedder = embedder
+    with db.connection() as conn:
+        _ = conn.query(
+            """
+            CREATE keyword:a SET content = 'a', embedding = [9.0, 9.0];
+            CREATE keyword:b SET content = 'b';
+            """
+        )
+
+    relations = {"f1": {"a", "b", "cc"}, "f2": {"a", "cc"}}
+    db.add_graph_nodes_with_embeddings(
+        "file", "keyword", "has_keyword", relations
+    )
+    assert embedder.batches == [["b", "cc"]]
+    with db.connection() as conn:
+        res = conn.query(
+            "SELECT content, embedding FROM keyword ORDER BY content"
+        )
+        edges = conn.query("SELECT count() FROM has_keyword GROUP ALL")
+    assert res == [
+        {"content": "a", "embedding": [9.0, 9.0]},
+        {"content": "b", "embedding": [1.0, 1.0]},
+        {"content": "cc", "embedding": [2.0, 1.0]},
+    ]
+    assert edges == [{"count": 5}]
+
+    db.add_graph_nodes_with_embeddings(
+        "file", "keyword", "has_keyword", relations
+    )
+    assert len(embedder.batches) == 1
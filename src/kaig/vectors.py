@@ -0,0 +1,78 @@
+from array import array
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any, Literal, cast
+
+if TYPE_CHECKING:
+    import numpy as np
+    import numpy.typing as npt
+
+type EmbeddingFormat = Literal["list", "numpy", "array"]
+"""How embeddings are represented on the client:
+
+- "list": `list[float]` (default), ~32 bytes per dimension
+- "numpy": `numpy.float32` arrays (a 2-D array for batches), 4 bytes per
+  dimension, allows vectorized math
+- "array": `array('f')` from the standard library, 4 bytes per dimension
+"""
+
+type EmbeddingVector = list[float] | array[float] | npt.NDArray[np.float32]
+
+type EmbeddingBatch = Sequence[EmbeddingVector] | npt.NDArray[np.float32]
+"""A batch of embeddings: a sequence of vectors, or a single 2-D array with
+"numpy"."""
+
+
+def _numpy(feature: str = 'embedding_format="numpy"'):
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(f"{feature} requires numpy: pip install numpy") from e
+    return numpy
+
+
+def is_vector(value: Any) -> bool:  # pyright: ignore[reportExplicitAny, reportAny]
+    """Whether `value` is a compact (`array` or numpy) vector."""
+    return isinstance(value, array) or type(value).__module__ == "numpy"  # pyright: ignore[reportAny]
+
+
+def is_int8(value: Any) -> bool:  # pyright: ignore[reportExplicitAny, reportAny]
+    """Whether `value` is a compact int8 (quantized) vector."""
+    if isinstance(value, array):
+        return value.typecode == "b"
+    return is_vector(value) and str(getattr(value, "dtype", "")) == "int8"  # pyright: ignore[reportAny]
+
+
+def to_list(embedding: Any) -> list[float]:  # pyright: ignore[reportExplicitAny, reportAny]
+    """Convert an embedding to the `list[float]` sent to SurrealDB."""
+    if isinstance(embedding, list):
+        return cast(list[float], embedding)
+    if hasattr(embedding, "tolist"):
+        # numpy arrays and array('f')
+        return embedding.tolist()  # pyright: ignore[reportAny]
+    return list(embedding)  # pyright: ignore[reportAny]
+
+
+def to_format(
+    embedding: Sequence[float] | EmbeddingVector, format: EmbeddingFormat
+) -> EmbeddingVector:
+    """Convert a single embedding to `format`."""
+    if is_int8(embedding):
+        # quantized, see `Int8Quantizer`
+        return embedding  # pyright: ignore[reportReturnType]
+    if format == "numpy":
+        return _numpy().asarray(embedding, dtype="float32")
+    if format == "array":
+        if isinstance(embedding, array) and embedding.typecode == "f":
+            return embedding
+        return array("f", embedding)
+    return to_list(embedding)
+
+
+def batch_to_format(
+    embeddings: Sequence[Sequence[float]], format: EmbeddingFormat
+) -> EmbeddingBatch:
+    """Convert a batch of embeddings to `format`. With "numpy" the batch is a
+    single 2-D `float32` array, so rows are views into one buffer."""
+    if format == "numpy":
+        return _numpy().asarray(embeddings, dtype="float32")
+    return [to_format(x, format) for x in embeddings]